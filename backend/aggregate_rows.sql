@@ -0,0 +1,108 @@
+-- Server-side aggregates (count / sum / avg, optionally grouped)
+-- Backs supabase_client.aggregate_rows() so analytic endpoints receive one row
+-- per group instead of every underlying row.
+-- Run this in your Supabase SQL Editor
+
+-- Validates that a column exists on an aggregatable table and returns it quoted
+CREATE OR REPLACE FUNCTION aggregate_rows_column(p_table TEXT, p_column TEXT)
+RETURNS TEXT
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = p_table AND column_name = p_column
+    ) THEN
+        RAISE EXCEPTION 'aggregate_rows: unknown column %.%', p_table, p_column;
+    END IF;
+    RETURN quote_ident(p_column);
+END;
+$$;
+
+-- Aggregates p_table, returning one JSON object per group:
+--   {<group columns>..., "count": n, "sum_<column>": x, "avg_<column>": y}
+-- p_group_by: column names; "<column>:day" / "<column>:month" bucket a date or
+--             timestamp column as 'YYYY-MM-DD' / 'YYYY-MM' (key stays <column>)
+-- p_filters:  [{"column": "status", "op": "eq", "value": "paid"}, ...]
+--             op is one of eq, neq, gt, gte, lt, lte, in (value is an array for in)
+-- Only whitelisted tables and existing columns are accepted; all identifiers
+-- and values are quoted. SECURITY INVOKER, so the caller's RLS policies apply.
+CREATE OR REPLACE FUNCTION aggregate_rows(
+    p_table TEXT,
+    p_group_by TEXT[] DEFAULT '{}',
+    p_sum TEXT[] DEFAULT '{}',
+    p_avg TEXT[] DEFAULT '{}',
+    p_filters JSONB DEFAULT '[]'
+)
+RETURNS SETOF JSONB
+LANGUAGE plpgsql STABLE SECURITY INVOKER AS $$
+DECLARE
+    v_tables CONSTANT TEXT[] := ARRAY[
+        'members', 'attendance', 'payments', 'plans', 'invoices', 'equipment',
+        'classes', 'class_bookings', 'installment_plans', 'installment_payments',
+        'member_balances'
+    ];
+    v_select TEXT[] := '{}';
+    v_groups TEXT[] := '{}';
+    v_where TEXT[] := ARRAY['TRUE'];
+    v_item TEXT;
+    v_column TEXT;
+    v_expr TEXT;
+    v_filter JSONB;
+    v_op TEXT;
+BEGIN
+    IF NOT p_table = ANY(v_tables) THEN
+        RAISE EXCEPTION 'aggregate_rows: table % is not allowed', p_table;
+    END IF;
+
+    FOREACH v_item IN ARRAY p_group_by LOOP
+        v_column := aggregate_rows_column(p_table, split_part(v_item, ':', 1));
+        v_expr := CASE split_part(v_item, ':', 2)
+            WHEN '' THEN v_column
+            WHEN 'day' THEN format('to_char(%s, ''YYYY-MM-DD'')', v_column)
+            WHEN 'month' THEN format('to_char(%s, ''YYYY-MM'')', v_column)
+        END;
+        IF v_expr IS NULL THEN
+            RAISE EXCEPTION 'aggregate_rows: unknown bucket in %', v_item;
+        END IF;
+        v_groups := v_groups || v_expr;
+        v_select := v_select || format('%s AS %I', v_expr, split_part(v_item, ':', 1));
+    END LOOP;
+
+    v_select := v_select || 'count(*) AS count'::TEXT;
+    FOREACH v_item IN ARRAY p_sum LOOP
+        v_select := v_select || format('coalesce(sum(%s), 0) AS %I', aggregate_rows_column(p_table, v_item), 'sum_' || v_item);
+    END LOOP;
+    FOREACH v_item IN ARRAY p_avg LOOP
+        v_select := v_select || format('avg(%s) AS %I', aggregate_rows_column(p_table, v_item), 'avg_' || v_item);
+    END LOOP;
+
+    FOR v_filter IN SELECT * FROM jsonb_array_elements(p_filters) LOOP
+        v_column := aggregate_rows_column(p_table, v_filter->>'column');
+        v_op := v_filter->>'op';
+        IF v_op = 'in' THEN
+            v_where := v_where || format('%s = ANY(%L)', v_column,
+                ARRAY(SELECT jsonb_array_elements_text(v_filter->'value')));
+        ELSE
+            v_op := CASE v_op
+                WHEN 'eq' THEN '=' WHEN 'neq' THEN '<>'
+                WHEN 'gt' THEN '>' WHEN 'gte' THEN '>='
+                WHEN 'lt' THEN '<' WHEN 'lte' THEN '<='
+            END;
+            IF v_op IS NULL THEN
+                RAISE EXCEPTION 'aggregate_rows: unknown filter operator %', v_filter->>'op';
+            END IF;
+            v_where := v_where || format('%s %s %L', v_column, v_op, v_filter->>'value');
+        END IF;
+    END LOOP;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT to_jsonb(t) FROM (SELECT %s FROM %I WHERE %s %s) t',
+        array_to_string(v_select, ', '),
+        p_table,
+        array_to_string(v_where, ' AND '),
+        CASE WHEN cardinality(v_groups) > 0 THEN 'GROUP BY ' || array_to_string(v_groups, ', ') ELSE '' END
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION aggregate_rows(TEXT, TEXT[], TEXT[], TEXT[], JSONB) TO authenticated, service_role;
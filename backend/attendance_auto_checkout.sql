@@ -0,0 +1,37 @@
+-- Auto-checkout for stale attendance sessions
+-- Sessions closed by the background sweeper are tagged with auto_closed = true
+-- Run this in your Supabase SQL Editor
+
+ALTER TABLE attendance ADD COLUMN IF NOT EXISTS auto_closed BOOLEAN DEFAULT false;
+
+-- Partial index on open sessions only: stays small because every session is
+-- eventually closed, and serves both the sweeper (ordered by check_in_time)
+-- and the open-session lookups done on every QR scan.
+CREATE INDEX IF NOT EXISTS idx_attendance_open_sessions
+    ON attendance(check_in_time)
+    WHERE check_out_time IS NULL;
+
+COMMENT ON COLUMN attendance.auto_closed IS 'True when check_out_time was set by the auto-checkout sweeper instead of a scan';
+
+-- Close open sessions in one statement: p_sessions is a JSON array of
+-- {"id", "date", "check_out_time", "notes" (optional)}. Only rows that are
+-- still open are written, and only the closing columns, so a check-out
+-- recorded meanwhile is kept and a session deleted or archived meanwhile is
+-- not re-created. Returns the sessions it closed. Used by the sweeper
+-- (p_auto_closed = true) and by batched kiosk scans.
+CREATE OR REPLACE FUNCTION close_attendance_sessions(p_sessions JSONB, p_auto_closed BOOLEAN DEFAULT false)
+RETURNS TABLE (id UUID, member_id UUID, check_out_time TIMESTAMPTZ)
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    UPDATE attendance a SET
+        check_out_time = (s->>'check_out_time')::TIMESTAMPTZ,
+        notes = COALESCE(s->>'notes', a.notes),
+        auto_closed = p_auto_closed
+    FROM jsonb_array_elements(p_sessions) s
+    WHERE a.id = (s->>'id')::UUID
+      AND a.date = (s->>'date')::DATE
+      AND a.check_out_time IS NULL
+    RETURNING a.id, a.member_id, a.check_out_time;
+$$;
+
+REVOKE EXECUTE ON FUNCTION close_attendance_sessions(JSONB, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION close_attendance_sessions(JSONB, BOOLEAN) TO service_role;
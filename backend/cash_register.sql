@@ -0,0 +1,250 @@
+-- Daily cash register: running totals and Z-report closes
+-- register_totals holds one row per business day, payment method and staff
+-- member, kept current by a trigger on payments as they are written. Closing
+-- a day (close_register) therefore reads a handful of total rows instead of
+-- re-scanning the day's payments, and stores a locked Z-report snapshot with
+-- the declared cash count and any difference from the expected cash.
+--
+-- The business day is the payment's payment_date; the staff member is
+-- payments.recorded_by (set by the API from the signed-in user, NULL when
+-- unknown). Payments written for a day after it was closed still update the
+-- running totals, so GET /api/register/{date} shows them as post-close
+-- changes against the snapshot.
+--
+-- Run this in your Supabase SQL Editor after add_payment_tracking.sql and
+-- before deploying the API version that sets recorded_by. Existing completed
+-- payments are totalled on the first run.
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS recorded_by UUID REFERENCES users(id) ON DELETE SET NULL;
+
+CREATE TABLE IF NOT EXISTS register_totals (
+    business_date DATE NOT NULL,
+    payment_method TEXT NOT NULL,
+    -- All zeros when the payment has no recorded_by (a primary key column cannot be NULL)
+    staff_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+    payment_count INTEGER NOT NULL DEFAULT 0,
+    total_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (business_date, payment_method, staff_id)
+);
+
+CREATE TABLE IF NOT EXISTS register_closes (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    -- Consecutive Z-report number, assigned by close_register() (no sequence, so
+    -- a rejected close does not leave a gap)
+    z_number INTEGER NOT NULL UNIQUE,
+    business_date DATE NOT NULL UNIQUE,
+    -- Snapshot of register_totals at close: [{payment_method, staff_id, payment_count, total_amount}]
+    totals JSONB NOT NULL DEFAULT '[]'::JSONB,
+    payment_count INTEGER NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    opening_float DECIMAL(12,2) NOT NULL DEFAULT 0,
+    expected_cash DECIMAL(12,2) NOT NULL,  -- opening float + cash payments
+    declared_cash DECIMAL(12,2) NOT NULL,  -- counted in the drawer
+    cash_difference DECIMAL(12,2) NOT NULL,  -- declared - expected (negative when short)
+    status TEXT NOT NULL CHECK (status IN ('balanced', 'over', 'short')),
+    notes TEXT,
+    closed_by UUID REFERENCES users(id) ON DELETE SET NULL,
+    closed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Tables created when z_number was a SERIAL: numbers now come from close_register()
+ALTER TABLE register_closes ALTER COLUMN z_number DROP DEFAULT;
+DROP SEQUENCE IF EXISTS register_closes_z_number_seq;
+
+CREATE INDEX IF NOT EXISTS idx_register_closes_status ON register_closes(status, business_date DESC) WHERE status <> 'balanced';
+
+ALTER TABLE register_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE register_closes ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Admins can view register totals" ON register_totals
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role = 'admin'
+        )
+    );
+
+CREATE POLICY "Admins can view register closes" ON register_closes
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role = 'admin'
+        )
+    );
+
+-- ============================================================================
+-- TRIGGERS
+-- ============================================================================
+
+-- Z-reports are a record of what was counted: they are never changed
+CREATE OR REPLACE FUNCTION register_closes_locked()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    RAISE EXCEPTION 'Z-report for % is locked', OLD.business_date;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS register_closes_locked ON register_closes;
+CREATE TRIGGER register_closes_locked
+    BEFORE UPDATE OR DELETE ON register_closes
+    FOR EACH ROW
+    EXECUTE FUNCTION register_closes_locked();
+
+-- Add (or, for the old row of an edit or delete, subtract) a completed
+-- payment to its day / method / staff total
+CREATE OR REPLACE FUNCTION post_payment_to_register()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.status IS NOT DISTINCT FROM NEW.status
+       AND OLD.amount = NEW.amount
+       AND OLD.payment_date = NEW.payment_date
+       AND OLD.payment_method = NEW.payment_method
+       AND OLD.recorded_by IS NOT DISTINCT FROM NEW.recorded_by THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP <> 'INSERT' AND OLD.status IN ('completed', 'paid') THEN
+        UPDATE register_totals SET
+            payment_count = payment_count - 1,
+            total_amount = total_amount - OLD.amount,
+            updated_at = NOW()
+        WHERE business_date = OLD.payment_date
+          AND payment_method = OLD.payment_method
+          AND staff_id = COALESCE(OLD.recorded_by, '00000000-0000-0000-0000-000000000000');
+    END IF;
+
+    IF TG_OP <> 'DELETE' AND NEW.status IN ('completed', 'paid') THEN
+        INSERT INTO register_totals AS t (business_date, payment_method, staff_id, payment_count, total_amount)
+        VALUES (
+            NEW.payment_date, NEW.payment_method,
+            COALESCE(NEW.recorded_by, '00000000-0000-0000-0000-000000000000'), 1, NEW.amount
+        )
+        ON CONFLICT (business_date, payment_method, staff_id) DO UPDATE SET
+            payment_count = t.payment_count + 1,
+            total_amount = t.total_amount + EXCLUDED.total_amount,
+            updated_at = NOW();
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS payment_register_post ON payments;
+CREATE TRIGGER payment_register_post
+    AFTER INSERT OR UPDATE OR DELETE ON payments
+    FOR EACH ROW
+    EXECUTE FUNCTION post_payment_to_register();
+
+-- ============================================================================
+-- FUNCTIONS
+-- ============================================================================
+
+-- Recompute one day's totals from its payments (O(day's payments)); used for
+-- the initial backfill and to repair a day by hand
+CREATE OR REPLACE FUNCTION rebuild_register_totals(p_business_date DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM register_totals WHERE business_date = p_business_date;
+
+    INSERT INTO register_totals (business_date, payment_method, staff_id, payment_count, total_amount)
+    SELECT payment_date, payment_method, COALESCE(recorded_by, '00000000-0000-0000-0000-000000000000'),
+           COUNT(*), SUM(amount)
+    FROM payments
+    WHERE payment_date = p_business_date AND status IN ('completed', 'paid')
+    GROUP BY payment_date, payment_method, COALESCE(recorded_by, '00000000-0000-0000-0000-000000000000');
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+-- Close a business day: snapshot its totals into a locked Z-report and
+-- compare the declared cash with the expected cash. A day can be closed once;
+-- a second close raises unique_violation. Closes are serialized by an advisory
+-- lock, so z_number is MAX + 1 with no gaps.
+-- Returns the register_closes row as JSONB.
+CREATE OR REPLACE FUNCTION close_register(
+    p_business_date DATE,
+    p_declared_cash NUMERIC,
+    p_opening_float NUMERIC DEFAULT 0,
+    p_closed_by UUID DEFAULT NULL,
+    p_notes TEXT DEFAULT NULL,
+    p_tolerance NUMERIC DEFAULT 0
+)
+RETURNS JSONB
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_totals JSONB;
+    v_count INTEGER;
+    v_amount NUMERIC;
+    v_cash NUMERIC;
+    v_expected NUMERIC;
+    v_difference NUMERIC;
+    v_close register_closes;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('register_closes'));
+
+    IF EXISTS (SELECT 1 FROM register_closes WHERE business_date = p_business_date) THEN
+        RAISE EXCEPTION USING
+            ERRCODE = 'unique_violation',
+            MESSAGE = format('Register for %s is already closed', p_business_date);
+    END IF;
+
+    SELECT
+        COALESCE(jsonb_agg(jsonb_build_object(
+            'payment_method', payment_method,
+            'staff_id', NULLIF(staff_id, '00000000-0000-0000-0000-000000000000'),
+            'payment_count', payment_count,
+            'total_amount', total_amount
+        ) ORDER BY payment_method, staff_id), '[]'::JSONB),
+        COALESCE(SUM(payment_count), 0),
+        COALESCE(SUM(total_amount), 0),
+        COALESCE(SUM(total_amount) FILTER (WHERE payment_method = 'cash'), 0)
+    INTO v_totals, v_count, v_amount, v_cash
+    FROM register_totals
+    WHERE business_date = p_business_date AND payment_count <> 0;
+
+    v_expected := COALESCE(p_opening_float, 0) + v_cash;
+    v_difference := p_declared_cash - v_expected;
+
+    INSERT INTO register_closes (
+        z_number, business_date, totals, payment_count, total_amount, opening_float,
+        expected_cash, declared_cash, cash_difference, status, notes, closed_by
+    )
+    VALUES (
+        (SELECT COALESCE(MAX(z_number), 0) + 1 FROM register_closes), p_business_date, v_totals, v_count, v_amount, COALESCE(p_opening_float, 0),
+        v_expected, p_declared_cash, v_difference,
+        CASE
+            WHEN ABS(v_difference) <= COALESCE(p_tolerance, 0) THEN 'balanced'
+            WHEN v_difference > 0 THEN 'over'
+            ELSE 'short'
+        END,
+        p_notes, p_closed_by
+    )
+    RETURNING * INTO v_close;
+
+    RETURN to_jsonb(v_close);
+END;
+$$;
+
+-- Only the API (service role) may call these
+REVOKE EXECUTE ON FUNCTION rebuild_register_totals(DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION close_register(DATE, NUMERIC, NUMERIC, UUID, TEXT, NUMERIC) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION rebuild_register_totals(DATE) TO service_role;
+GRANT EXECUTE ON FUNCTION close_register(DATE, NUMERIC, NUMERIC, UUID, TEXT, NUMERIC) TO service_role;
+
+-- ============================================================================
+-- BACKFILL (idempotent: days are recomputed from their payments)
+-- ============================================================================
+
+SELECT rebuild_register_totals(d.payment_date)
+FROM (SELECT DISTINCT payment_date FROM payments WHERE status IN ('completed', 'paid')) d;
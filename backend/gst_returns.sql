@@ -0,0 +1,16 @@
+-- GST return (GSTR-1) support for invoices
+-- Adds the place of supply and customer GSTIN that GSTR-1 groups invoices by,
+-- and an index for reading a filing period's issued invoices in
+-- (invoice_date, id) pages (GET /api/invoices/gst/summary,
+-- services/gst_returns.py).
+-- Run this in your Supabase SQL Editor after phase1_schema.sql
+
+-- Customer's two-digit GST state code (e.g. '29'); NULL means the gym's own state
+ALTER TABLE invoices ADD COLUMN IF NOT EXISTS place_of_supply VARCHAR(2)
+    CHECK (place_of_supply ~ '^[0-9]{2}$');
+
+-- GSTIN of a registered customer; such invoices are reported as B2B
+ALTER TABLE invoices ADD COLUMN IF NOT EXISTS customer_gstin VARCHAR(15);
+
+CREATE INDEX IF NOT EXISTS idx_invoices_gst_period ON invoices(invoice_date, id)
+    WHERE status IN ('sent', 'paid');
@@ -0,0 +1,26 @@
+-- Idempotency keys for retried payment and member creation requests
+-- A request sent with an Idempotency-Key header claims (scope, key) here
+-- before it runs; its response is stored when it completes and replayed for
+-- retries with the same key instead of creating a second payment.
+-- See services/idempotency.py. Rows expire after IDEMPOTENCY_KEY_TTL_SECONDS.
+-- Run this in your Supabase SQL Editor
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope TEXT NOT NULL,  -- "<METHOD> <path>" plus a hash of the caller's credentials
+    key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,  -- SHA-256 of the request body; a reused key with another body is rejected
+    status TEXT NOT NULL DEFAULT 'in_progress' CHECK (status IN ('in_progress', 'completed')),
+    locked_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),  -- when the request holding the key started
+    response_status INTEGER,
+    response_content_type TEXT,
+    response_body TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at);
+
+ALTER TABLE idempotency_keys ENABLE ROW LEVEL SECURITY;
+
+-- No policies: only the service role (which bypasses RLS) reads and writes keys
@@ -0,0 +1,56 @@
+-- Composite / partial / covering indexes for the hot queries
+-- Each index names the query it serves; loadtest/check_query_plans.py runs
+-- EXPLAIN on those queries and fails if any of them falls back to a
+-- sequential scan.
+-- Run this in your Supabase SQL Editor (after supabase_schema.sql,
+-- phase1_schema.sql and advanced_features_schema.sql)
+--
+-- On a large live database, run each CREATE INDEX on its own as
+-- CREATE INDEX CONCURRENTLY ... to avoid blocking writes while it builds.
+
+-- QR scan (scan_qr_code, batch scans, GET /qr-attendance/status):
+--   member_id = ? AND date = ? AND check_out_time IS NULL ORDER BY check_in_time DESC LIMIT 1
+-- Only open sessions are indexed, so the index stays tiny.
+CREATE INDEX IF NOT EXISTS idx_attendance_member_open
+    ON attendance(member_id, date, check_in_time DESC)
+    WHERE check_out_time IS NULL;
+
+-- Member attendance history (GET /attendance?member_id=..., newest first)
+CREATE INDEX IF NOT EXISTS idx_attendance_member_date
+    ON attendance(member_id, date DESC);
+
+-- Member balance (routes/balance.py): member_id = ? filtered by status, summing amount
+-- INCLUDE (amount) makes it an index-only scan.
+CREATE INDEX IF NOT EXISTS idx_payments_member_status
+    ON payments(member_id, status) INCLUDE (amount);
+
+-- Revenue reports and charts: status = 'completed' AND payment_date >= ?
+CREATE INDEX IF NOT EXISTS idx_payments_completed_date
+    ON payments(payment_date) INCLUDE (amount, payment_method)
+    WHERE status = 'completed';
+
+-- Class booking capacity check: class_id = ? AND booking_date = ? AND status = 'confirmed'
+CREATE INDEX IF NOT EXISTS idx_class_bookings_class_date_status
+    ON class_bookings(class_id, booking_date, status);
+
+-- Entity history (GET /audit-logs/entity/{type}/{id}):
+--   entity_type = ? AND entity_id = ? ORDER BY timestamp DESC
+CREATE INDEX IF NOT EXISTS idx_audit_logs_entity_timestamp
+    ON audit_logs(entity_type, entity_id, timestamp DESC);
+
+-- Due / overdue installments: status = ? AND due_date < / BETWEEN ?
+CREATE INDEX IF NOT EXISTS idx_installment_payments_status_due
+    ON installment_payments(status, due_date);
+
+-- Superseded by the composite indexes above (their leading columns), so they
+-- only add write overhead now
+DROP INDEX IF EXISTS idx_class_bookings_class;
+DROP INDEX IF EXISTS idx_audit_logs_entity;
+DROP INDEX IF EXISTS idx_installment_payments_status;
+
+-- Refresh planner statistics so the new indexes are considered immediately
+ANALYZE attendance;
+ANALYZE payments;
+ANALYZE class_bookings;
+ANALYZE audit_logs;
+ANALYZE installment_payments;
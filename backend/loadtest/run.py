@@ -0,0 +1,306 @@
+"""
+End-to-end load test against the in-memory Supabase stand-in
+
+Boots the FastAPI app in-process (no network, no database), seeds synthetic
+gym data and drives the scenarios at the requested concurrency, then reports
+RPS and p50/p95/p99 latency per endpoint.
+
+Usage (from the backend directory):
+    python -m loadtest.run                                  # every scenario
+    python -m loadtest.run -s qr_scan_burst -c 50 -n 2000
+    python -m loadtest.run --output baseline.json           # save a baseline
+"""
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from supabase_client import install_clients, aggregate_in_python  # noqa: E402
+from loadtest.stand_in import StandInClient  # noqa: E402
+from loadtest.seed import seed_gym, UNATTRIBUTED_STAFF_ID  # noqa: E402
+from loadtest.scenarios import SCENARIOS  # noqa: E402
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def stand_in_aggregate_rows(client: StandInClient, p_table: str, p_group_by=(), p_sum=(), p_avg=(), p_filters=()):
+    """Stand-in for the aggregate_rows SQL function (aggregate_rows.sql)"""
+    query = client.table(p_table)
+    for f in p_filters:
+        getattr(query, "in_" if f["op"] == "in" else f["op"])(f["column"], f["value"])
+    return aggregate_in_python(query._rows(), p_group_by, p_sum, p_avg)
+
+
+def stand_in_delete_member_cascade(client: StandInClient, p_member_id: str):
+    """Stand-in for the delete_member_cascade SQL function (member_archive.sql)"""
+    with client.lock:
+        member = client.table("members").select("id, user_id").eq("id", p_member_id).execute().data
+        if not member:
+            return None
+        deleted = {}
+        for table in ("member_passwords", "payments", "attendance", "class_bookings"):
+            deleted[table] = len(client.table(table).delete().eq("member_id", p_member_id).execute().data)
+        client.table("members").delete().eq("id", p_member_id).execute()
+        user_id = member[0].get("user_id")
+        if user_id:
+            client.table("users").delete().eq("id", user_id).execute()
+        return {"member_id": p_member_id, "user_id": user_id, "deleted": deleted}
+
+
+def stand_in_archive_lapsed_members(client: StandInClient, p_lapsed_days: int = 180, p_limit: int = 1000,
+                                    p_member_ids=None, p_dry_run: bool = False):
+    """Stand-in for the archive_lapsed_members SQL function (member_archive.sql)"""
+    cutoff = (date.today() - timedelta(days=p_lapsed_days)).isoformat()
+    with client.lock:
+        query = client.table("members").select("id, end_date").is_("archived_at", "null").neq("status", "active")
+        query = query.in_("id", p_member_ids) if p_member_ids is not None else query.lt("end_date", cutoff)
+        member_ids = [m["id"] for m in query.order("end_date").limit(p_limit).execute().data]
+        result = {"archived": 0, "member_ids": member_ids, "attendance_rows": 0, "class_booking_rows": 0}
+        if p_dry_run or not member_ids:
+            return result
+
+        archived_at = datetime.utcnow().isoformat()
+        client.table("members").update({"status": "archived", "archived_at": archived_at}).in_("id", member_ids).execute()
+        for table, key in (("attendance", "attendance_rows"), ("class_bookings", "class_booking_rows")):
+            moved = client.table(table).delete().in_("member_id", member_ids).execute().data
+            client.tables.setdefault(f"{table}_archive", []).extend({**row, "archived_at": archived_at} for row in moved)
+            result[key] = len(moved)
+        result["archived"] = len(member_ids)
+        return result
+
+
+def stand_in_reconcile_member_balances(client: StandInClient, p_after=None, p_limit: int = 500, p_repair: bool = False):
+    """Stand-in for the reconcile_member_balances SQL function (member_ledger.sql)"""
+    with client.lock:
+        query = client.table("members").select("id").order("id").limit(p_limit)
+        member_ids = [m["id"] for m in (query.gt("id", p_after) if p_after else query).execute().data]
+        balances = {b["member_id"]: b for b in client.table("member_balances").select("*").in_("member_id", member_ids).execute().data}
+        ledger = defaultdict(lambda: {"total_charged": 0.0, "total_paid": 0.0, "balance_due": 0.0, "entry_count": 0})
+        for entry in client.table("member_ledger").select("*").in_("member_id", member_ids).execute().data:
+            totals = ledger[entry["member_id"]]
+            if entry["entry_type"] == "payment":
+                totals["total_paid"] -= entry["amount"]
+            else:
+                totals["total_charged"] += entry["amount"]
+            totals["balance_due"] += entry["amount"]
+            totals["entry_count"] += 1
+
+        mismatches = []
+        for member_id in member_ids:
+            expected = ledger[member_id]
+            snapshot = balances.get(member_id)
+            if snapshot is not None and all(round(snapshot[k] - v, 2) == 0 for k, v in expected.items()):
+                continue
+            if snapshot is None and expected["entry_count"] == 0:
+                continue
+            mismatches.append({
+                "member_id": member_id,
+                "snapshot": {k: snapshot[k] for k in expected} if snapshot else None,
+                "ledger": dict(expected)
+            })
+            if p_repair:
+                client.table("member_balances").upsert({"member_id": member_id, **expected}).execute()
+        return {
+            "checked": len(member_ids),
+            "last_member_id": member_ids[-1] if len(member_ids) == p_limit else None,
+            "mismatches": mismatches,
+            "repaired": len(mismatches) if p_repair else 0
+        }
+
+
+def stand_in_close_register(client: StandInClient, p_business_date: str, p_declared_cash: float, p_opening_float: float = 0,
+                            p_closed_by=None, p_notes=None, p_tolerance: float = 0):
+    """Stand-in for the close_register SQL function (cash_register.sql)"""
+    with client.lock:
+        rows = client.table("register_totals").select("*").eq("business_date", p_business_date).neq("payment_count", 0).execute().data
+        totals = [{
+            "payment_method": r["payment_method"],
+            "staff_id": None if r["staff_id"] == UNATTRIBUTED_STAFF_ID else r["staff_id"],
+            "payment_count": r["payment_count"],
+            "total_amount": r["total_amount"]
+        } for r in sorted(rows, key=lambda r: (r["payment_method"], r["staff_id"]))]
+        expected = (p_opening_float or 0) + sum(r["total_amount"] for r in rows if r["payment_method"] == "cash")
+        difference = round(p_declared_cash - expected, 2)
+        z_number = max((c["z_number"] for c in client.tables.get("register_closes", [])), default=0) + 1
+        return client.table("register_closes").insert({
+            "z_number": z_number,
+            "business_date": p_business_date,
+            "totals": totals,
+            "payment_count": sum(r["payment_count"] for r in rows),
+            "total_amount": sum(r["total_amount"] for r in rows),
+            "opening_float": p_opening_float or 0,
+            "expected_cash": expected,
+            "declared_cash": p_declared_cash,
+            "cash_difference": difference,
+            "status": "balanced" if abs(difference) <= (p_tolerance or 0) else "over" if difference > 0 else "short",
+            "notes": p_notes,
+            "closed_by": p_closed_by,
+            "closed_at": datetime.utcnow().isoformat()
+        }).execute().data[0]
+
+
+def stand_in_next_audit_version(client: StandInClient, p_entity_type: str, p_entity_id=None):
+    """Stand-in for the next_audit_version SQL function (audit_diffs.sql)"""
+    with client.lock:
+        entity_id = p_entity_id or ""
+        counter = client.table("audit_entity_versions").select("*")\
+            .eq("entity_type", p_entity_type).eq("entity_id", entity_id).execute().data
+        if not counter:
+            client.table("audit_entity_versions").insert({"entity_type": p_entity_type, "entity_id": entity_id, "version": 1}).execute()
+            return 1
+        version = counter[0]["version"] + 1
+        client.table("audit_entity_versions").update({"version": version})\
+            .eq("entity_type", p_entity_type).eq("entity_id", entity_id).execute()
+        return version
+
+
+def stand_in_close_attendance_sessions(client: StandInClient, p_sessions, p_auto_closed: bool = False):
+    """Stand-in for the close_attendance_sessions SQL function (attendance_auto_checkout.sql)"""
+    closed = []
+    with client.lock:
+        for session in p_sessions:
+            update = {"check_out_time": session["check_out_time"], "auto_closed": p_auto_closed}
+            if session.get("notes"):
+                update["notes"] = session["notes"]
+            rows = client.table("attendance").update(update)\
+                .eq("id", session["id"]).is_("check_out_time", "null").execute().data
+            closed.extend({"id": r["id"], "member_id": r["member_id"], "check_out_time": r["check_out_time"]} for r in rows)
+    return closed
+
+
+def register_stand_in_functions(client: StandInClient):
+    """Make the Postgres functions the routes call via rpc() available on the stand-in"""
+    client.register_function("aggregate_rows", stand_in_aggregate_rows)
+    client.register_function("delete_member_cascade", stand_in_delete_member_cascade)
+    client.register_function("archive_lapsed_members", stand_in_archive_lapsed_members)
+    client.register_function("reconcile_member_balances", stand_in_reconcile_member_balances)
+    client.register_function("close_register", stand_in_close_register)
+    client.register_function("next_audit_version", stand_in_next_audit_version)
+    client.register_function("close_attendance_sessions", stand_in_close_attendance_sessions)
+
+
+def build_app(members: int, seed: int):
+    """Install a freshly seeded stand-in and return (app, client, fixtures)"""
+    client = StandInClient()
+    fixtures = seed_gym(client, members=members, seed=seed)
+    register_stand_in_functions(client)
+    install_clients(client)
+
+    from server import app
+    from routes.auth import get_current_user
+    from services.occupancy import occupancy_tracker
+
+    # Routes that require a bearer token act as the seeded admin
+    admin = fixtures["admin"]
+    app.dependency_overrides[get_current_user] = lambda: admin
+    occupancy_tracker.rebuild(client)
+    return app, client, fixtures
+
+
+async def run_scenario(app, fixtures: Dict[str, Any], name: str, requests: int,
+                       concurrency: int, seed: int) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    rng = random.Random(seed)
+    planned = [scenario(fixtures, i, rng) for i in range(requests)]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    next_index = iter(range(requests))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as http:
+        async def worker():
+            for i in next_index:
+                request = planned[i]
+                started = time.perf_counter()
+                try:
+                    response = await http.request(request.method, request.path, json=request.json, params=request.params)
+                    status = response.status_code
+                except Exception:
+                    status = 0
+                latencies[request.label].append((time.perf_counter() - started) * 1000)
+                statuses[request.label][status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for label, values in latencies.items():
+        values.sort()
+        endpoints[label] = {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "statuses": dict(sorted(statuses[label].items())),
+        }
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(results: List[Dict[str, Any]], db_requests: int):
+    header = f"{'endpoint':<40} {'n':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses"
+    for result in results:
+        print(f"\n== {result['scenario']} ({result['requests']} requests, concurrency {result['concurrency']}, "
+              f"{result['rps']} rps overall)")
+        print(header)
+        for label, stats in result["endpoints"].items():
+            statuses = " ".join(f"{code}:{count}" for code, count in stats["statuses"].items())
+            print(f"{label:<40} {stats['requests']:>6} {stats['rps']:>8} {stats['p50_ms']:>9} "
+                  f"{stats['p95_ms']:>9} {stats['p99_ms']:>9}  {statuses}")
+    print(f"\nstand-in queries executed: {db_requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against an in-memory Supabase stand-in")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("-n", "--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--members", type=int, default=500, help="members to seed")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and scenarios")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Route-level error logging would drown the report
+    logging.disable(logging.WARNING)
+
+    app, client, fixtures = build_app(args.members, args.seed)
+    results = [
+        asyncio.run(run_scenario(app, fixtures, name, args.requests, args.concurrency, args.seed))
+        for name in args.scenario or list(SCENARIOS)
+    ]
+    print_report(results, client.request_count)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"members": args.members, "results": results}, indent=2))
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
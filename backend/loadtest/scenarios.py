@@ -0,0 +1,74 @@
+"""
+Load-test scenarios
+Each scenario turns a request number into one HTTP request against the app.
+The label groups latencies per endpoint in the report.
+"""
+import random
+from datetime import date, timedelta
+from typing import Dict, Any, Callable, NamedTuple, Optional
+
+
+class ScenarioRequest(NamedTuple):
+    label: str
+    method: str
+    path: str
+    json: Optional[Dict[str, Any]] = None
+    params: Optional[Dict[str, Any]] = None
+
+
+Scenario = Callable[[Dict[str, Any], int, random.Random], ScenarioRequest]
+
+
+def qr_scan_burst(fixtures: Dict[str, Any], i: int, rng: random.Random) -> ScenarioRequest:
+    """Morning rush at the kiosk: members scan in (and some scan out again)"""
+    member = rng.choice(fixtures["members"])
+    return ScenarioRequest("POST /qr-attendance/scan", "POST", "/api/qr-attendance/scan",
+                           json={"qr_code": member["qr_code"]})
+
+
+def dashboard_load(fixtures: Dict[str, Any], i: int, rng: random.Random) -> ScenarioRequest:
+    """Admin dashboard opening: the widgets fire their requests together"""
+    widgets = [
+        ("GET /reports/dashboard", "/api/reports/dashboard", None),
+        ("GET /reports/charts/revenue-trend", "/api/reports/charts/revenue-trend", {"days": 30}),
+        ("GET /reports/charts/attendance-trend", "/api/reports/charts/attendance-trend", {"days": 30}),
+        ("GET /reports/charts/payment-methods", "/api/reports/charts/payment-methods", None),
+        ("GET /occupancy", "/api/occupancy", None),
+    ]
+    label, path, params = widgets[i % len(widgets)]
+    return ScenarioRequest(label, "GET", path, params=params)
+
+
+def member_list(fixtures: Dict[str, Any], i: int, rng: random.Random) -> ScenarioRequest:
+    """Reception browsing and searching the member list"""
+    if i % 2:
+        member = rng.choice(fixtures["members"])
+        return ScenarioRequest("GET /members/search", "GET", "/api/members/search",
+                               params={"q": member["full_name"].split()[0][:3]})
+    return ScenarioRequest("GET /members", "GET", "/api/members", params={"status": "active"})
+
+
+def export(fixtures: Dict[str, Any], i: int, rng: random.Random) -> ScenarioRequest:
+    """Month-end CSV exports"""
+    kind = ["members", "payments", "attendance"][i % 3]
+    return ScenarioRequest(f"GET /export/{kind}", "GET", f"/api/api/export/{kind}", params={"format": "csv"})
+
+
+def booking_rush(fixtures: Dict[str, Any], i: int, rng: random.Random) -> ScenarioRequest:
+    """Class bookings opening for next week; later requests hit full classes"""
+    gym_class = fixtures["classes"][i % len(fixtures["classes"])]
+    member = fixtures["members"][i % len(fixtures["members"])]
+    return ScenarioRequest("POST /class-bookings", "POST", "/api/api/class-bookings/", json={
+        "class_id": gym_class["id"],
+        "member_id": member["id"],
+        "booking_date": (date.today() + timedelta(days=7)).isoformat()
+    })
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "qr_scan_burst": qr_scan_burst,
+    "dashboard_load": dashboard_load,
+    "member_list": member_list,
+    "export": export,
+    "booking_rush": booking_rush,
+}
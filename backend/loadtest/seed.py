@@ -0,0 +1,162 @@
+"""
+Synthetic gym data for the load-test stand-in
+Deterministic for a given seed so baselines are comparable between runs.
+"""
+import uuid
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List
+
+from loadtest.stand_in import StandInClient
+
+FIRST_NAMES = ["Arjun", "Priya", "Rahul", "Anita", "Vikram", "Sneha", "Karthik", "Divya", "Suresh", "Meena",
+               "John", "Maria", "David", "Fatima", "Chen", "Aisha", "Ravi", "Lakshmi", "Imran", "Kavya"]
+LAST_NAMES = ["Kumar", "Sharma", "Reddy", "Iyer", "Nair", "Patel", "Singh", "Das", "Smith", "Khan"]
+PLANS = [("Monthly", 1, 1500.0), ("Quarterly", 3, 4000.0), ("Half Yearly", 6, 7500.0), ("Annual", 12, 14000.0)]
+CLASSES = [("Morning Yoga", "Yoga"), ("HIIT Blast", "HIIT"), ("Spin Class", "Spin"),
+           ("Strength Basics", "Strength"), ("Zumba", "Dance")]
+PAYMENT_METHODS = ["cash", "card", "upi", "bank_transfer"]
+UNATTRIBUTED_STAFF_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def seed_gym(client: StandInClient, members: int = 500, history_days: int = 30, seed: int = 42) -> Dict[str, Any]:
+    """
+    Fill the stand-in with plans, members, payments, attendance history and classes
+    Returns handles the scenarios need (admin user, member ids and QR codes, class ids)
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.utcnow()
+
+    admin = {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "email": "admin@loadtest.local",
+        "full_name": "Load Test Admin",
+        "phone": "9000000000",
+        "role": "admin",
+        "created_at": now.isoformat()
+    }
+    client.seed("users", [admin])
+    client.seed("settings", [{
+        "gym_name": "Load Test Gym", "currency": "INR", "timezone": "Asia/Kolkata", "updated_at": now.isoformat()
+    }])
+
+    plan_rows = [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": name, "description": f"{name} membership",
+         "duration_months": months, "price": price, "features": ["Gym Access"], "is_active": True}
+        for name, months, price in PLANS
+    ]
+    client.seed("plans", plan_rows)
+
+    member_rows: List[Dict[str, Any]] = []
+    for i in range(members):
+        member_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        plan = rng.choice(plan_rows)
+        start = today - timedelta(days=rng.randint(0, 365))
+        end = start + timedelta(days=30 * plan["duration_months"])
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        member_rows.append({
+            "id": member_id,
+            "full_name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}.{i}@loadtest.local",
+            "phone": f"9{rng.randint(100000000, 999999999)}",
+            "gender": rng.choice(["male", "female"]),
+            "plan_id": plan["id"],
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "status": "active" if end >= today or rng.random() < 0.1 else "expired",
+            "total_amount_due": plan["price"],
+            "amount_paid": plan["price"],
+            "balance_due": 0,
+            "qr_code": f"GYM-{member_id}-{rng.getrandbits(32):08x}",
+            "created_at": datetime.combine(start, datetime.min.time()).isoformat()
+        })
+    client.seed("members", member_rows)
+
+    payments = []
+    for member in member_rows:
+        for _ in range(rng.randint(1, 3)):
+            paid_on = today - timedelta(days=rng.randint(0, 180))
+            payments.append({
+                "member_id": member["id"],
+                "amount": rng.choice(PLANS)[2],
+                "payment_method": rng.choice(PAYMENT_METHODS),
+                "payment_date": paid_on.isoformat(),
+                "plan_id": member["plan_id"],
+                "status": "completed",
+                "payment_type": "renewal",
+                "created_at": datetime.combine(paid_on, datetime.min.time()).isoformat()
+            })
+    client.seed("payments", payments)
+
+    # Opening ledger (plan charge plus each payment) and the running balances it maintains
+    ledger = []
+    for member in member_rows:
+        ledger.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))), "member_id": member["id"], "entry_type": "charge",
+            "amount": member["total_amount_due"], "description": "Opening balance", "created_at": member["created_at"]
+        })
+    ledger.extend(
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "member_id": payment["member_id"], "entry_type": "payment",
+         "amount": -payment["amount"], "description": "Payment", "created_at": payment["created_at"]}
+        for payment in payments
+    )
+    client.seed("member_ledger", ledger)
+
+    balances: Dict[str, Dict[str, Any]] = {}
+    for entry in ledger:
+        balance = balances.setdefault(entry["member_id"], {
+            "member_id": entry["member_id"], "total_charged": 0.0, "total_paid": 0.0, "balance_due": 0.0,
+            "entry_count": 0, "last_entry_at": None, "updated_at": now.isoformat()
+        })
+        if entry["entry_type"] == "payment":
+            balance["total_paid"] -= entry["amount"]
+        else:
+            balance["total_charged"] += entry["amount"]
+        balance["balance_due"] += entry["amount"]
+        balance["entry_count"] += 1
+        balance["last_entry_at"] = max(balance["last_entry_at"] or entry["created_at"], entry["created_at"])
+    client.seed("member_balances", list(balances.values()))
+
+    # Register totals per day and method (seeded payments have no recorded_by)
+    register: Dict[tuple, Dict[str, Any]] = {}
+    for payment in payments:
+        key = (payment["payment_date"], payment["payment_method"])
+        total = register.setdefault(key, {
+            "business_date": key[0], "payment_method": key[1], "staff_id": UNATTRIBUTED_STAFF_ID,
+            "payment_count": 0, "total_amount": 0.0, "updated_at": now.isoformat()
+        })
+        total["payment_count"] += 1
+        total["total_amount"] += payment["amount"]
+    client.seed("register_totals", list(register.values()))
+
+    attendance = []
+    active_members = [m for m in member_rows if m["status"] == "active"]
+    # Past days only, so today's open sessions come from the scenarios themselves
+    for day_offset in range(1, history_days + 1):
+        day = today - timedelta(days=day_offset)
+        for member in rng.sample(active_members, k=min(len(active_members), max(1, len(active_members) // 3))):
+            check_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(5, 20), minutes=rng.randint(0, 59))
+            attendance.append({
+                "member_id": member["id"],
+                "check_in_time": check_in.isoformat(),
+                "check_out_time": (check_in + timedelta(minutes=rng.randint(30, 120))).isoformat(),
+                "date": day.isoformat(),
+                "created_at": check_in.isoformat()
+            })
+    client.seed("attendance", attendance)
+
+    class_rows = [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": name, "category": category,
+         "duration_minutes": 60, "max_capacity": 20, "schedule_day": "Monday", "schedule_time": "07:00",
+         "room": "Studio 1", "difficulty_level": "beginner", "status": "active"}
+        for name, category in CLASSES
+    ]
+    client.seed("classes", class_rows)
+
+    return {
+        "admin": admin,
+        "members": active_members,
+        "classes": class_rows,
+        "plans": plan_rows,
+    }
@@ -0,0 +1,102 @@
+"""
+Serialization and compression benchmark for the largest list endpoints
+
+For each endpoint, fetches the payload from the app (against the seeded
+in-memory stand-in) and compares the following:
+- render time with the stdlib JSON encoder versus orjson
+- bytes on the wire as raw JSON, gzip and brotli (when brotli is installed)
+
+Usage (from the backend directory):
+    python -m loadtest.serialization
+    python -m loadtest.serialization --members 5000 --repeat 20
+"""
+import time
+import gzip
+import asyncio
+import argparse
+import logging
+import statistics
+from typing import Any, Callable, Dict
+
+import httpx
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from loadtest.run import build_app
+from services.compression import brotli
+
+ENDPOINTS = [
+    ("GET /members", "/api/members", None),
+    ("GET /attendance", "/api/attendance", None),
+    ("GET /payments", "/api/payments", None),
+    ("GET /reports/revenue", "/api/reports/revenue", {"days": 365}),
+]
+
+
+def time_ms(function: Callable[[], Any], repeat: int) -> float:
+    """Median wall time of a call in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def fetch_payloads(app) -> Dict[str, Any]:
+    payloads = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        for label, path, params in ENDPOINTS:
+            response = await http.get(path, params=params, headers={"Accept-Encoding": "identity"})
+            response.raise_for_status()
+            payloads[label] = response.json()
+    return payloads
+
+
+async def wire_sizes(app, path: str, params) -> Dict[str, int]:
+    """Bytes actually sent by the app for each Accept-Encoding"""
+    sizes = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+        for encoding in encodings:
+            async with http.stream("GET", path, params=params, headers={"Accept-Encoding": encoding}) as response:
+                sizes[encoding] = sum([len(chunk) async for chunk in response.aiter_raw()])
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON encoders and response compression")
+    parser.add_argument("--members", type=int, default=2000, help="members to seed")
+    parser.add_argument("--repeat", type=int, default=10, help="timing repetitions per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    app, _, _ = build_app(args.members, args.seed)
+    payloads = asyncio.run(fetch_payloads(app))
+
+    header = (f"{'endpoint':<22} {'rows':>6} {'json ms':>8} {'orjson ms':>9} {'speedup':>7} "
+              f"{'raw KiB':>8} {'gzip KiB':>8} {'gzip ms':>7} {'br KiB':>7} {'br ms':>6}")
+    print(header)
+    for label, path, params in ENDPOINTS:
+        payload = payloads[label]
+        rows = len(payload) if isinstance(payload, list) else len(payload.get("daily_data", []))
+        stdlib_ms = time_ms(lambda: JSONResponse(payload), args.repeat)
+        orjson_ms = time_ms(lambda: ORJSONResponse(payload), args.repeat)
+        body = ORJSONResponse(payload).body
+        gzip_ms = time_ms(lambda: gzip.compress(body, 6), args.repeat)
+        sizes = asyncio.run(wire_sizes(app, path, params))
+        if brotli is not None:
+            br_ms = f"{time_ms(lambda: brotli.compress(body, quality=4), args.repeat):>6.2f}"
+            br_kib = f"{sizes['br'] / 1024:>7.1f}"
+        else:
+            br_ms, br_kib = f"{'n/a':>6}", f"{'n/a':>7}"
+        print(f"{label:<22} {rows:>6} {stdlib_ms:>8.2f} {orjson_ms:>9.2f} {stdlib_ms / orjson_ms:>6.1f}x "
+              f"{sizes['identity'] / 1024:>8.1f} {sizes['gzip'] / 1024:>8.1f} {gzip_ms:>7.2f} {br_kib} {br_ms}")
+    if brotli is None:
+        print("\nbrotli is not installed; responses fall back to gzip (pip install brotli)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+In-memory stand-in for the Supabase client
+Implements the subset of the supabase-py / postgrest query builder used by
+the routes (table().select().eq()...execute(), embeds, counts, upserts, rpc)
+so the FastAPI app can be driven without a network or a database.
+"""
+import re
+import uuid
+import threading
+from copy import deepcopy
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+from postgrest.exceptions import APIError
+
+# Primary key per table when it is not "id"
+PRIMARY_KEYS = {
+    "attendance_scan_keys": "idempotency_key",
+    "idempotency_keys": "scope,key",
+    "member_balances": "member_id",
+    "register_totals": "business_date,payment_method,staff_id",
+    "qr_revocations": "member_id",
+}
+
+# Unique constraints enforced on insert (mirrors the SQL schema files)
+UNIQUE_KEYS = {
+    "members": [("email",), ("qr_code",)],
+    "class_bookings": [("class_id", "member_id", "booking_date")],
+    "register_closes": [("business_date",)],
+}
+
+# Timestamp columns other than created_at that default to NOW()
+NOW_DEFAULTS = {
+    "audit_logs": ("timestamp",),
+}
+
+# Embeds that do not follow the "<singular>_id" foreign key naming
+SINGULAR = {"classes": "class", "members": "member", "plans": "plan"}
+
+
+def _singular(table: str) -> str:
+    if table in SINGULAR:
+        return SINGULAR[table]
+    return table[:-1] if table.endswith("s") else table
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a select list on commas that are not inside an embed"""
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _coerce(row_value: Any, value: Any) -> Tuple[Any, Any]:
+    """Make a stored value and a filter value comparable the way Postgres would"""
+    if isinstance(row_value, bool):
+        return row_value, str(value).lower() == "true"
+    if isinstance(row_value, (int, float)):
+        try:
+            return float(row_value), float(value)
+        except (TypeError, ValueError):
+            return str(row_value), str(value)
+    return str(row_value), str(value)
+
+
+def _like(pattern: str, flags: int = 0):
+    regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(f"^{regex}$", flags | re.DOTALL)
+
+
+def _matches(row: Dict[str, Any], column: str, op: str, value: Any) -> bool:
+    row_value = row.get(column)
+    if op == "is":
+        if str(value).lower() == "null":
+            return row_value is None
+        return row_value is (str(value).lower() == "true")
+    if op == "in":
+        return row_value is not None and any(_coerce(row_value, v)[0] == _coerce(row_value, v)[1] for v in value)
+    if row_value is None:
+        return False
+    if op in ("like", "ilike"):
+        return bool(_like(str(value), re.IGNORECASE if op == "ilike" else 0).match(str(row_value)))
+    left, right = _coerce(row_value, value)
+    return {
+        "eq": left == right,
+        "neq": left != right,
+        "gt": left > right,
+        "gte": left >= right,
+        "lt": left < right,
+        "lte": left <= right,
+    }[op]
+
+
+def _parse_or(expression: str) -> List[Callable[[Dict[str, Any]], bool]]:
+    """Parse 'col.op.value,and(col.op.value,...)' as passed to .or_() into row predicates"""
+    predicates = []
+    for part in _split_top_level(expression):
+        if part.startswith("and(") and part.endswith(")"):
+            inner = _parse_or(part[4:-1])
+            predicates.append(lambda row, inner=inner: all(p(row) for p in inner))
+            continue
+        column, op, value = part.split(".", 2)
+        if op == "in":
+            value = [v.strip().strip('"') for v in value.strip("()").split(",")]
+        predicates.append(lambda row, c=column, o=op, v=value: _matches(row, c, o, v))
+    return predicates
+
+
+class StandInResponse:
+    """Mimics postgrest.APIResponse (data + count)"""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class StandInQuery:
+    def __init__(self, client: "StandInClient", table: str):
+        self.client = client
+        self.table = table
+        self.method = "select"
+        self.columns = "*"
+        self.count_mode: Optional[str] = None
+        self.head = False
+        self.payload: Any = None
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List[Tuple[str, bool, Optional[bool]]] = []
+        self.offset = 0
+        self.row_limit: Optional[int] = None
+
+    # Query verbs ------------------------------------------------------
+
+    def select(self, *columns: str, count: Optional[str] = None, head: bool = False):
+        self.columns = ",".join(columns) if columns else "*"
+        self.count_mode = count
+        self.head = head
+        return self
+
+    def insert(self, json: Any, count: Optional[str] = None, returning: str = "representation",
+               upsert: bool = False, default_to_null: bool = True):
+        self.method = "upsert" if upsert else "insert"
+        self.payload = json
+        return self
+
+    def upsert(self, json: Any, count: Optional[str] = None, returning: str = "representation",
+               ignore_duplicates: bool = False, on_conflict: str = "", default_to_null: bool = True):
+        self.method = "upsert"
+        self.payload = json
+        self.on_conflict = on_conflict or None
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict[str, Any], count: Optional[str] = None, returning: str = "representation"):
+        self.method = "update"
+        self.payload = json
+        return self
+
+    def delete(self, count: Optional[str] = None, returning: str = "representation"):
+        self.method = "delete"
+        return self
+
+    # Filters ----------------------------------------------------------
+
+    def _filter(self, column: str, op: str, value: Any):
+        self.filters.append(lambda row: _matches(row, column, op, value))
+        return self
+
+    def eq(self, column: str, value: Any):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any):
+        return self._filter(column, "lte", value)
+
+    def like(self, column: str, pattern: str):
+        return self._filter(column, "like", pattern)
+
+    def ilike(self, column: str, pattern: str):
+        return self._filter(column, "ilike", pattern)
+
+    def in_(self, column: str, values: List[Any]):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column: str, value: Any):
+        return self._filter(column, "is", value)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        predicates = _parse_or(filters)
+        self.filters.append(lambda row: any(p(row) for p in predicates))
+        return self
+
+    # Modifiers --------------------------------------------------------
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, foreign_table: Optional[str] = None):
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size: int, foreign_table: Optional[str] = None):
+        self.row_limit = size
+        return self
+
+    def range(self, start: int, end: int, foreign_table: Optional[str] = None):
+        self.offset = start
+        self.row_limit = end - start + 1
+        return self
+
+    # Execution --------------------------------------------------------
+
+    def execute(self) -> StandInResponse:
+        with self.client.lock:
+            self.client.request_count += 1
+            return getattr(self, f"_execute_{self.method}")()
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return [row for row in self.client.tables.setdefault(self.table, []) if all(f(row) for f in self.filters)]
+
+    def _sorted(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for column, desc, nullsfirst in reversed(self.orders):
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: _coerce(r[column], r[column])[0], reverse=desc)
+            # Postgres puts NULLs last ascending and first descending unless told otherwise
+            first = desc if nullsfirst is None else nullsfirst
+            rows = missing + present if first else present + missing
+        return rows
+
+    def _execute_select(self) -> StandInResponse:
+        embeds = self.client.parse_embeds(self.table, self.columns)
+        rows = []
+        for row in self._rows():
+            shaped = self.client.shape(self.table, row, self.columns, embeds)
+            if shaped is not None:
+                rows.append(shaped)
+        rows = self._sorted(rows)
+        count = len(rows) if self.count_mode else None
+        end = None if self.row_limit is None else self.offset + self.row_limit
+        rows = rows[self.offset:end]
+        return StandInResponse([] if self.head else deepcopy(rows), count)
+
+    def _execute_insert(self) -> StandInResponse:
+        records = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = [self.client.insert_row(self.table, record) for record in records]
+        return StandInResponse(deepcopy(inserted), len(inserted))
+
+    def _execute_upsert(self) -> StandInResponse:
+        records = self.payload if isinstance(self.payload, list) else [self.payload]
+        conflict = tuple(c.strip() for c in (self.on_conflict or PRIMARY_KEYS.get(self.table, "id")).split(","))
+        table = self.client.tables.setdefault(self.table, [])
+        written = []
+        for record in records:
+            existing = None
+            if all(record.get(c) is not None for c in conflict):
+                existing = next((r for r in table if all(r.get(c) == record[c] for c in conflict)), None)
+            if existing is None:
+                written.append(self.client.insert_row(self.table, record))
+            elif not self.ignore_duplicates:
+                existing.update(deepcopy(record))
+                written.append(existing)
+        return StandInResponse(deepcopy(written), len(written))
+
+    def _execute_update(self) -> StandInResponse:
+        rows = self._rows()
+        for row in rows:
+            row.update(deepcopy(self.payload))
+        return StandInResponse(deepcopy(rows), len(rows))
+
+    def _execute_delete(self) -> StandInResponse:
+        rows = self._rows()
+        ids = {id(row) for row in rows}
+        self.client.tables[self.table] = [r for r in self.client.tables[self.table] if id(r) not in ids]
+        return StandInResponse(deepcopy(rows), len(rows))
+
+
+class StandInRPC:
+    def __init__(self, client: "StandInClient", name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> StandInResponse:
+        function = self.client.functions.get(self.name)
+        if function is None:
+            raise APIError({
+                "code": "PGRST202",
+                "message": f"Could not find the function public.{self.name} in the schema cache",
+                "hint": None,
+                "details": None
+            })
+        with self.client.lock:
+            self.client.request_count += 1
+            return StandInResponse(function(self.client, **self.params))
+
+
+class StandInClient:
+    """Thread-safe in-memory tables with a supabase-py compatible surface"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.functions: Dict[str, Callable[..., Any]] = {}
+        self.request_count = 0
+
+    def table(self, name: str) -> StandInQuery:
+        return StandInQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> StandInRPC:
+        return StandInRPC(self, name, params or {})
+
+    def register_function(self, name: str, function: Callable[..., Any]):
+        """Make an rpc() call available; the function receives the client and the rpc params"""
+        self.functions[name] = function
+
+    # Row storage -----------------------------------------------------
+
+    def insert_row(self, table: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = deepcopy(record)
+        if PRIMARY_KEYS.get(table, "id") == "id":
+            row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", datetime.utcnow().isoformat())
+        for column in NOW_DEFAULTS.get(table, ()):
+            row.setdefault(column, row["created_at"])
+        rows = self.tables.setdefault(table, [])
+        primary_key = tuple(c.strip() for c in PRIMARY_KEYS.get(table, "id").split(","))
+        for columns in UNIQUE_KEYS.get(table, []) + [primary_key]:
+            if all(row.get(c) is not None for c in columns) and any(
+                all(r.get(c) == row[c] for c in columns) for r in rows
+            ):
+                raise APIError({
+                    "code": "23505",
+                    "message": f"duplicate key value violates unique constraint on {table}({', '.join(columns)})",
+                    "hint": None,
+                    "details": None
+                })
+        rows.append(row)
+        return row
+
+    def seed(self, table: str, rows: List[Dict[str, Any]]):
+        with self.lock:
+            for row in rows:
+                self.insert_row(table, row)
+
+    # Select shaping ---------------------------------------------------
+
+    def parse_embeds(self, table: str, columns: str) -> List[Tuple[str, bool, str]]:
+        embeds = []
+        for part in _split_top_level(columns):
+            match = re.match(r"^(\w+)(!inner)?\((.*)\)$", part)
+            if match:
+                embeds.append((match.group(1), bool(match.group(2)), match.group(3)))
+        return embeds
+
+    def shape(self, table: str, row: Dict[str, Any], columns: str,
+              embeds: List[Tuple[str, bool, str]]) -> Optional[Dict[str, Any]]:
+        """Project a row to the selected columns and resolve embeds; None drops the row (!inner)"""
+        parts = [p for p in _split_top_level(columns) if "(" not in p]
+        if not parts or "*" in parts:
+            shaped = dict(row)
+        else:
+            shaped = {p: row.get(p) for p in parts}
+
+        for name, inner, sub_columns in embeds:
+            sub_embeds = self.parse_embeds(name, sub_columns)
+            foreign_key = f"{_singular(name)}_id"
+            if foreign_key in row:
+                # Many-to-one: this row points at the embedded table
+                target = next((r for r in self.tables.get(name, []) if r.get("id") == row[foreign_key]), None)
+                value = self.shape(name, target, sub_columns, sub_embeds) if target else None
+                if inner and value is None:
+                    return None
+            else:
+                # One-to-many: the embedded table points back at this row
+                back_key = f"{_singular(table)}_id"
+                value = [
+                    self.shape(name, r, sub_columns, sub_embeds)
+                    for r in self.tables.get(name, []) if r.get(back_key) == row.get("id")
+                ]
+                if inner and not value:
+                    return None
+            shaped[name] = value
+        return shaped
@@ -0,0 +1,120 @@
+"""
+Startup benchmark and import-time budget check
+
+Starts fresh interpreters that import the app and serve one request, then
+reports import time, time-to-first-request (from process spawn) and baseline
+RSS. Exits non-zero when the median import time exceeds the budget or a heavy
+dependency is imported at startup, so it can gate CI.
+
+Usage (from the backend directory):
+    python -m loadtest.startup
+    python -m loadtest.startup --runs 10 --budget-ms 1200
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Only loaded on first use by the endpoints that need them
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "reportlab", "qrcode", "PIL", "jinja2", "pyinstrument")
+
+
+def rss_kb() -> int:
+    """Resident set size of this process in KiB"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is KiB on Linux and bytes on macOS; this is only a fallback
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child():
+    """Runs in the spawned interpreter: import, serve one request, print measurements"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    started = time.perf_counter()
+    from server import app
+    imported = time.perf_counter()
+
+    import httpx
+
+    async def first_request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as http:
+            return (await http.get("/api/")).status_code
+
+    status = asyncio.run(first_request())
+    served = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_request_ms": (served - imported) * 1000,
+        "status": status,
+        "rss_kb": rss_kb(),
+        "heavy_modules": sorted(m for m in HEAVY_MODULES if m in sys.modules),
+    }))
+
+
+def run_once() -> dict:
+    spawned = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "loadtest.startup", "--child"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Includes interpreter start-up and teardown of the child
+    result["time_to_first_request_ms"] = (time.perf_counter() - spawned) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and enforce an import-time budget")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to measure")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', '1500')),
+                        help="maximum median import time of server.py")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    # First run warms the bytecode cache and is not counted
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+
+    def median(key):
+        return statistics.median(r[key] for r in runs)
+
+    print(f"cold starts measured:        {args.runs}")
+    print(f"import server (median):      {median('import_ms'):.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"first request (median):      {median('first_request_ms'):.1f} ms")
+    print(f"time to first request:       {median('time_to_first_request_ms'):.1f} ms  (from process spawn)")
+    print(f"baseline RSS (median):       {median('rss_kb') / 1024:.1f} MiB")
+
+    failures = []
+    if median("import_ms") > args.budget_ms:
+        failures.append(f"import time {median('import_ms'):.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if any(r["status"] != 200 for r in runs):
+        failures.append("first request did not return 200")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+-- Transactional member removal and bulk archiving of lapsed members
+-- delete_member_cascade() removes a member, their history and their login in
+-- one transaction (DELETE /api/members/{id}).
+-- archive_lapsed_members() soft-deletes lapsed members in one statement: they
+-- keep their members row (status 'archived') and payments, while their
+-- attendance and class bookings move to archive tables
+-- (POST /api/members/archive).
+-- Run this in your Supabase SQL Editor after supabase_schema.sql,
+-- add_member_passwords_table.sql, advanced_features_schema.sql and
+-- attendance_auto_checkout.sql (and after time_partitioning.sql if you use it).
+
+-- ============================================================================
+-- SOFT DELETE
+-- ============================================================================
+
+ALTER TABLE members ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ;
+
+ALTER TABLE members DROP CONSTRAINT IF EXISTS members_status_check;
+ALTER TABLE members ADD CONSTRAINT members_status_check
+    CHECK (status IN ('active', 'inactive', 'expired', 'archived'));
+
+-- Lapsed-member scan: end_date < ? among members not archived yet
+CREATE INDEX IF NOT EXISTS idx_members_lapsed ON members(end_date)
+    WHERE archived_at IS NULL AND status <> 'active';
+
+-- ============================================================================
+-- ARCHIVE TABLES
+-- ============================================================================
+
+-- Same columns as the live tables, plus the time they were archived. Rows are
+-- copied with explicit column lists, so a column added to a live table later
+-- must also be added here and to archive_lapsed_members()
+CREATE TABLE IF NOT EXISTS attendance_archive (
+    LIKE attendance INCLUDING DEFAULTS,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- For archive tables created before attendance_auto_checkout.sql was run
+ALTER TABLE attendance_archive ADD COLUMN IF NOT EXISTS auto_closed BOOLEAN DEFAULT false;
+
+CREATE TABLE IF NOT EXISTS class_bookings_archive (
+    LIKE class_bookings INCLUDING DEFAULTS,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'attendance_archive_member_id_fkey') THEN
+        ALTER TABLE attendance_archive ADD CONSTRAINT attendance_archive_member_id_fkey
+            FOREIGN KEY (member_id) REFERENCES members(id) ON DELETE CASCADE;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'class_bookings_archive_member_id_fkey') THEN
+        ALTER TABLE class_bookings_archive ADD CONSTRAINT class_bookings_archive_member_id_fkey
+            FOREIGN KEY (member_id) REFERENCES members(id) ON DELETE CASCADE;
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_attendance_archive_member ON attendance_archive(member_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_class_bookings_archive_member ON class_bookings_archive(member_id);
+
+ALTER TABLE attendance_archive ENABLE ROW LEVEL SECURITY;
+ALTER TABLE class_bookings_archive ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Admins can view archived attendance" ON attendance_archive
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role = 'admin'
+        )
+    );
+
+CREATE POLICY "Admins can view archived class bookings" ON class_bookings_archive
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role = 'admin'
+        )
+    );
+
+-- ============================================================================
+-- FUNCTIONS (service role only)
+-- ============================================================================
+
+-- Delete a member with their stored password, payments, attendance, the rows
+-- that cascade from members, and their login (auth.users cascades to users).
+-- Everything happens in one transaction: on any error nothing is deleted.
+-- Returns NULL when the member does not exist, otherwise
+--   {"member_id": ..., "user_id": ..., "deleted": {"<table>": rows, ...}}
+CREATE OR REPLACE FUNCTION delete_member_cascade(p_member_id UUID)
+RETURNS JSONB
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_user_id UUID;
+    v_table TEXT;
+    v_rows BIGINT;
+    v_deleted JSONB := '{}'::JSONB;
+BEGIN
+    SELECT user_id INTO v_user_id FROM members WHERE id = p_member_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    FOREACH v_table IN ARRAY ARRAY['member_passwords', 'payments', 'attendance'] LOOP
+        EXECUTE format('DELETE FROM %I WHERE member_id = $1', v_table) USING p_member_id;
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+        v_deleted := v_deleted || jsonb_build_object(v_table, v_rows);
+    END LOOP;
+
+    DELETE FROM members WHERE id = p_member_id;
+
+    IF v_user_id IS NOT NULL THEN
+        DELETE FROM users WHERE id = v_user_id;
+        DELETE FROM auth.users WHERE id = v_user_id;
+    END IF;
+
+    RETURN jsonb_build_object('member_id', p_member_id, 'user_id', v_user_id, 'deleted', v_deleted);
+END;
+$$;
+
+-- Archive members whose membership ended more than p_lapsed_days ago (or the
+-- given p_member_ids), at most p_limit per call. Active members are never
+-- archived. Members locked by another transaction are skipped and picked up
+-- by the next call. p_dry_run only reports who would be archived.
+-- Returns {"archived": n, "member_ids": [...], "attendance_rows": n, "class_booking_rows": n}
+CREATE OR REPLACE FUNCTION archive_lapsed_members(
+    p_lapsed_days INTEGER DEFAULT 180,
+    p_limit INTEGER DEFAULT 1000,
+    p_member_ids UUID[] DEFAULT NULL,
+    p_dry_run BOOLEAN DEFAULT false
+)
+RETURNS JSONB
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    IF p_dry_run THEN
+        SELECT jsonb_build_object(
+            'archived', 0,
+            'member_ids', COALESCE(jsonb_agg(id), '[]'::JSONB),
+            'attendance_rows', 0,
+            'class_booking_rows', 0
+        ) INTO v_result
+        FROM (
+            SELECT id FROM members
+            WHERE archived_at IS NULL AND status <> 'active'
+              AND (CASE WHEN p_member_ids IS NULL THEN end_date < CURRENT_DATE - p_lapsed_days
+                        ELSE id = ANY(p_member_ids) END)
+            ORDER BY end_date
+            LIMIT p_limit
+        ) candidates;
+        RETURN v_result;
+    END IF;
+
+    WITH targets AS (
+        SELECT id FROM members
+        WHERE archived_at IS NULL AND status <> 'active'
+          AND (CASE WHEN p_member_ids IS NULL THEN end_date < CURRENT_DATE - p_lapsed_days
+                    ELSE id = ANY(p_member_ids) END)
+        ORDER BY end_date
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), archived AS (
+        UPDATE members m SET status = 'archived', archived_at = NOW()
+        FROM targets
+        WHERE m.id = targets.id
+        RETURNING m.id
+    ), moved_attendance AS (
+        DELETE FROM attendance a USING archived
+        WHERE a.member_id = archived.id
+        RETURNING a.*
+    ), archived_attendance AS (
+        INSERT INTO attendance_archive (id, member_id, check_in_time, check_out_time, notes, date, created_at, auto_closed)
+        SELECT id, member_id, check_in_time, check_out_time, notes, date, created_at, auto_closed
+        FROM moved_attendance
+        RETURNING 1
+    ), moved_bookings AS (
+        DELETE FROM class_bookings b USING archived
+        WHERE b.member_id = archived.id
+        RETURNING b.*
+    ), archived_bookings AS (
+        INSERT INTO class_bookings_archive (id, class_id, member_id, booking_date, status, booked_at, cancelled_at, cancellation_reason)
+        SELECT id, class_id, member_id, booking_date, status, booked_at, cancelled_at, cancellation_reason
+        FROM moved_bookings
+        RETURNING 1
+    )
+    SELECT jsonb_build_object(
+        'archived', (SELECT count(*) FROM archived),
+        'member_ids', COALESCE((SELECT jsonb_agg(id) FROM archived), '[]'::JSONB),
+        'attendance_rows', (SELECT count(*) FROM archived_attendance),
+        'class_booking_rows', (SELECT count(*) FROM archived_bookings)
+    ) INTO v_result;
+
+    RETURN v_result;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION delete_member_cascade(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION archive_lapsed_members(INTEGER, INTEGER, UUID[], BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION delete_member_cascade(UUID) TO service_role;
+GRANT EXECUTE ON FUNCTION archive_lapsed_members(INTEGER, INTEGER, UUID[], BOOLEAN) TO service_role;
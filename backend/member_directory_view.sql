@@ -0,0 +1,46 @@
+-- Member directory view
+-- Denormalized member list (plan name, balance due, last check-in, visit count)
+-- served by GET /api/members/directory in a single query.
+-- Run this in your Supabase SQL Editor after add_payment_tracking.sql and
+-- member_ledger.sql
+
+-- A plain view is always fresh, so no refresh step is needed after writes.
+-- Balances come from the running totals in member_balances; the LATERAL
+-- subquery only touches the attendance rows of the members on the requested
+-- page when sorting by a member column.
+CREATE OR REPLACE VIEW member_directory
+WITH (security_invoker = true) AS
+SELECT
+    m.id,
+    m.user_id,
+    m.full_name,
+    m.email,
+    m.phone,
+    m.gender,
+    m.status,
+    m.plan_id,
+    p.name AS plan_name,
+    COALESCE(p.price, 0) AS plan_price,
+    COALESCE(mb.total_paid, 0) AS amount_paid,
+    GREATEST(COALESCE(mb.balance_due, 0), 0) AS balance_due,
+    att.last_check_in,
+    COALESCE(att.attendance_count, 0) AS attendance_count,
+    m.start_date,
+    m.end_date,
+    m.qr_code,
+    m.created_at
+FROM members m
+LEFT JOIN plans p ON p.id = m.plan_id
+LEFT JOIN member_balances mb ON mb.member_id = m.id
+LEFT JOIN LATERAL (
+    SELECT MAX(date) AS last_check_in, COUNT(*) AS attendance_count
+    FROM attendance
+    WHERE attendance.member_id = m.id
+) att ON true;
+
+-- Supporting indexes for the directory sort/filter columns
+CREATE INDEX IF NOT EXISTS idx_members_full_name ON members(full_name);
+CREATE INDEX IF NOT EXISTS idx_members_end_date ON members(end_date);
+CREATE INDEX IF NOT EXISTS idx_members_created_at ON members(created_at);
+
+COMMENT ON VIEW member_directory IS 'Member list with plan name, balance due and attendance summary for the admin member grid';
@@ -0,0 +1,393 @@
+-- Member ledger and incrementally maintained balances
+-- member_ledger is an append-only list of everything that changes what a
+-- member owes (charges, payments, adjustments, refunds). member_balances holds
+-- one running total per member, updated by a trigger as entries are appended,
+-- so reading a balance is a primary-key lookup instead of a sum over payments.
+--
+-- Entries are posted automatically:
+-- - payments: completed payments post a payment entry; editing or deleting
+--   a payment posts a reversing entry (replaces update_member_balance, which
+--   only handled inserts)
+-- - members: a new member is charged their plan price (or total_amount_due
+--   when they have no plan); a plan change posts the price difference
+-- Charges, adjustments and refunds can also be posted by hand
+-- (POST /api/balance/ledger).
+--
+-- reconcile_member_balances() checks the running totals against the ledger in
+-- batches and optionally repairs them (services/ledger_reconciler.py).
+--
+-- Run this in your Supabase SQL Editor after add_payment_tracking.sql, then
+-- re-run aggregate_rows.sql and member_directory_view.sql (both read
+-- member_balances now). Existing members and completed payments are posted to
+-- the ledger on the first run.
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS member_ledger (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    member_id UUID NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    entry_type TEXT NOT NULL CHECK (entry_type IN ('charge', 'payment', 'adjustment', 'refund')),
+    -- Effect on the balance due: charges and refunds are positive, payments
+    -- negative (a reversed payment positive), adjustments either way
+    amount DECIMAL(10,2) NOT NULL CHECK (amount <> 0),
+    payment_id UUID,  -- payment that posted the entry (no FK: entries outlive deleted payments)
+    description TEXT,
+    created_by UUID REFERENCES users(id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_member_ledger_member ON member_ledger(member_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_member_ledger_payment ON member_ledger(payment_id) WHERE payment_id IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS member_balances (
+    member_id UUID PRIMARY KEY REFERENCES members(id) ON DELETE CASCADE,
+    total_charged DECIMAL(12,2) NOT NULL DEFAULT 0,  -- charges + adjustments
+    total_paid DECIMAL(12,2) NOT NULL DEFAULT 0,  -- payments - refunds
+    balance_due DECIMAL(12,2) NOT NULL DEFAULT 0,  -- sum of all entries (negative when overpaid)
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    last_entry_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Members with an outstanding balance, largest first (GET /api/balance/members-with-balance)
+CREATE INDEX IF NOT EXISTS idx_member_balances_due ON member_balances(balance_due DESC) WHERE balance_due > 0;
+
+ALTER TABLE member_ledger ENABLE ROW LEVEL SECURITY;
+ALTER TABLE member_balances ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Members can view own ledger" ON member_ledger
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM members WHERE members.id = member_ledger.member_id AND members.user_id = auth.uid()
+        )
+    );
+
+CREATE POLICY "Admins and trainers can view all ledger entries" ON member_ledger
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role IN ('admin', 'trainer')
+        )
+    );
+
+CREATE POLICY "Members can view own balance" ON member_balances
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM members WHERE members.id = member_balances.member_id AND members.user_id = auth.uid()
+        )
+    );
+
+CREATE POLICY "Admins and trainers can view all balances" ON member_balances
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role IN ('admin', 'trainer')
+        )
+    );
+
+-- ============================================================================
+-- LEDGER TRIGGERS
+-- ============================================================================
+
+-- Entries are never edited or removed; mistakes are corrected with a new entry.
+-- They only go away together with their member (ON DELETE CASCADE).
+CREATE OR REPLACE FUNCTION member_ledger_append_only()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' AND NOT EXISTS (SELECT 1 FROM members WHERE id = OLD.member_id) THEN
+        RETURN OLD;
+    END IF;
+    RAISE EXCEPTION 'member_ledger is append-only: post a correcting entry instead';
+END;
+$$;
+
+DROP TRIGGER IF EXISTS member_ledger_append_only ON member_ledger;
+CREATE TRIGGER member_ledger_append_only
+    BEFORE UPDATE OR DELETE ON member_ledger
+    FOR EACH ROW
+    EXECUTE FUNCTION member_ledger_append_only();
+
+-- Add a new entry to the member's running totals. The upsert locks the
+-- member's balance row, so concurrent entries are applied one after another.
+-- members.total_amount_due / amount_paid / balance_due are kept in step for
+-- existing readers.
+CREATE OR REPLACE FUNCTION apply_member_ledger_entry()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_balance member_balances;
+BEGIN
+    INSERT INTO member_balances AS b (member_id, total_charged, total_paid, balance_due, entry_count, last_entry_at, updated_at)
+    VALUES (
+        NEW.member_id,
+        CASE WHEN NEW.entry_type IN ('charge', 'adjustment') THEN NEW.amount ELSE 0 END,
+        CASE WHEN NEW.entry_type IN ('payment', 'refund') THEN -NEW.amount ELSE 0 END,
+        NEW.amount,
+        1,
+        NEW.created_at,
+        NOW()
+    )
+    ON CONFLICT (member_id) DO UPDATE SET
+        total_charged = b.total_charged + EXCLUDED.total_charged,
+        total_paid = b.total_paid + EXCLUDED.total_paid,
+        balance_due = b.balance_due + EXCLUDED.balance_due,
+        entry_count = b.entry_count + 1,
+        last_entry_at = GREATEST(b.last_entry_at, EXCLUDED.last_entry_at),
+        updated_at = NOW()
+    RETURNING * INTO v_balance;
+
+    UPDATE members SET
+        total_amount_due = v_balance.total_charged,
+        amount_paid = v_balance.total_paid,
+        balance_due = v_balance.balance_due
+    WHERE id = NEW.member_id;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS member_ledger_apply ON member_ledger;
+CREATE TRIGGER member_ledger_apply
+    AFTER INSERT ON member_ledger
+    FOR EACH ROW
+    EXECUTE FUNCTION apply_member_ledger_entry();
+
+-- Post completed payments; edits and deletes reverse what the old row posted
+CREATE OR REPLACE FUNCTION post_payment_to_ledger()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_old_counted BOOLEAN := false;
+    v_new_counted BOOLEAN := false;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        v_old_counted := OLD.status IN ('completed', 'paid') AND OLD.amount <> 0;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        v_new_counted := NEW.status IN ('completed', 'paid') AND NEW.amount <> 0;
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND v_old_counted AND v_new_counted
+       AND OLD.amount = NEW.amount AND OLD.member_id = NEW.member_id THEN
+        RETURN NULL;
+    END IF;
+
+    -- Skip the reversal when the member itself is being deleted
+    IF v_old_counted AND EXISTS (SELECT 1 FROM members WHERE id = OLD.member_id) THEN
+        INSERT INTO member_ledger (member_id, entry_type, amount, payment_id, description)
+        VALUES (
+            OLD.member_id, 'payment', OLD.amount, OLD.id,
+            CASE WHEN TG_OP = 'DELETE' THEN 'Payment deleted' ELSE 'Payment changed (reversal)' END
+        );
+    END IF;
+
+    IF v_new_counted THEN
+        INSERT INTO member_ledger (member_id, entry_type, amount, payment_id, description)
+        VALUES (NEW.member_id, 'payment', -NEW.amount, NEW.id, COALESCE(NEW.description, 'Payment'));
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+-- Replaces the insert-only balance trigger from add_payment_tracking.sql
+DROP TRIGGER IF EXISTS payment_balance_update ON payments;
+DROP FUNCTION IF EXISTS update_member_balance();
+
+DROP TRIGGER IF EXISTS payment_ledger_post ON payments;
+CREATE TRIGGER payment_ledger_post
+    AFTER INSERT OR UPDATE OR DELETE ON payments
+    FOR EACH ROW
+    EXECUTE FUNCTION post_payment_to_ledger();
+
+-- Charge new members for their plan and post plan price changes
+CREATE OR REPLACE FUNCTION post_member_charge_to_ledger()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_new_price DECIMAL(10,2);
+    v_old_price DECIMAL(10,2);
+    v_amount DECIMAL(10,2);
+BEGIN
+    SELECT price INTO v_new_price FROM plans WHERE id = NEW.plan_id;
+
+    IF TG_OP = 'INSERT' THEN
+        v_amount := COALESCE(v_new_price, NEW.total_amount_due, 0);
+    ELSE
+        SELECT price INTO v_old_price FROM plans WHERE id = OLD.plan_id;
+        v_amount := COALESCE(v_new_price, 0) - COALESCE(v_old_price, 0);
+    END IF;
+
+    IF v_amount <> 0 THEN
+        INSERT INTO member_ledger (member_id, entry_type, amount, description)
+        VALUES (
+            NEW.id,
+            CASE WHEN v_amount > 0 THEN 'charge' ELSE 'adjustment' END,
+            v_amount,
+            CASE WHEN TG_OP = 'INSERT' THEN 'Membership charge' ELSE 'Plan changed' END
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS member_ledger_charge ON members;
+CREATE TRIGGER member_ledger_charge
+    AFTER INSERT ON members
+    FOR EACH ROW
+    EXECUTE FUNCTION post_member_charge_to_ledger();
+
+DROP TRIGGER IF EXISTS member_ledger_plan_change ON members;
+CREATE TRIGGER member_ledger_plan_change
+    AFTER UPDATE OF plan_id ON members
+    FOR EACH ROW
+    WHEN (OLD.plan_id IS DISTINCT FROM NEW.plan_id)
+    EXECUTE FUNCTION post_member_charge_to_ledger();
+
+-- ============================================================================
+-- OPENING BALANCES
+-- ============================================================================
+
+-- Post the current plan charge of every member and every completed payment
+-- that is not in the ledger yet. The triggers above are already in place, so
+-- rows written while this runs are posted exactly once, and re-running the
+-- file posts nothing twice.
+INSERT INTO member_ledger (member_id, entry_type, amount, description, created_at)
+SELECT m.id, 'charge', COALESCE(p.price, m.total_amount_due), 'Opening balance: membership charge', COALESCE(m.created_at, NOW())
+FROM members m
+LEFT JOIN plans p ON p.id = m.plan_id
+WHERE COALESCE(p.price, m.total_amount_due, 0) <> 0
+  AND NOT EXISTS (
+      SELECT 1 FROM member_ledger l WHERE l.member_id = m.id AND l.entry_type IN ('charge', 'adjustment')
+  );
+
+INSERT INTO member_ledger (member_id, entry_type, amount, payment_id, description, created_at)
+SELECT pay.member_id, 'payment', -pay.amount, pay.id, COALESCE(pay.description, 'Payment'),
+       COALESCE(pay.created_at, pay.payment_date::TIMESTAMPTZ)
+FROM payments pay
+WHERE pay.status IN ('completed', 'paid') AND pay.amount <> 0
+  AND NOT EXISTS (SELECT 1 FROM member_ledger l WHERE l.payment_id = pay.id);
+
+-- ============================================================================
+-- VERIFY / REBUILD (service role only)
+-- ============================================================================
+
+-- Compare the running totals of up to p_limit members (ordered by id, starting
+-- after p_after) with totals recomputed from the ledger. With p_repair the
+-- mismatched rows are overwritten with the recomputed totals.
+-- Returns {"checked": n, "last_member_id": id or null when done,
+--          "mismatches": [{"member_id", "snapshot": {...}, "ledger": {...}}], "repaired": n}
+CREATE OR REPLACE FUNCTION reconcile_member_balances(
+    p_after UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500,
+    p_repair BOOLEAN DEFAULT false
+)
+RETURNS JSONB
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_members UUID[];
+    v_mismatches JSONB;
+    v_repaired INTEGER := 0;
+BEGIN
+    SELECT array_agg(id ORDER BY id) INTO v_members
+    FROM (
+        SELECT id FROM members WHERE p_after IS NULL OR id > p_after ORDER BY id LIMIT p_limit
+    ) batch;
+
+    IF v_members IS NULL THEN
+        RETURN jsonb_build_object('checked', 0, 'last_member_id', NULL, 'mismatches', '[]'::JSONB, 'repaired', 0);
+    END IF;
+
+    -- Lock the running totals first: entries being appended concurrently wait
+    -- here, then add their amount on top of whatever is written below
+    PERFORM 1 FROM member_balances WHERE member_id = ANY(v_members) FOR UPDATE;
+
+    WITH ledger AS (
+        SELECT
+            batch.id AS member_id,
+            COALESCE(SUM(l.amount) FILTER (WHERE l.entry_type IN ('charge', 'adjustment')), 0) AS total_charged,
+            COALESCE(-SUM(l.amount) FILTER (WHERE l.entry_type IN ('payment', 'refund')), 0) AS total_paid,
+            COALESCE(SUM(l.amount), 0) AS balance_due,
+            COUNT(l.id) AS entry_count,
+            MAX(l.created_at) AS last_entry_at
+        FROM unnest(v_members) AS batch(id)
+        LEFT JOIN member_ledger l ON l.member_id = batch.id
+        GROUP BY batch.id
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'member_id', ledger.member_id,
+        'snapshot', CASE WHEN b.member_id IS NULL THEN NULL ELSE jsonb_build_object(
+            'total_charged', b.total_charged, 'total_paid', b.total_paid,
+            'balance_due', b.balance_due, 'entry_count', b.entry_count
+        ) END,
+        'ledger', jsonb_build_object(
+            'total_charged', ledger.total_charged, 'total_paid', ledger.total_paid,
+            'balance_due', ledger.balance_due, 'entry_count', ledger.entry_count,
+            'last_entry_at', ledger.last_entry_at
+        )
+    )), '[]'::JSONB) INTO v_mismatches
+    FROM ledger
+    LEFT JOIN member_balances b ON b.member_id = ledger.member_id
+    WHERE (b.member_id IS NULL AND ledger.entry_count > 0)
+       OR b.total_charged <> ledger.total_charged
+       OR b.total_paid <> ledger.total_paid
+       OR b.balance_due <> ledger.balance_due
+       OR b.entry_count <> ledger.entry_count;
+
+    IF p_repair AND jsonb_array_length(v_mismatches) > 0 THEN
+        WITH fixed AS (
+            SELECT
+                (m ->> 'member_id')::UUID AS member_id,
+                jsonb_typeof(m -> 'snapshot') = 'object' AS had_snapshot,
+                (m -> 'ledger' ->> 'total_charged')::DECIMAL AS total_charged,
+                (m -> 'ledger' ->> 'total_paid')::DECIMAL AS total_paid,
+                (m -> 'ledger' ->> 'balance_due')::DECIMAL AS balance_due,
+                (m -> 'ledger' ->> 'entry_count')::INTEGER AS entry_count,
+                (m -> 'ledger' ->> 'last_entry_at')::TIMESTAMPTZ AS last_entry_at
+            FROM jsonb_array_elements(v_mismatches) AS m
+        ), updated AS (
+            UPDATE member_balances b SET
+                total_charged = fixed.total_charged,
+                total_paid = fixed.total_paid,
+                balance_due = fixed.balance_due,
+                entry_count = fixed.entry_count,
+                last_entry_at = fixed.last_entry_at,
+                updated_at = NOW()
+            FROM fixed
+            WHERE b.member_id = fixed.member_id AND fixed.had_snapshot
+            RETURNING b.member_id, b.total_charged, b.total_paid, b.balance_due
+        ), inserted AS (
+            -- A balance row created by a concurrent entry since the check is
+            -- left alone; the next run re-checks it
+            INSERT INTO member_balances (member_id, total_charged, total_paid, balance_due, entry_count, last_entry_at)
+            SELECT member_id, total_charged, total_paid, balance_due, entry_count, last_entry_at
+            FROM fixed
+            WHERE NOT fixed.had_snapshot
+            ON CONFLICT (member_id) DO NOTHING
+            RETURNING member_id, total_charged, total_paid, balance_due
+        )
+        UPDATE members SET
+            total_amount_due = repaired.total_charged,
+            amount_paid = repaired.total_paid,
+            balance_due = repaired.balance_due
+        FROM (SELECT * FROM updated UNION ALL SELECT * FROM inserted) repaired
+        WHERE members.id = repaired.member_id;
+        GET DIAGNOSTICS v_repaired = ROW_COUNT;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'checked', array_length(v_members, 1),
+        'last_member_id', CASE WHEN array_length(v_members, 1) < p_limit THEN NULL ELSE v_members[array_length(v_members, 1)] END,
+        'mismatches', v_mismatches,
+        'repaired', v_repaired
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION reconcile_member_balances(UUID, INTEGER, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION reconcile_member_balances(UUID, INTEGER, BOOLEAN) TO service_role;
+
+COMMENT ON TABLE member_ledger IS 'Append-only charges, payments, adjustments and refunds per member';
+COMMENT ON TABLE member_balances IS 'Running balance per member, maintained from member_ledger by trigger';
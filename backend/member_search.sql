@@ -0,0 +1,73 @@
+-- Member search (full-text + trigram)
+-- Backs GET /api/members/search used by reception while typing.
+-- Run this in your Supabase SQL Editor
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Trigram indexes serve both fuzzy (%) and ILIKE '%term%' lookups
+CREATE INDEX IF NOT EXISTS idx_members_full_name_trgm ON members USING gin (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_members_email_trgm ON members USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_members_phone_trgm ON members USING gin (phone gin_trgm_ops);
+
+-- Full-text index on name words (prefix queries such as 'jo:* & sm:*')
+CREATE INDEX IF NOT EXISTS idx_members_full_name_fts ON members
+    USING gin (to_tsvector('simple', coalesce(full_name, '')));
+
+-- Ranked member search
+-- Matches word prefixes of the name, fuzzy name/email matches and phone substrings.
+CREATE OR REPLACE FUNCTION search_members(p_query TEXT, p_limit INTEGER DEFAULT 20)
+RETURNS TABLE (
+    id UUID,
+    full_name TEXT,
+    email TEXT,
+    phone TEXT,
+    status TEXT,
+    plan_id UUID,
+    rank REAL
+)
+LANGUAGE sql STABLE AS $$
+    WITH q AS (
+        SELECT
+            lower(trim(p_query)) AS term,
+            replace(replace(lower(trim(p_query)), '%', '\%'), '_', '\_') AS like_term,
+            regexp_replace(p_query, '[^0-9]', '', 'g') AS digits,
+            (
+                SELECT to_tsquery('simple', string_agg(word || ':*', ' & '))
+                FROM regexp_split_to_table(
+                    trim(regexp_replace(lower(p_query), '[^[:alnum:]]+', ' ', 'g')), ' '
+                ) AS word
+                WHERE word <> ''
+            ) AS tsq
+    )
+    SELECT
+        m.id,
+        m.full_name,
+        m.email,
+        m.phone,
+        m.status,
+        m.plan_id,
+        (
+            GREATEST(
+                similarity(m.full_name, q.term),
+                similarity(m.email, q.term),
+                CASE WHEN q.tsq IS NOT NULL
+                     THEN ts_rank(to_tsvector('simple', coalesce(m.full_name, '')), q.tsq)
+                     ELSE 0 END
+            )
+            + CASE WHEN lower(m.full_name) LIKE q.like_term || '%' THEN 1 ELSE 0 END
+            + CASE WHEN lower(m.email) LIKE q.like_term || '%' THEN 0.5 ELSE 0 END
+            + CASE WHEN length(q.digits) >= 3 AND m.phone LIKE '%' || q.digits || '%' THEN 0.5 ELSE 0 END
+        )::REAL AS rank
+    FROM members m, q
+    WHERE q.term <> ''
+      AND (
+            (q.tsq IS NOT NULL AND to_tsvector('simple', coalesce(m.full_name, '')) @@ q.tsq)
+         OR m.full_name % q.term
+         OR m.email ILIKE q.like_term || '%'
+         OR (length(q.digits) >= 3 AND m.phone LIKE '%' || q.digits || '%')
+      )
+    ORDER BY rank DESC, m.full_name
+    LIMIT LEAST(GREATEST(p_limit, 1), 100);
+$$;
+
+COMMENT ON FUNCTION search_members(TEXT, INTEGER) IS 'Ranked member lookup by name, email or phone for the reception search box';
@@ -137,6 +137,81 @@ class MemberResponse(BaseModel):
     created_at: str
 
 
+class MemberDirectoryEntry(BaseModel):
+    id: str
+    user_id: Optional[str] = None
+    full_name: str
+    email: str
+    phone: str
+    gender: Optional[str] = None
+    status: str
+    plan_id: Optional[str] = None
+    plan_name: Optional[str] = None
+    plan_price: float = 0
+    amount_paid: float = 0
+    balance_due: float = 0
+    last_check_in: Optional[str] = None
+    attendance_count: int = 0
+    start_date: str
+    end_date: str
+    qr_code: Optional[str] = None
+    created_at: str
+
+
+class MemberDirectoryPage(BaseModel):
+    data: List[MemberDirectoryEntry]
+    count: int
+    page: int
+    page_size: int
+    total_pages: int
+
+
+class MemberSearchResult(BaseModel):
+    id: str
+    full_name: str
+    email: str
+    phone: str
+    status: str
+    plan_id: Optional[str] = None
+    rank: float = 0
+
+
+class MemberArchiveRequest(BaseModel):
+    lapsed_days: int = 180  # Archive members whose end_date is further back than this
+    limit: int = 1000
+    member_ids: Optional[List[str]] = None  # Archive these members instead (active members are skipped)
+    dry_run: bool = False
+
+
+class MemberArchiveResult(BaseModel):
+    archived: int
+    member_ids: List[str]
+    attendance_rows: int
+    class_booking_rows: int
+    dry_run: bool = False
+
+
+class MemberStatementLine(BaseModel):
+    date: str
+    type: str  # ledger entry type, or invoice / installment / payment_<status> (these leave the balance unchanged)
+    reference: Optional[str] = None
+    description: str
+    debit: Optional[float] = None
+    credit: Optional[float] = None
+    balance: float
+
+
+class MemberStatement(BaseModel):
+    member: dict
+    from_date: Optional[str] = None
+    to_date: Optional[str] = None
+    opening_balance: float
+    closing_balance: float
+    total_debits: float
+    total_credits: float
+    lines: List[MemberStatementLine]
+
+
 # Plan Models
 class PlanCreate(BaseModel):
     name: str
@@ -188,6 +263,7 @@ class AttendanceResponse(BaseModel):
     check_out_time: Optional[str] = None
     notes: Optional[str] = None
     date: str
+    auto_closed: Optional[bool] = False
     created_at: str
 
 
@@ -207,6 +283,38 @@ class QRScanResponse(BaseModel):
     attendance_id: Optional[str] = None
 
 
+class QRBatchScanItem(BaseModel):
+    qr_code: str
+    scanned_at: datetime
+    idempotency_key: str
+    notes: Optional[str] = None
+
+
+class QRBatchScanRequest(BaseModel):
+    device_id: Optional[str] = None
+    scans: List[QRBatchScanItem]
+
+
+class QRBatchScanResult(BaseModel):
+    idempotency_key: str
+    success: bool
+    action: Optional[str] = None  # "check_in", "check_out" or "duplicate"
+    member_id: Optional[str] = None
+    member_name: Optional[str] = None
+    attendance_id: Optional[str] = None
+    timestamp: str
+    message: str
+
+
+class QRBatchScanResponse(BaseModel):
+    processed: int
+    check_ins: int
+    check_outs: int
+    duplicates: int
+    failed: int
+    results: List[QRBatchScanResult]
+
+
 # Payment Models
 class PaymentCreate(BaseModel):
     member_id: str
@@ -270,6 +378,99 @@ class PaymentResponse(BaseModel):
     payment_type: Optional[str] = "initial"
     is_partial: Optional[bool] = False
     remaining_balance: Optional[float] = 0
+    recorded_by: Optional[str] = None
+    created_at: str
+
+
+class PaymentBulkCreate(BaseModel):
+    payments: List[PaymentCreate]
+    generate_invoices: bool = False  # Queue a paid invoice for every completed payment
+    all_or_nothing: bool = True  # Insert nothing when any row is invalid
+
+
+class PaymentBulkRowResult(BaseModel):
+    index: int
+    status: str  # created, invalid, or skipped (valid but not inserted because another row was invalid)
+    payment: Optional[PaymentResponse] = None
+    balance_due: Optional[float] = None  # Member's balance after this row (negative when in credit)
+    error: Optional[str] = None
+
+
+class PaymentBulkResult(BaseModel):
+    created: int
+    failed: int
+    invoices_queued: int = 0
+    results: List[PaymentBulkRowResult]
+
+
+class RegisterTotal(BaseModel):
+    payment_method: Optional[str] = None
+    staff_id: Optional[str] = None
+    staff_name: Optional[str] = None
+    payment_count: int
+    total_amount: float
+
+
+class ZReport(BaseModel):
+    id: str
+    z_number: int
+    business_date: str
+    totals: List[RegisterTotal]
+    payment_count: int
+    total_amount: float
+    opening_float: float
+    expected_cash: float
+    declared_cash: float
+    cash_difference: float  # declared - expected (negative when short)
+    status: str  # balanced, over or short
+    notes: Optional[str] = None
+    closed_by: Optional[str] = None
+    closed_at: str
+
+
+class RegisterDay(BaseModel):
+    business_date: str
+    payment_count: int
+    total_amount: float
+    cash_total: float
+    by_method: List[RegisterTotal]
+    by_staff: List[RegisterTotal]
+    closed: bool = False
+    z_report: Optional[ZReport] = None
+    # Completed payments written for the day after it was closed (live totals - Z-report)
+    post_close_count: int = 0
+    post_close_amount: float = 0
+
+
+class RegisterCloseRequest(BaseModel):
+    business_date: Optional[date] = None  # Defaults to today
+    declared_cash: float  # Cash counted in the drawer, including the opening float
+    opening_float: float = 0
+    notes: Optional[str] = None
+
+
+class LedgerEntryType(str, Enum):
+    # Entries that can be posted by hand; payment entries come from the payments table
+    charge = "charge"
+    adjustment = "adjustment"
+    refund = "refund"
+
+
+class LedgerEntryCreate(BaseModel):
+    member_id: str
+    entry_type: LedgerEntryType
+    amount: float  # Charges and refunds are positive; adjustments are signed (positive increases the balance due)
+    description: Optional[str] = None
+
+
+class LedgerEntryResponse(BaseModel):
+    id: str
+    member_id: str
+    entry_type: str
+    amount: float
+    payment_id: Optional[str] = None
+    description: Optional[str] = None
+    created_by: Optional[str] = None
     created_at: str
 
 
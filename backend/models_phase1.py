@@ -232,6 +232,8 @@ class InvoiceCreate(InvoiceBase):
     payment_id: Optional[str] = None
     installment_payment_id: Optional[str] = None
     gstin: Optional[str] = None
+    place_of_supply: Optional[str] = None  # Customer's GST state code, e.g. "29"; defaults to the gym's state
+    customer_gstin: Optional[str] = None  # For registered (B2B) customers
 
 
 class InvoiceUpdate(BaseModel):
@@ -251,6 +253,8 @@ class Invoice(InvoiceBase):
     cgst: float = 0
     sgst: float = 0
     igst: float = 0
+    place_of_supply: Optional[str] = None
+    customer_gstin: Optional[str] = None
     status: InvoiceStatus = InvoiceStatus.DRAFT
     created_at: datetime
     updated_at: datetime
@@ -0,0 +1,48 @@
+"""
+Partition maintenance for attendance and audit_logs (time_partitioning.sql)
+
+Pre-creates upcoming monthly partitions and lists partitions past the
+retention window (ATTENDANCE_RETENTION_MONTHS / AUDIT_LOG_RETENTION_MONTHS).
+With --archive those partitions are dumped to PARTITION_ARCHIVE_DIR as
+gzip-compressed JSON lines and then detached and dropped.
+
+Usage:
+    python partition_maintenance.py              # pre-create and report only
+    python partition_maintenance.py --archive    # also archive expired partitions
+"""
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+from pathlib import Path
+import logging
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from supabase_client import get_supabase_service
+from services.partition_manager import partition_manager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-create and archive monthly partitions")
+    parser.add_argument("--archive", action="store_true", help="archive and drop partitions past retention")
+    args = parser.parse_args()
+
+    supabase = get_supabase_service()
+    if not supabase:
+        logger.error("Failed to connect to Supabase")
+        sys.exit(1)
+
+    result = partition_manager.run(supabase, archive=args.archive)
+    print(json.dumps(result, indent=2))
+    if result["expired_not_archived"]:
+        logger.info("Run with --archive to archive and drop the expired partitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+-- Revocation list for signed (GYM2) member QR codes
+-- Signed codes are verified without a database lookup; regenerating a member's
+-- code records a cut-off here so every code issued before it stops working.
+-- Run this in your Supabase SQL Editor
+
+CREATE TABLE IF NOT EXISTS qr_revocations (
+    member_id UUID PRIMARY KEY REFERENCES members(id) ON DELETE CASCADE,
+    revoked_before BIGINT NOT NULL,  -- Unix epoch seconds; codes issued earlier are rejected
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_qr_revocations_updated ON qr_revocations(updated_at);
+
+ALTER TABLE qr_revocations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Admins and trainers can manage QR revocations" ON qr_revocations
+    FOR ALL USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role IN ('admin', 'trainer')
+        )
+    );
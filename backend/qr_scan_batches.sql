@@ -0,0 +1,25 @@
+-- Idempotency keys for batched kiosk QR scans
+-- Each buffered scan carries a key generated on the kiosk; replayed batches
+-- are recognised here and never double-count attendance.
+-- Run this in your Supabase SQL Editor
+
+CREATE TABLE IF NOT EXISTS attendance_scan_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    device_id TEXT,
+    member_id UUID,
+    attendance_id UUID,
+    action TEXT,
+    scanned_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_attendance_scan_keys_created ON attendance_scan_keys(created_at);
+
+ALTER TABLE attendance_scan_keys ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Admins and trainers can manage scan keys" ON attendance_scan_keys
+    FOR ALL USING (
+        EXISTS (
+            SELECT 1 FROM users WHERE id = auth.uid() AND role IN ('admin', 'trainer')
+        )
+    );
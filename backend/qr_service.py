@@ -1,21 +1,111 @@
 """
 QR Code generation and management service
 """
-import qrcode
 import io
+import os
+import time
+import hmac
+import struct
 import base64
+import hashlib
 import uuid
-from typing import Optional
+from typing import Optional, Dict, NamedTuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Signed payload format: GYM2.<base64url(member uuid | issued epoch | key id)>.<base64url(truncated HMAC)>
+SIGNED_PREFIX = "GYM2."
+LEGACY_PREFIX = "GYM-"
+_PAYLOAD_STRUCT = struct.Struct(">16sIB")
+_SIGNATURE_BYTES = 12
 
-def generate_qr_code(member_id: str) -> str:
+
+class QRPayload(NamedTuple):
+    member_id: str
+    issued_at: int
+    key_id: int
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def get_signing_keys() -> Dict[int, bytes]:
+    """
+    Signing keys from QR_SIGNING_KEYS, formatted as "1:secret,2:other-secret"
+    Old key ids stay listed after a rotation so codes signed with them keep verifying
+    """
+    keys = {}
+    for entry in os.environ.get('QR_SIGNING_KEYS', '').split(','):
+        key_id, _, secret = entry.strip().partition(':')
+        if key_id.isdigit() and secret and 0 <= int(key_id) <= 255:
+            keys[int(key_id)] = secret.encode()
+    return keys
+
+
+def get_active_key_id(keys: Dict[int, bytes]) -> Optional[int]:
+    """Key used for new codes: QR_ACTIVE_KEY_ID, else the highest configured id"""
+    active = os.environ.get('QR_ACTIVE_KEY_ID', '')
+    if active.isdigit() and int(active) in keys:
+        return int(active)
+    return max(keys) if keys else None
+
+
+def _sign(secret: bytes, payload: bytes) -> bytes:
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+
+
+def generate_signed_qr_code(member_id: str, issued_at: Optional[int] = None) -> Optional[str]:
+    """
+    Generate a signed, compact QR code string for a member
+    Returns None when no signing key is configured
+    """
+    keys = get_signing_keys()
+    key_id = get_active_key_id(keys)
+    if key_id is None:
+        return None
+    
+    issued_at = int(time.time()) if issued_at is None else issued_at
+    payload = _PAYLOAD_STRUCT.pack(uuid.UUID(member_id).bytes, issued_at, key_id)
+    return f"{SIGNED_PREFIX}{_b64encode(payload)}.{_b64encode(_sign(keys[key_id], payload))}"
+
+
+def verify_signed_qr_code(qr_data: str) -> Optional[QRPayload]:
+    """
+    Verify a signed QR code without touching the database
+    Returns the decoded payload if the signature is valid, None otherwise
+    """
+    if not qr_data.startswith(SIGNED_PREFIX):
+        return None
+    try:
+        encoded_payload, _, encoded_signature = qr_data[len(SIGNED_PREFIX):].partition(".")
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+        member_bytes, issued_at, key_id = _PAYLOAD_STRUCT.unpack(payload)
+    except (ValueError, struct.error):
+        return None
+    
+    secret = get_signing_keys().get(key_id)
+    if secret is None or not hmac.compare_digest(signature, _sign(secret, payload)):
+        return None
+    return QRPayload(str(uuid.UUID(bytes=member_bytes)), issued_at, key_id)
+
+
+def generate_qr_code(member_id: str, issued_at: Optional[int] = None) -> str:
     """
     Generate a unique QR code string for a member
-    Format: GYM-{member_id}-{random_suffix}
+    Format: signed GYM2 payload when QR_SIGNING_KEYS is set,
+    otherwise the legacy GYM-{member_id}-{random_suffix}
     """
+    signed = generate_signed_qr_code(member_id, issued_at)
+    if signed:
+        return signed
+    
     random_suffix = str(uuid.uuid4())[:8]
     qr_code_data = f"GYM-{member_id}-{random_suffix}"
     return qr_code_data
@@ -25,6 +115,9 @@ def generate_qr_image(qr_data: str) -> str:
     """
     Generate QR code image and return as base64 string
     """
+    # qrcode (and PIL behind it) is loaded on first use to keep it out of server startup
+    import qrcode
+    
     try:
         qr = qrcode.QRCode(
             version=1,
@@ -54,10 +147,14 @@ def parse_qr_code(qr_data: str) -> Optional[str]:
     Returns member_id if valid, None otherwise
     """
     try:
-        if qr_data.startswith("GYM-"):
-            parts = qr_data.split("-")
-            if len(parts) >= 2:
-                return parts[1]  # Return member_id
+        if qr_data.startswith(SIGNED_PREFIX):
+            payload = verify_signed_qr_code(qr_data)
+            return payload.member_id if payload else None
+        if qr_data.startswith(LEGACY_PREFIX):
+            # Member ids are UUIDs, so take everything up to the random suffix
+            member_id, separator, _ = qr_data[len(LEGACY_PREFIX):].rpartition("-")
+            if separator and member_id:
+                return member_id
         return None
     except Exception as e:
         logger.error(f"QR parsing error: {str(e)}")
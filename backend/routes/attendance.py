@@ -3,16 +3,21 @@ Attendance tracking routes
 """
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional
+import asyncio
 import logging
 from models import AttendanceCreate, AttendanceUpdate, AttendanceResponse
 from supabase_client import get_supabase, get_supabase_service
 from datetime import datetime, date
+from services.occupancy import occupancy_tracker
+from services.attendance_sweeper import attendance_sweeper
+from services.response_cache import invalidates
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
 
 @router.post("", response_model=AttendanceResponse)
+@invalidates("attendance")
 async def create_attendance(attendance: AttendanceCreate):
     """Create attendance record (check-in)"""
     supabase = get_supabase()
@@ -38,6 +43,10 @@ async def create_attendance(attendance: AttendanceCreate):
         result = response.data[0]
         result["member_name"] = member_name
         
+        # Only today's open sessions count towards live occupancy
+        if not result.get("check_out_time") and str(result.get("date"))[:10] == date.today().isoformat():
+            occupancy_tracker.check_in(result["member_id"], member_name, result["id"], result["check_in_time"])
+        
         return AttendanceResponse(**result)
         
     except HTTPException:
@@ -47,6 +56,34 @@ async def create_attendance(attendance: AttendanceCreate):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/auto-checkout")
+@invalidates("attendance")
+async def run_auto_checkout():
+    """Close stale open sessions now (normally done by the background sweeper)"""
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        return await asyncio.to_thread(attendance_sweeper.sweep, supabase)
+        
+    except Exception as e:
+        logger.error(f"Auto-checkout error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/auto-checkout/status")
+async def get_auto_checkout_status():
+    """Get the auto-checkout configuration and last run summary"""
+    return {
+        "max_session_hours": attendance_sweeper.max_session_hours,
+        "interval_seconds": attendance_sweeper.interval_seconds,
+        "batch_size": attendance_sweeper.batch_size,
+        "last_run": attendance_sweeper.last_run
+    }
+
+
 @router.get("", response_model=List[AttendanceResponse])
 async def get_attendance(member_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None):
     """Get attendance records"""
@@ -108,6 +145,7 @@ async def get_attendance_record(attendance_id: str):
 
 
 @router.put("/{attendance_id}", response_model=AttendanceResponse)
+@invalidates("attendance")
 async def update_attendance(attendance_id: str, attendance_update: AttendanceUpdate):
     """Update attendance record (check-out)"""
     supabase = get_supabase()
@@ -132,6 +170,9 @@ async def update_attendance(attendance_id: str, attendance_update: AttendanceUpd
         result = response.data[0]
         result["member_name"] = member_name
         
+        if result.get("check_out_time"):
+            occupancy_tracker.check_out(result["member_id"], attendance_id)
+        
         return AttendanceResponse(**result)
         
     except HTTPException:
@@ -142,6 +183,7 @@ async def update_attendance(attendance_id: str, attendance_update: AttendanceUpd
 
 
 @router.delete("/{attendance_id}")
+@invalidates("attendance")
 async def delete_attendance(attendance_id: str):
     """Delete attendance record"""
     supabase = get_supabase()
@@ -154,6 +196,7 @@ async def delete_attendance(attendance_id: str):
         
         # Delete record
         supabase.table("attendance").delete().eq("id", attendance_id).execute()
+        occupancy_tracker.check_out(attendance_id=attendance_id)
         
         return {"message": "Attendance record deleted successfully"}
         
@@ -7,6 +7,7 @@ from typing import Optional
 from datetime import date, datetime, timedelta
 from supabase_client import get_supabase
 from routes.auth import get_current_user
+from services.audit_service import audit_service, AuditHistoryUnavailable
 
 router = APIRouter(prefix="/api/audit-logs", tags=["audit_logs"])
 
@@ -65,7 +66,7 @@ async def get_audit_stats(
         start_date = (datetime.now() - timedelta(days=days)).isoformat()
         
         response = supabase.table("audit_logs")\
-            .select("*")\
+            .select("action, entity_type, user_email")\
             .gte("timestamp", start_date)\
             .execute()
         
@@ -130,3 +131,30 @@ async def get_entity_audit_history(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/entity/{entity_type}/{entity_id}/state")
+async def rebuild_entity_state(
+    entity_type: str,
+    entity_id: str,
+    at: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Rebuild an entity's state as of a point in its history (default: latest) from its audit entries"""
+    try:
+        if current_user["role"] != "admin":
+            raise HTTPException(status_code=403, detail="Only admins can view audit logs")
+        
+        supabase = get_supabase()
+        try:
+            state = audit_service.rebuild(supabase, entity_type, entity_id, at)
+        except AuditHistoryUnavailable as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        if state["entries_applied"] == 0:
+            raise HTTPException(status_code=404, detail="No audit history for this entity at that time")
+        
+        return {"success": True, "data": state}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
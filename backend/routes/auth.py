@@ -147,13 +147,25 @@ async def get_current_user(authorization: str = Header(...), _: None = Depends(v
         if not profile_response.data:
             raise HTTPException(status_code=404, detail="User profile not found")
         
-        return UserResponse(**profile_response.data[0])
+        # A dict, as the routes that depend on this read current_user["role"]
+        return UserResponse(**profile_response.data[0]).model_dump()
         
     except Exception as e:
         logger.error(f"Get user error: {str(e)}")
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+async def get_optional_user(authorization: Optional[str] = Header(None)) -> Optional[dict]:
+    """Current user profile when the request carries a valid token, otherwise None"""
+    if not authorization or not authorization.startswith("Bearer ") or not check_supabase_configured():
+        return None
+    
+    try:
+        return await get_current_user(authorization)
+    except HTTPException:
+        return None
+
+
 @router.get("/check-config")
 async def check_configuration():
     """Check if Supabase is properly configured"""
@@ -1,16 +1,49 @@
 """
 Balance and payment tracking routes
+Balances are read from member_balances, the running totals maintained from
+the member_ledger entries (member_ledger.sql)
 """
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional, Dict, Any
+import asyncio
 import logging
-from models import BalanceSummary, PaymentCreate, PaymentResponse
-from supabase_client import get_supabase_service
+from models import BalanceSummary, PaymentCreate, PaymentResponse, LedgerEntryCreate, LedgerEntryResponse
+from supabase_client import get_supabase_service, aggregate_rows, run_queries, insert_rows
+from routes.auth import get_current_user, get_optional_user
+from services.response_cache import invalidates
+from services.ledger_reconciler import ledger_reconciler
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/balance", tags=["Balance"])
 
+BALANCE_COLUMNS = "total_charged, total_paid, balance_due"
+LEDGER_MAX_LIMIT = 500
+
+
+def _balance_of(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The member_balances embed of a members row (an object, or a list from older PostgREST versions)"""
+    balance = row.get("member_balances")
+    if isinstance(balance, list):
+        balance = balance[0] if balance else None
+    return balance or {}
+
+
+def _balance_summary(member: Dict[str, Any], balance: Dict[str, Any]) -> BalanceSummary:
+    plan = member.get("plans")
+    return BalanceSummary(
+        member_id=member["id"],
+        member_name=member["full_name"],
+        email=member["email"],
+        phone=member["phone"],
+        plan_name=plan.get("name") if plan else None,
+        total_amount_due=float(balance.get("total_charged") or 0),
+        amount_paid=float(balance.get("total_paid") or 0),
+        balance_due=max(0, float(balance.get("balance_due") or 0)),
+        status=member["status"],
+        end_date=member["end_date"]
+    )
+
 
 @router.get("/members-with-balance", response_model=List[BalanceSummary])
 async def get_members_with_balance():
@@ -21,48 +54,16 @@ async def get_members_with_balance():
         raise HTTPException(status_code=503, detail="Supabase service not configured")
     
     try:
-        # Get all members with their plans
-        members_response = supabase.table("members").select(
-            "id, full_name, email, phone, plan_id, plans(name, price), status, end_date"
-        ).execute()
-        
-        # Get all payments
-        payments_response = supabase.table("payments").select("member_id, amount, status").execute()
-        
-        # Calculate balances for each member
-        balances = []
-        for member in members_response.data:
-            plan = member.get("plans")
-            plan_price = float(plan.get("price", 0)) if plan else 0
-            
-            # Calculate total paid by this member
-            member_payments = [p for p in payments_response.data if p["member_id"] == member["id"]]
-            total_paid = sum(float(p["amount"]) for p in member_payments if p.get("status") in ["completed", "paid"])
-            
-            # Calculate balance
-            total_due = plan_price
-            balance_due = max(0, total_due - total_paid)
-            
-            # Only include members with outstanding balance
-            if balance_due > 0:
-                balance_data = {
-                    "member_id": member["id"],
-                    "member_name": member["full_name"],
-                    "email": member["email"],
-                    "phone": member["phone"],
-                    "plan_name": plan.get("name") if plan else None,
-                    "total_amount_due": total_due,
-                    "amount_paid": total_paid,
-                    "balance_due": balance_due,
-                    "status": member["status"],
-                    "end_date": member["end_date"]
-                }
-                balances.append(BalanceSummary(**balance_data))
-        
-        # Sort by balance due (highest first)
-        balances.sort(key=lambda x: x.balance_due, reverse=True)
-        
-        return balances
+        # Served by the partial index on member_balances(balance_due DESC)
+        response = supabase.table("member_balances").select(
+            f"member_id, {BALANCE_COLUMNS}, members(id, full_name, email, phone, status, end_date, plans(name))"
+        ).gt("balance_due", 0).order("balance_due", desc=True).execute()
+        
+        return [
+            _balance_summary(row["members"], row)
+            for row in response.data
+            if row.get("members")
+        ]
         
     except Exception as e:
         logger.error(f"Get members with balance error: {str(e)}")
@@ -78,62 +79,124 @@ async def get_member_balance(member_id: str):
         raise HTTPException(status_code=503, detail="Supabase service not configured")
     
     try:
-        # Get member with plan
         response = supabase.table("members").select(
-            "id, full_name, email, phone, plan_id, plans(name, price), status, end_date"
+            f"id, full_name, email, phone, status, end_date, plans(name), member_balances({BALANCE_COLUMNS})"
         ).eq("id", member_id).execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Member not found")
         
         member = response.data[0]
-        plan = member.get("plans")
-        plan_price = float(plan.get("price", 0)) if plan else 0
+        return _balance_summary(member, _balance_of(member))
         
-        # Get member's payments
-        payments_response = supabase.table("payments").select("amount, status").eq("member_id", member_id).execute()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get member balance error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/member/{member_id}/ledger", response_model=List[LedgerEntryResponse])
+async def get_member_ledger(member_id: str, limit: int = 100, offset: int = 0):
+    """Get a member's ledger entries, newest first"""
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    limit = min(max(limit, 1), LEDGER_MAX_LIMIT)
+    offset = max(offset, 0)
+    
+    try:
+        response = supabase.table("member_ledger")\
+            .select("*")\
+            .eq("member_id", member_id)\
+            .order("created_at", desc=True)\
+            .order("id")\
+            .range(offset, offset + limit - 1)\
+            .execute()
         
-        # Calculate total paid
-        total_paid = sum(float(p["amount"]) for p in payments_response.data if p.get("status") in ["completed", "paid"])
+        return [LedgerEntryResponse(**entry) for entry in response.data]
         
-        # Calculate balance
-        total_due = plan_price
-        balance_due = max(0, total_due - total_paid)
+    except Exception as e:
+        logger.error(f"Get member ledger error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/ledger", response_model=LedgerEntryResponse)
+@invalidates("members")
+async def post_ledger_entry(entry: LedgerEntryCreate, current_user: dict = Depends(get_current_user)):
+    """
+    Post a charge, adjustment or refund to a member's ledger (admin only)
+    The member's balance is updated by the database as the entry is appended.
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can post ledger entries")
+    if entry.amount == 0:
+        raise HTTPException(status_code=400, detail="Amount must not be zero")
+    if entry.entry_type.value in ("charge", "refund") and entry.amount < 0:
+        raise HTTPException(status_code=400, detail=f"A {entry.entry_type.value} amount must be positive; use an adjustment to reduce a balance")
+    
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        member_response = supabase.table("members").select("id").eq("id", entry.member_id).execute()
+        if not member_response.data:
+            raise HTTPException(status_code=404, detail="Member not found")
         
-        balance_data = {
-            "member_id": member["id"],
-            "member_name": member["full_name"],
-            "email": member["email"],
-            "phone": member["phone"],
-            "plan_name": plan.get("name") if plan else None,
-            "total_amount_due": total_due,
-            "amount_paid": total_paid,
-            "balance_due": balance_due,
-            "status": member["status"],
-            "end_date": member["end_date"]
-        }
+        response = supabase.table("member_ledger").insert({
+            "member_id": entry.member_id,
+            "entry_type": entry.entry_type.value,
+            "amount": round(entry.amount, 2),
+            "description": entry.description,
+            "created_by": current_user.get("id")
+        }).execute()
         
-        return BalanceSummary(**balance_data)
+        return LedgerEntryResponse(**response.data[0])
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Get member balance error: {str(e)}")
+        logger.error(f"Post ledger entry error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/reconcile")
+@invalidates("members")
+async def reconcile_balances(repair: bool = False, current_user: dict = Depends(get_current_user)):
+    """Check every member's running balance against their ledger; repair=true rewrites drifted balances (admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can reconcile balances")
+    
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        return await asyncio.to_thread(ledger_reconciler.run, supabase, repair)
+        
+    except Exception as e:
+        logger.error(f"Reconcile balances error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/record-partial-payment", response_model=PaymentResponse)
-async def record_partial_payment(payment: PaymentCreate):
-    """Record a partial payment and update member balance"""
+@invalidates("payments", "members")
+async def record_partial_payment(payment: PaymentCreate, current_user: Optional[dict] = Depends(get_optional_user)):
+    """Record a partial payment (the ledger trigger updates the member's balance)"""
     supabase = get_supabase_service()
     
     if not supabase:
         raise HTTPException(status_code=503, detail="Supabase service not configured")
     
     try:
-        # Get member info with plan
+        # Get member info with current balance
         member_response = supabase.table("members").select(
-            "id, full_name, plan_id, plans(name, price)"
+            "id, full_name, member_balances(balance_due)"
         ).eq("id", payment.member_id).execute()
         
         if not member_response.data:
@@ -141,18 +204,10 @@ async def record_partial_payment(payment: PaymentCreate):
         
         member = member_response.data[0]
         member_name = member["full_name"]
-        
-        # Get current payments to calculate balance
-        payments_response = supabase.table("payments").select("amount, status").eq("member_id", payment.member_id).execute()
-        total_paid = sum(float(p["amount"]) for p in payments_response.data if p.get("status") in ["completed", "paid"])
-        
-        plan = member.get("plans")
-        plan_price = float(plan.get("price", 0)) if plan else 0
-        current_balance = max(0, plan_price - total_paid)
+        current_balance = max(0, float(_balance_of(member).get("balance_due") or 0))
         
         # Calculate new balance after this payment
         new_balance = current_balance - payment.amount
-        is_partial = new_balance > 0
         
         # Get plan info if provided
         plan_name = None
@@ -172,10 +227,10 @@ async def record_partial_payment(payment: PaymentCreate):
             "status": payment.status.value,
             "created_at": datetime.utcnow().isoformat()
         }
+        if current_user:
+            payment_data["recorded_by"] = current_user["id"]
         
-        payment_response = supabase.table("payments").insert(payment_data).execute()
-        
-        # Note: Balance is calculated on-the-fly from payments, no need to update member table
+        payment_response = insert_rows(supabase, "payments", payment_data, optional_columns=["recorded_by"])
         
         result = payment_response.data[0]
         result["member_name"] = member_name
@@ -199,42 +254,21 @@ async def get_balance_summary():
         raise HTTPException(status_code=503, detail="Supabase service not configured")
     
     try:
-        # Get all members with plans
-        members_response = supabase.table("members").select(
-            "id, plan_id, plans(price), status"
-        ).execute()
-        
-        # Get all payments
-        payments_response = supabase.table("payments").select("member_id, amount, status").execute()
-        
-        total_due = 0
-        total_paid = 0
-        total_balance = 0
-        members_with_balance = 0
-        
-        for member in members_response.data:
-            plan = member.get("plans")
-            plan_price = float(plan.get("price", 0)) if plan else 0
-            
-            # Calculate total paid by this member
-            member_payments = [p for p in payments_response.data if p["member_id"] == member["id"]]
-            member_paid = sum(float(p["amount"]) for p in member_payments if p.get("status") in ["completed", "paid"])
-            
-            # Calculate balance
-            member_balance = max(0, plan_price - member_paid)
-            
-            total_due += plan_price
-            total_paid += member_paid
-            total_balance += member_balance
-            
-            if member_balance > 0:
-                members_with_balance += 1
+        totals, outstanding = await run_queries(
+            aggregate_rows(supabase, "member_balances", sums=["total_charged", "total_paid"]),
+            aggregate_rows(supabase, "member_balances", sums=["balance_due"], filters=[("balance_due", "gt", 0)])
+        )
+        totals = totals[0] if totals else {}
+        outstanding = outstanding[0] if outstanding else {}
+        
+        total_due = float(totals.get("sum_total_charged") or 0)
+        total_paid = float(totals.get("sum_total_paid") or 0)
         
         return {
             "total_amount_due": total_due,
             "total_amount_paid": total_paid,
-            "total_balance_due": total_balance,
-            "members_with_balance": members_with_balance,
+            "total_balance_due": float(outstanding.get("sum_balance_due") or 0),
+            "members_with_balance": outstanding.get("count", 0),
             "collection_rate": (total_paid / total_due * 100) if total_due > 0 else 0
         }
         
@@ -6,8 +6,10 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Optional
 from pydantic import BaseModel
 from datetime import date, datetime
-from supabase_client import get_supabase
+from supabase_client import get_supabase, count_rows
 from routes.auth import get_current_user
+from services.audit_service import audit_service
+from services.response_cache import invalidates
 
 router = APIRouter(prefix="/api/class-bookings", tags=["class_bookings"])
 
@@ -87,6 +89,7 @@ async def get_booking(
 
 
 @router.post("/")
+@invalidates("class_bookings")
 async def create_booking(
     booking: BookingCreate,
     request: Request,
@@ -110,14 +113,13 @@ async def create_booking(
             raise HTTPException(status_code=400, detail="Class is not active")
         
         # Check capacity
-        existing_bookings = supabase.table("class_bookings")\
-            .select("*")\
+        existing_bookings = count_rows(supabase, "class_bookings")\
             .eq("class_id", booking.class_id)\
             .eq("booking_date", str(booking.booking_date))\
             .eq("status", "confirmed")\
             .execute()
         
-        if len(existing_bookings.data) >= class_data["max_capacity"]:
+        if (existing_bookings.count or 0) >= class_data["max_capacity"]:
             raise HTTPException(status_code=400, detail="Class is full")
         
         # Check for duplicate booking
@@ -143,12 +145,12 @@ async def create_booking(
         response = supabase.table("class_bookings").insert(booking_data).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="CREATE",
             entity_type="class_booking",
             entity_id=response.data[0]["id"],
+            after=response.data[0],
             request=request
         )
         
@@ -160,6 +162,7 @@ async def create_booking(
 
 
 @router.put("/{booking_id}")
+@invalidates("class_bookings")
 async def update_booking(
     booking_id: str,
     booking: BookingUpdate,
@@ -191,13 +194,13 @@ async def update_booking(
         response = supabase.table("class_bookings").update(update_data).eq("id", booking_id).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="UPDATE",
             entity_type="class_booking",
             entity_id=booking_id,
-            changes={"before": existing_booking, "after": response.data[0]},
+            before=existing_booking,
+            after=response.data[0],
             request=request
         )
         
@@ -209,6 +212,7 @@ async def update_booking(
 
 
 @router.delete("/{booking_id}")
+@invalidates("class_bookings")
 async def delete_booking(
     booking_id: str,
     request: Request,
@@ -228,13 +232,12 @@ async def delete_booking(
         supabase.table("class_bookings").delete().eq("id", booking_id).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="DELETE",
             entity_type="class_booking",
             entity_id=booking_id,
-            changes={"deleted": existing.data[0]},
+            before=existing.data[0],
             request=request
         )
         
@@ -272,23 +275,3 @@ async def get_member_upcoming_bookings(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-async def log_audit(user_id: str, user_email: str, action: str, entity_type: str, 
-                    entity_id: str, request: Request, changes: dict = None):
-    """Log audit entry"""
-    try:
-        supabase = get_supabase()
-        audit_data = {
-            "user_id": user_id,
-            "user_email": user_email,
-            "action": action,
-            "entity_type": entity_type,
-            "entity_id": entity_id,
-            "changes": changes,
-            "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent")
-        }
-        supabase.table("audit_logs").insert(audit_data).execute()
-    except Exception as e:
-        print(f"Audit log error: {e}")
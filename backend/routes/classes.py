@@ -8,6 +8,8 @@ from pydantic import BaseModel
 from datetime import time
 from supabase_client import get_supabase
 from routes.auth import get_current_user
+from services.audit_service import audit_service
+from services.response_cache import cached, invalidates
 
 router = APIRouter(prefix="/api/classes", tags=["classes"])
 
@@ -45,6 +47,7 @@ class ClassUpdate(BaseModel):
 
 
 @router.get("/")
+@cached(ttl=120, tags=["classes"])
 async def get_classes(
     category: Optional[str] = None,
     day: Optional[str] = None,
@@ -72,6 +75,7 @@ async def get_classes(
 
 
 @router.get("/{class_id}")
+@cached(ttl=120, tags=["classes"])
 async def get_class_by_id(
     class_id: str,
     current_user: dict = Depends(get_current_user)
@@ -92,6 +96,7 @@ async def get_class_by_id(
 
 
 @router.post("/")
+@invalidates("classes")
 async def create_class(
     class_data: ClassCreate,
     request: Request,
@@ -107,12 +112,12 @@ async def create_class(
         class_dict = class_data.dict()
         response = supabase.table("classes").insert(class_dict).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="CREATE",
             entity_type="class",
             entity_id=response.data[0]["id"],
+            after=response.data[0],
             request=request
         )
         
@@ -124,6 +129,7 @@ async def create_class(
 
 
 @router.put("/{class_id}")
+@invalidates("classes")
 async def update_class(
     class_id: str,
     class_data: ClassUpdate,
@@ -144,13 +150,13 @@ async def update_class(
         update_data = {k: v for k, v in class_data.dict(exclude_unset=True).items() if v is not None}
         response = supabase.table("classes").update(update_data).eq("id", class_id).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="UPDATE",
             entity_type="class",
             entity_id=class_id,
-            changes={"before": existing.data[0], "after": response.data[0]},
+            before=existing.data[0],
+            after=response.data[0],
             request=request
         )
         
@@ -162,6 +168,7 @@ async def update_class(
 
 
 @router.delete("/{class_id}")
+@invalidates("classes", "class_bookings")
 async def delete_class(
     class_id: str,
     request: Request,
@@ -180,13 +187,12 @@ async def delete_class(
         
         supabase.table("classes").delete().eq("id", class_id).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="DELETE",
             entity_type="class",
             entity_id=class_id,
-            changes={"deleted": existing.data[0]},
+            before=existing.data[0],
             request=request
         )
         
@@ -214,23 +220,3 @@ async def get_class_bookings(
         return {"success": True, "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-async def log_audit(user_id: str, user_email: str, action: str, entity_type: str, 
-                    entity_id: str, request: Request, changes: dict = None):
-    """Log audit entry"""
-    try:
-        supabase = get_supabase()
-        audit_data = {
-            "user_id": user_id,
-            "user_email": user_email,
-            "action": action,
-            "entity_type": entity_type,
-            "entity_id": entity_id,
-            "changes": changes,
-            "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent")
-        }
-        supabase.table("audit_logs").insert(audit_data).execute()
-    except Exception as e:
-        print(f"Audit log error: {e}")
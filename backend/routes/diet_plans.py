@@ -7,6 +7,7 @@ from typing import List, Optional
 from pydantic import BaseModel
 from supabase_client import get_supabase
 from routes.auth import get_current_user
+from services.audit_service import audit_service
 
 router = APIRouter(prefix="/api/diet-plans", tags=["diet_plans"])
 
@@ -140,12 +141,12 @@ async def create_diet_plan(
         response = supabase.table("diet_plans").insert(plan_data).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="CREATE",
             entity_type="diet_plan",
             entity_id=response.data[0]["id"],
+            after=response.data[0],
             request=request
         )
         
@@ -200,13 +201,13 @@ async def update_diet_plan(
         
         response = supabase.table("diet_plans").update(update_data).eq("id", plan_id).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="UPDATE",
             entity_type="diet_plan",
             entity_id=plan_id,
-            changes={"before": existing.data[0], "after": response.data[0]},
+            before=existing.data[0],
+            after=response.data[0],
             request=request
         )
         
@@ -236,13 +237,12 @@ async def delete_diet_plan(
         
         supabase.table("diet_plans").delete().eq("id", plan_id).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="DELETE",
             entity_type="diet_plan",
             entity_id=plan_id,
-            changes={"deleted": existing.data[0]},
+            before=existing.data[0],
             request=request
         )
         
@@ -276,23 +276,3 @@ async def get_member_active_diet_plans(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-async def log_audit(user_id: str, user_email: str, action: str, entity_type: str, 
-                    entity_id: str, request: Request, changes: dict = None):
-    """Log audit entry"""
-    try:
-        supabase = get_supabase()
-        audit_data = {
-            "user_id": user_id,
-            "user_email": user_email,
-            "action": action,
-            "entity_type": entity_type,
-            "entity_id": entity_id,
-            "changes": changes,
-            "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent")
-        }
-        supabase.table("audit_logs").insert(audit_data).execute()
-    except Exception as e:
-        print(f"Audit log error: {e}")
@@ -6,8 +6,10 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Optional
 from pydantic import BaseModel
 from datetime import date
-from supabase_client import get_supabase
+from supabase_client import get_supabase, aggregate_rows
 from routes.auth import get_current_user
+from services.audit_service import audit_service
+from services.response_cache import cached, invalidates
 
 router = APIRouter(prefix="/api/equipment", tags=["equipment"])
 
@@ -89,6 +91,7 @@ async def get_equipment_by_id(
 
 
 @router.post("/")
+@invalidates("equipment")
 async def create_equipment(
     equipment: EquipmentCreate,
     request: Request,
@@ -115,12 +118,12 @@ async def create_equipment(
         response = supabase.table("equipment").insert(equipment_data).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="CREATE",
             entity_type="equipment",
             entity_id=response.data[0]["id"],
+            after=response.data[0],
             request=request
         )
         
@@ -132,6 +135,7 @@ async def create_equipment(
 
 
 @router.put("/{equipment_id}")
+@invalidates("equipment")
 async def update_equipment(
     equipment_id: str,
     equipment: EquipmentUpdate,
@@ -158,13 +162,13 @@ async def update_equipment(
         
         response = supabase.table("equipment").update(update_data).eq("id", equipment_id).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="UPDATE",
             entity_type="equipment",
             entity_id=equipment_id,
-            changes={"before": existing.data[0], "after": response.data[0]},
+            before=existing.data[0],
+            after=response.data[0],
             request=request
         )
         
@@ -176,6 +180,7 @@ async def update_equipment(
 
 
 @router.delete("/{equipment_id}")
+@invalidates("equipment")
 async def delete_equipment(
     equipment_id: str,
     request: Request,
@@ -194,13 +199,12 @@ async def delete_equipment(
         
         supabase.table("equipment").delete().eq("id", equipment_id).execute()
         
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="DELETE",
             entity_type="equipment",
             entity_id=equipment_id,
-            changes={"deleted": existing.data[0]},
+            before=existing.data[0],
             request=request
         )
         
@@ -212,17 +216,18 @@ async def delete_equipment(
 
 
 @router.get("/stats/summary")
+@cached(ttl=120, tags=["equipment"])
 async def get_equipment_stats(current_user: dict = Depends(get_current_user)):
     """Get equipment statistics"""
     try:
         supabase = get_supabase()
         
-        all_equipment = supabase.table("equipment").select("*").execute()
+        by_status = {g["status"]: g["count"] for g in aggregate_rows(supabase, "equipment", group_by=["status"]).execute()}
         
-        total = len(all_equipment.data)
-        working = len([e for e in all_equipment.data if e["status"] == "working"])
-        maintenance = len([e for e in all_equipment.data if e["status"] == "maintenance"])
-        broken = len([e for e in all_equipment.data if e["status"] == "broken"])
+        total = sum(by_status.values())
+        working = by_status.get("working", 0)
+        maintenance = by_status.get("maintenance", 0)
+        broken = by_status.get("broken", 0)
         
         return {
             "success": True,
@@ -235,23 +240,3 @@ async def get_equipment_stats(current_user: dict = Depends(get_current_user)):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-async def log_audit(user_id: str, user_email: str, action: str, entity_type: str, 
-                    entity_id: str, request: Request, changes: dict = None):
-    """Log audit entry"""
-    try:
-        supabase = get_supabase()
-        audit_data = {
-            "user_id": user_id,
-            "user_email": user_email,
-            "action": action,
-            "entity_type": entity_type,
-            "entity_id": entity_id,
-            "changes": changes,
-            "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent")
-        }
-        supabase.table("audit_logs").insert(audit_data).execute()
-    except Exception as e:
-        print(f"Audit log error: {e}")
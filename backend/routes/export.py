@@ -7,7 +7,6 @@ from typing import Optional
 from datetime import date, datetime
 import csv
 import io
-import pandas as pd
 from supabase_client import get_supabase
 from routes.auth import get_current_user
 
@@ -30,6 +29,9 @@ async def export_members(
         if not response.data:
             raise HTTPException(status_code=404, detail="No data to export")
         
+        # pandas is heavy to import, so it is loaded on first export rather than at startup
+        import pandas as pd
+        
         # Convert to DataFrame
         df = pd.DataFrame(response.data)
         
@@ -92,6 +94,7 @@ async def export_payments(
         if not response.data:
             raise HTTPException(status_code=404, detail="No data to export")
         
+        import pandas as pd
         df = pd.DataFrame(response.data)
         
         if format.lower() == "excel":
@@ -146,6 +149,7 @@ async def export_attendance(
         if not response.data:
             raise HTTPException(status_code=404, detail="No data to export")
         
+        import pandas as pd
         df = pd.DataFrame(response.data)
         
         if format.lower() == "excel":
@@ -191,6 +195,7 @@ async def export_classes(
         if not response.data:
             raise HTTPException(status_code=404, detail="No data to export")
         
+        import pandas as pd
         df = pd.DataFrame(response.data)
         
         if format.lower() == "excel":
@@ -236,6 +241,7 @@ async def export_equipment(
         if not response.data:
             raise HTTPException(status_code=404, detail="No data to export")
         
+        import pandas as pd
         df = pd.DataFrame(response.data)
         
         if format.lower() == "excel":
@@ -19,7 +19,7 @@ from models_phase1 import (
     InstallmentStatus,
     PaymentStatus
 )
-from supabase_client import get_supabase
+from supabase_client import get_supabase, run_queries, count_rows, aggregate_rows
 
 router = APIRouter(prefix="/installments", tags=["installments"])
 
@@ -353,21 +353,19 @@ async def get_installment_analytics():
     try:
         supabase = get_supabase()
         
-        # Active plans
-        active_plans = supabase.table("installment_plans").select("*", count="exact").eq("status", "active").execute()
-        
-        # Completed plans
-        completed_plans = supabase.table("installment_plans").select("*", count="exact").eq("status", "completed").execute()
-        
-        # Total revenue from installments
-        all_payments = supabase.table("installment_payments").select("amount, status").execute()
-        
-        total_collected = sum(p["amount"] for p in all_payments.data if p["status"] == "paid")
-        total_pending = sum(p["amount"] for p in all_payments.data if p["status"] in ["pending", "overdue"])
-        
-        # Overdue payments
-        today = date.today()
-        overdue_payments = supabase.table("installment_payments").select("*", count="exact").eq("status", "overdue").execute()
+        active_plans, completed_plans, payments_by_status, overdue_payments = await run_queries(
+            # Active plans
+            count_rows(supabase, "installment_plans").eq("status", "active"),
+            # Completed plans
+            count_rows(supabase, "installment_plans").eq("status", "completed"),
+            # Total revenue from installments
+            aggregate_rows(supabase, "installment_payments", group_by=["status"], sums=["amount"]),
+            # Overdue payments
+            count_rows(supabase, "installment_payments").eq("status", "overdue")
+        )
+        
+        total_collected = sum(g["sum_amount"] for g in payments_by_status if g["status"] == "paid")
+        total_pending = sum(g["sum_amount"] for g in payments_by_status if g["status"] in ["pending", "overdue"])
         
         return {
             "active_plans": active_plans.count,
@@ -6,6 +6,7 @@ from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
 from datetime import datetime, date
 import io
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,13 +17,17 @@ from models_phase1 import (
     InvoiceUpdate,
     InvoiceStatus
 )
-from supabase_client import get_supabase
+from supabase_client import get_supabase, get_supabase_service, run_queries, aggregate_rows
+from routes.auth import get_current_user
 from services.invoice_service import invoice_service
+from services.gst_returns import gst_return_service
+from services.response_cache import cached, invalidates
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@invalidates("invoices")
 async def create_invoice(invoice: InvoiceCreate):
     """Create a new invoice"""
     try:
@@ -36,7 +41,7 @@ async def create_invoice(invoice: InvoiceCreate):
         tax_calculation = invoice_service.calculate_gst(
             taxable_amount,
             invoice.tax_rate,
-            same_state=True  # TODO: Make this configurable based on member state
+            same_state=invoice_service.is_intra_state(invoice.place_of_supply)
         )
         
         # Prepare invoice data
@@ -60,6 +65,11 @@ async def create_invoice(invoice: InvoiceCreate):
             "terms": invoice.terms or "Payment is due within 7 days of invoice date.",
             "status": "draft"
         }
+        # Columns from gst_returns.sql, only sent when given
+        if invoice.place_of_supply:
+            invoice_data["place_of_supply"] = invoice.place_of_supply
+        if invoice.customer_gstin:
+            invoice_data["customer_gstin"] = invoice.customer_gstin
         
         # Insert invoice (invoice_number will be auto-generated by trigger)
         result = supabase.table("invoices").insert(invoice_data).execute()
@@ -153,6 +163,7 @@ async def get_invoice_by_number(invoice_number: str):
 
 
 @router.patch("/{invoice_id}", response_model=dict)
+@invalidates("invoices")
 async def update_invoice(invoice_id: str, update: InvoiceUpdate):
     """Update an invoice"""
     try:
@@ -185,6 +196,7 @@ async def update_invoice(invoice_id: str, update: InvoiceUpdate):
 
 
 @router.delete("/{invoice_id}", response_model=dict)
+@invalidates("invoices")
 async def cancel_invoice(invoice_id: str):
     """Cancel an invoice"""
     try:
@@ -207,6 +219,7 @@ async def cancel_invoice(invoice_id: str):
 
 
 @router.post("/{invoice_id}/send", response_model=dict)
+@invalidates("invoices")
 async def send_invoice(invoice_id: str):
     """Mark invoice as sent and optionally email to member"""
     try:
@@ -276,6 +289,7 @@ async def download_invoice(invoice_id: str):
 
 
 @router.post("/generate-from-payment/{payment_id}", response_model=dict)
+@invalidates("invoices")
 async def generate_invoice_from_payment(payment_id: str):
     """Auto-generate invoice from a payment"""
     try:
@@ -296,38 +310,8 @@ async def generate_invoice_from_payment(payment_id: str):
         if existing.data:
             raise HTTPException(status_code=400, detail="Invoice already exists for this payment")
         
-        # Create invoice items
-        items = [{
-            "name": plan["name"] if plan else "Membership Payment",
-            "description": f"Payment for {plan['name']}" if plan else "Gym membership payment",
-            "quantity": 1,
-            "rate": payment["amount"],
-            "amount": payment["amount"]
-        }]
-        
         # Create invoice
-        invoice_data = {
-            "member_id": payment["member_id"],
-            "payment_id": payment_id,
-            "invoice_date": date.today().isoformat(),
-            "due_date": date.today().isoformat(),
-            "subtotal": payment["amount"],
-            "discount_amount": 0,
-            "tax_rate": 18.0,
-            "items": items,
-            "notes": f"Payment received via {payment['payment_method'].upper()}",
-            "status": "paid"
-        }
-        
-        # Calculate GST
-        tax_calc = invoice_service.calculate_gst(payment["amount"], 18.0, same_state=True)
-        invoice_data.update({
-            "tax_amount": tax_calc["tax_amount"],
-            "cgst": tax_calc["cgst"],
-            "sgst": tax_calc["sgst"],
-            "igst": tax_calc["igst"],
-            "total_amount": tax_calc["total"]
-        })
+        invoice_data = invoice_service.payment_invoice_data(payment, plan["name"] if plan else None)
         
         result = supabase.table("invoices").insert(invoice_data).execute()
         
@@ -343,6 +327,7 @@ async def generate_invoice_from_payment(payment_id: str):
 
 
 @router.get("/payment/{payment_id}/download")
+@invalidates("invoices")
 async def download_invoice_from_payment(payment_id: str):
     """Generate and download invoice from payment ID"""
     try:
@@ -431,29 +416,38 @@ async def download_invoice_from_payment(payment_id: str):
 
 
 @router.get("/analytics/summary", response_model=dict)
+@cached(ttl=120, tags=["invoices"])
 async def get_invoice_analytics():
     """Get invoice analytics"""
     try:
         supabase = get_supabase()
         
-        # Get all invoices
-        all_invoices = supabase.table("invoices").select("total_amount, status, invoice_date").execute()
+        # Count and total per status
+        by_status_rows, = await run_queries(
+            aggregate_rows(supabase, "invoices", group_by=["status"], sums=["total_amount"])
+        )
+        by_status = {g["status"]: g for g in by_status_rows}
+        
+        def total(*statuses):
+            return sum(by_status[s]["sum_total_amount"] for s in statuses if s in by_status)
         
-        total_invoiced = sum(inv["total_amount"] for inv in all_invoices.data)
-        total_paid = sum(inv["total_amount"] for inv in all_invoices.data if inv["status"] == "paid")
-        total_pending = sum(inv["total_amount"] for inv in all_invoices.data if inv["status"] in ["draft", "sent"])
+        def count(status):
+            return by_status[status]["count"] if status in by_status else 0
         
-        # Count by status
-        draft_count = len([inv for inv in all_invoices.data if inv["status"] == "draft"])
-        sent_count = len([inv for inv in all_invoices.data if inv["status"] == "sent"])
-        paid_count = len([inv for inv in all_invoices.data if inv["status"] == "paid"])
-        cancelled_count = len([inv for inv in all_invoices.data if inv["status"] == "cancelled"])
+        total_invoiced = total(*by_status)
+        total_paid = total("paid")
+        total_pending = total("draft", "sent")
+        
+        draft_count = count("draft")
+        sent_count = count("sent")
+        paid_count = count("paid")
+        cancelled_count = count("cancelled")
         
         return {
             "total_invoiced": total_invoiced,
             "total_paid": total_paid,
             "total_pending": total_pending,
-            "total_count": len(all_invoices.data),
+            "total_count": sum(g["count"] for g in by_status.values()),
             "draft_count": draft_count,
             "sent_count": sent_count,
             "paid_count": paid_count,
@@ -463,3 +457,41 @@ async def get_invoice_analytics():
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching analytics: {str(e)}")
+
+
+@router.get("/gst/summary")
+async def get_gst_summary(
+    from_date: date,
+    to_date: date,
+    format: str = "json",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    GST summary of the invoices issued in a period, by section, place of supply and rate
+    format: json (summary), gstr1 (GSTR-1 style JSON, b2cs section) or csv (B2CS offline tool CSV)
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can export GST returns")
+    if format not in ("json", "gstr1", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'json', 'gstr1' or 'csv'")
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date")
+    
+    try:
+        supabase = get_supabase_service()
+        
+        summary = await asyncio.to_thread(gst_return_service.summarize, supabase, from_date, to_date)
+        
+        if format == "gstr1":
+            return gst_return_service.to_gstr1(summary)
+        if format == "csv":
+            return StreamingResponse(
+                gst_return_service.iter_b2cs_csv(summary),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="b2cs_{from_date.isoformat()}_{to_date.isoformat()}.csv"'}
+            )
+        
+        return summary
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building GST summary: {str(e)}")
@@ -2,16 +2,34 @@
 Members management routes
 """
 from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
+import asyncio
 import logging
-from models import MemberCreate, MemberUpdate, MemberResponse
-from supabase_client import get_supabase, get_supabase_service, check_supabase_configured
-from datetime import datetime
+from models import (
+    MemberCreate, MemberUpdate, MemberResponse, MemberDirectoryEntry, MemberDirectoryPage,
+    MemberSearchResult, MemberArchiveRequest, MemberArchiveResult, MemberStatement
+)
+from supabase_client import get_supabase, get_supabase_service, check_supabase_configured, RPC_NOT_FOUND_CODE
+from datetime import datetime, date
 from password_manager import decrypt_password
+from services.member_search import member_search_service
+from services.member_lifecycle import member_lifecycle
+from services.member_statement import member_statement_service
+from services.response_cache import invalidates
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/members", tags=["Members"])
 
+# Columns of the member_directory view that the member grid may sort by
+DIRECTORY_SORT_FIELDS = {
+    "full_name", "email", "status", "plan_name", "balance_due",
+    "last_check_in", "attendance_count", "start_date", "end_date", "created_at"
+}
+DIRECTORY_MAX_PAGE_SIZE = 200
+SEARCH_MAX_LIMIT = 100
+ARCHIVE_MAX_LIMIT = 10000
+
 
 def verify_token(authorization: str = Header(...)):
     """Verify user token"""
@@ -35,6 +53,7 @@ def verify_token(authorization: str = Header(...)):
 
 
 @router.post("", response_model=MemberResponse)
+@invalidates("members")
 async def create_member(member: MemberCreate, user = None):
     """Create a new member with payment"""
     # Use service client for admin operations
@@ -161,6 +180,8 @@ async def create_member(member: MemberCreate, user = None):
                 detail=f"Failed to create payment record. Member creation rolled back: {str(payment_error)}"
             )
         
+        member_search_service.invalidate()
+        
         return MemberResponse(**result)
         
     except HTTPException:
@@ -201,6 +222,91 @@ async def get_members(status: Optional[str] = None):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/directory", response_model=MemberDirectoryPage)
+async def get_member_directory(
+    status: Optional[str] = None,
+    plan_id: Optional[str] = None,
+    has_balance: Optional[bool] = None,
+    search: Optional[str] = None,
+    sort_by: str = "full_name",
+    sort_order: str = "asc",
+    page: int = 1,
+    page_size: int = 50
+):
+    """
+    Get one page of the member directory (plan name, balance due,
+    last check-in and attendance count) with server-side sort and filters
+    """
+    supabase = get_supabase_service()
+    
+    if sort_by not in DIRECTORY_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort field: {sort_by}")
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order must be 'asc' or 'desc'")
+    
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), DIRECTORY_MAX_PAGE_SIZE)
+    
+    try:
+        query = supabase.table("member_directory").select("*", count="exact")
+        
+        if status:
+            query = query.eq("status", status)
+        
+        if plan_id:
+            query = query.eq("plan_id", plan_id)
+        
+        if has_balance is True:
+            query = query.gt("balance_due", 0)
+        elif has_balance is False:
+            query = query.eq("balance_due", 0)
+        
+        if search:
+            # Strip characters that have a meaning in PostgREST filter syntax
+            term = "".join(c for c in search if c not in ",()*%").strip()
+            if term:
+                query = query.or_(f"full_name.ilike.*{term}*,email.ilike.*{term}*,phone.ilike.*{term}*")
+        
+        start = (page - 1) * page_size
+        response = query\
+            .order(sort_by, desc=sort_order == "desc")\
+            .order("id")\
+            .range(start, start + page_size - 1)\
+            .execute()
+        
+        total = response.count or 0
+        
+        return MemberDirectoryPage(
+            data=[MemberDirectoryEntry(**row) for row in response.data],
+            count=total,
+            page=page,
+            page_size=page_size,
+            total_pages=(total + page_size - 1) // page_size
+        )
+        
+    except Exception as e:
+        logger.error(f"Get member directory error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/search", response_model=List[MemberSearchResult])
+async def search_members(q: str, limit: int = 20):
+    """Search members by name, email or phone (best matches first)"""
+    supabase = get_supabase_service()
+    
+    query = q.strip()
+    if not query:
+        return []
+    
+    try:
+        results = member_search_service.search(supabase, query, min(max(limit, 1), SEARCH_MAX_LIMIT))
+        return [MemberSearchResult(**member) for member in results]
+        
+    except Exception as e:
+        logger.error(f"Search members error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/{member_id}", response_model=MemberResponse)
 async def get_member(member_id: str):
     """Get member by ID"""
@@ -227,6 +333,7 @@ async def get_member(member_id: str):
 
 
 @router.put("/{member_id}", response_model=MemberResponse)
+@invalidates("members")
 async def update_member(member_id: str, member_update: MemberUpdate):
     """Update member"""
     supabase = get_supabase_service()  # Use service client to bypass RLS
@@ -259,6 +366,8 @@ async def update_member(member_id: str, member_update: MemberUpdate):
         result = response.data[0]
         result["plan_name"] = plan_name
         
+        member_search_service.invalidate()
+        
         return MemberResponse(**result)
         
     except HTTPException:
@@ -268,6 +377,56 @@ async def update_member(member_id: str, member_update: MemberUpdate):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/{member_id}/statement", response_model=MemberStatement)
+async def get_member_statement(
+    member_id: str,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    format: str = "json"
+):
+    """
+    Get a member's statement: charges, payments, adjustments, refunds, invoices
+    and installment dues in date order with a running balance (json, csv or pdf)
+    """
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    if format not in ("json", "csv", "pdf"):
+        raise HTTPException(status_code=400, detail="format must be 'json', 'csv' or 'pdf'")
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date")
+    
+    try:
+        statement = await member_statement_service.build(supabase, member_id, from_date, to_date)
+        
+        if statement is None:
+            raise HTTPException(status_code=404, detail="Member not found")
+        
+        filename = f"statement_{member_id[:8]}_{datetime.now().strftime('%Y%m%d')}"
+        if format == "csv":
+            return StreamingResponse(
+                member_statement_service.iter_csv(statement),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+            )
+        if format == "pdf":
+            pdf_bytes = await asyncio.to_thread(member_statement_service.generate_pdf, statement)
+            return Response(
+                content=pdf_bytes,
+                media_type="application/pdf",
+                headers={"Content-Disposition": f'attachment; filename="{filename}.pdf"'}
+            )
+        
+        return statement
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get member statement error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/{member_id}/password")
 async def get_member_password(member_id: str):
     """Get member's stored password (admin only)"""
@@ -314,64 +473,52 @@ async def get_member_password(member_id: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/archive", response_model=MemberArchiveResult)
+@invalidates("members", "attendance", "class_bookings")
+async def archive_members(archive_request: MemberArchiveRequest):
+    """
+    Soft-delete lapsed members in one statement: they are marked archived and
+    their attendance and class bookings move to the archive tables (payments
+    stay in place). dry_run lists who would be archived.
+    """
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        result = await asyncio.to_thread(
+            member_lifecycle.archive_lapsed,
+            supabase,
+            lapsed_days=max(archive_request.lapsed_days, 0),
+            limit=min(max(archive_request.limit, 1), ARCHIVE_MAX_LIMIT),
+            member_ids=archive_request.member_ids,
+            dry_run=archive_request.dry_run
+        )
+        return MemberArchiveResult(**result, dry_run=archive_request.dry_run)
+        
+    except Exception as e:
+        if getattr(e, "code", None) == RPC_NOT_FOUND_CODE:
+            raise HTTPException(status_code=503, detail="Member archiving is not set up - run member_archive.sql")
+        logger.error(f"Archive members error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.delete("/{member_id}")
+@invalidates("members", "attendance", "payments", "class_bookings")
 async def delete_member(member_id: str):
-    """Delete member and associated records"""
+    """Delete member and associated records in one transaction"""
     supabase = get_supabase_service()
     
     if not supabase:
         raise HTTPException(status_code=503, detail="Supabase service not configured")
     
     try:
-        # Check if member exists and get user_id
-        existing = supabase.table("members").select("id, user_id, email").eq("id", member_id).execute()
-        if not existing.data:
+        result = await member_lifecycle.delete_member(supabase, member_id)
+        if not result:
             raise HTTPException(status_code=404, detail="Member not found")
         
-        member = existing.data[0]
-        user_id = member.get("user_id")
-        
-        # Delete associated records first (due to foreign key constraints)
-        # Delete stored password
-        try:
-            supabase.table("member_passwords").delete().eq("member_id", member_id).execute()
-            logger.info(f"Deleted stored password for member {member_id}")
-        except Exception as e:
-            logger.warning(f"Error deleting stored password: {str(e)}")
-        
-        # Delete payments
-        try:
-            supabase.table("payments").delete().eq("member_id", member_id).execute()
-            logger.info(f"Deleted payments for member {member_id}")
-        except Exception as e:
-            logger.warning(f"Error deleting payments: {str(e)}")
-        
-        # Delete attendance records
-        try:
-            supabase.table("attendance").delete().eq("member_id", member_id).execute()
-            logger.info(f"Deleted attendance for member {member_id}")
-        except Exception as e:
-            logger.warning(f"Error deleting attendance: {str(e)}")
-        
-        # Delete member
-        supabase.table("members").delete().eq("id", member_id).execute()
-        logger.info(f"Deleted member {member_id}")
-        
-        # Delete auth user if exists
-        if user_id:
-            try:
-                supabase.auth.admin.delete_user(user_id)
-                logger.info(f"Deleted auth user {user_id}")
-            except Exception as auth_error:
-                logger.warning(f"Error deleting auth user: {str(auth_error)}")
-            
-            # Delete from users table
-            try:
-                supabase.table("users").delete().eq("id", user_id).execute()
-                logger.info(f"Deleted user record {user_id}")
-            except Exception as user_error:
-                logger.warning(f"Error deleting user record: {str(user_error)}")
-        
+        logger.info(f"Deleted member {member_id}: {result.get('deleted')}")
         return {"message": "Member deleted successfully"}
         
     except HTTPException:
@@ -0,0 +1,17 @@
+"""
+Prometheus metrics route
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import metrics_registry
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, response size and database round-trip metrics in Prometheus text format"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,57 @@
+"""
+Live gym occupancy routes (current count and WebSocket feed)
+"""
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from typing import Dict, Any
+import logging
+from supabase_client import get_supabase_service
+from services.occupancy import occupancy_tracker
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/occupancy", tags=["Occupancy"])
+
+
+@router.get("")
+async def get_occupancy() -> Dict[str, Any]:
+    """Get the number and list of members currently checked in"""
+    return occupancy_tracker.snapshot()
+
+
+@router.post("/rebuild")
+async def rebuild_occupancy() -> Dict[str, Any]:
+    """Reload the live occupancy state from today's open attendance records"""
+    supabase = get_supabase_service()
+
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+
+    try:
+        occupancy_tracker.rebuild(supabase)
+        return occupancy_tracker.snapshot()
+
+    except Exception as e:
+        logger.error(f"Rebuild occupancy error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.websocket("/ws")
+async def occupancy_feed(websocket: WebSocket):
+    """
+    Push occupancy updates to dashboards
+    - Sends a full snapshot on connect
+    - Then one message per check-in / check-out with the new count
+    """
+    await websocket.accept()
+    queue = occupancy_tracker.subscribe()
+
+    try:
+        await websocket.send_json({"type": "snapshot", **occupancy_tracker.snapshot()})
+        while True:
+            message = await queue.get()
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Occupancy feed closed: {str(e)}")
+    finally:
+        occupancy_tracker.unsubscribe(queue)
@@ -1,22 +1,32 @@
 """
 Payments management routes
 """
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from typing import List, Optional, Dict, Any
 import logging
 import os
-from models import PaymentCreate, PaymentUpdate, PaymentResponse, MemberWithPaymentCreate
-from supabase_client import get_supabase, get_supabase_service
+from models import (
+    PaymentCreate, PaymentUpdate, PaymentResponse, MemberWithPaymentCreate,
+    PaymentBulkCreate, PaymentBulkRowResult, PaymentBulkResult
+)
+from supabase_client import get_supabase, get_supabase_service, run_queries, insert_rows
 from datetime import datetime
 from email_service import send_welcome_email, send_payment_receipt
 from password_manager import encrypt_password, decrypt_password
+from services.member_search import member_search_service
+from routes.auth import get_optional_user
+from services.invoice_service import invoice_service
+from services.response_cache import invalidates, response_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
+BULK_MAX_PAYMENTS = 500
+
 
 @router.post("/with-member", response_model=PaymentResponse)
-async def create_member_with_payment(data: MemberWithPaymentCreate):
+@invalidates("members", "payments")
+async def create_member_with_payment(data: MemberWithPaymentCreate, current_user: Optional[dict] = Depends(get_optional_user)):
     """Create a new member with payment in single transaction"""
     supabase = get_supabase_service()
     
@@ -120,6 +130,7 @@ async def create_member_with_payment(data: MemberWithPaymentCreate):
             raise HTTPException(status_code=500, detail="Failed to create member")
         
         member_id = member_response.data[0]["id"]
+        member_search_service.invalidate()
         
         # Store encrypted password for admin retrieval
         if generated_password:
@@ -156,7 +167,9 @@ async def create_member_with_payment(data: MemberWithPaymentCreate):
                 "remaining_balance": balance_due,
                 "created_at": datetime.utcnow().isoformat()
             }
-            payment_response = supabase.table("payments").insert(payment_data).execute()
+            if current_user:
+                payment_data["recorded_by"] = current_user["id"]
+            payment_response = insert_rows(supabase, "payments", payment_data, optional_columns=["recorded_by"])
             
             result = payment_response.data[0]
             result["member_name"] = data.full_name
@@ -216,7 +229,8 @@ async def create_member_with_payment(data: MemberWithPaymentCreate):
 
 
 @router.post("", response_model=PaymentResponse)
-async def create_payment(payment: PaymentCreate):
+@invalidates("payments", "members")
+async def create_payment(payment: PaymentCreate, current_user: Optional[dict] = Depends(get_optional_user)):
     """Create a new payment"""
     supabase = get_supabase()
     
@@ -239,8 +253,10 @@ async def create_payment(payment: PaymentCreate):
         payment_data = payment.model_dump()
         payment_data["payment_date"] = payment.payment_date.isoformat()
         payment_data["created_at"] = datetime.utcnow().isoformat()
+        if current_user:
+            payment_data["recorded_by"] = current_user["id"]
         
-        response = supabase.table("payments").insert(payment_data).execute()
+        response = insert_rows(supabase, "payments", payment_data, optional_columns=["recorded_by"])
         
         result = response.data[0]
         result["member_name"] = member_name
@@ -255,6 +271,115 @@ async def create_payment(payment: PaymentCreate):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/bulk", response_model=PaymentBulkResult)
+@invalidates("payments", "members")
+async def create_payments_bulk(
+    data: PaymentBulkCreate,
+    background_tasks: BackgroundTasks,
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Record a batch of payments (e.g. the day's cash collections) in one request
+    Members and plans are validated with one query each and all valid rows are
+    inserted in a single statement, so the batch is written entirely or not at all.
+    """
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    if not data.payments:
+        raise HTTPException(status_code=400, detail="No payments given")
+    if len(data.payments) > BULK_MAX_PAYMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_PAYMENTS} payments per batch")
+    
+    try:
+        member_ids = list({p.member_id for p in data.payments})
+        plan_ids = list({p.plan_id for p in data.payments if p.plan_id})
+        members_response, balances_response, plans_response = await run_queries(
+            supabase.table("members").select("id, full_name, status").in_("id", member_ids),
+            supabase.table("member_balances").select("member_id, balance_due").in_("member_id", member_ids),
+            supabase.table("plans").select("id, name").in_("id", plan_ids) if plan_ids else (lambda: None)
+        )
+        members = {m["id"]: m for m in members_response.data}
+        balances = {b["member_id"]: float(b["balance_due"]) for b in balances_response.data}
+        plan_names = {p["id"]: p["name"] for p in plans_response.data} if plans_response else {}
+        
+        # Validate and work out each member's balance after every row, in request order
+        results = []
+        rows = []
+        for index, payment in enumerate(data.payments):
+            member = members.get(payment.member_id)
+            error = None
+            if member is None:
+                error = "Member not found"
+            elif member["status"] == "archived":
+                error = "Member is archived"
+            elif payment.plan_id and payment.plan_id not in plan_names:
+                error = "Plan not found"
+            elif payment.amount <= 0:
+                error = "Amount must be positive"
+            if error:
+                results.append(PaymentBulkRowResult(index=index, status="invalid", error=error))
+                continue
+            
+            balance = balances.get(payment.member_id, 0.0)
+            if payment.status.value == "completed":
+                balance = round(balance - payment.amount, 2)
+                balances[payment.member_id] = balance
+            
+            row = payment.model_dump(mode="json")
+            row["is_partial"] = balance > 0
+            row["remaining_balance"] = max(0, balance)
+            row["created_at"] = datetime.utcnow().isoformat()
+            if current_user:
+                row["recorded_by"] = current_user["id"]
+            rows.append((index, row))
+            results.append(PaymentBulkRowResult(index=index, status="skipped", balance_due=balance))
+        
+        failed = sum(1 for r in results if r.status == "invalid")
+        if not rows or (failed and data.all_or_nothing):
+            return PaymentBulkResult(created=0, failed=failed, results=results)
+        
+        response = insert_rows(supabase, "payments", [row for _, row in rows], optional_columns=["recorded_by"])
+        
+        created = []
+        for (index, _), payment in zip(rows, response.data):
+            payment["member_name"] = members[payment["member_id"]]["full_name"]
+            payment["plan_name"] = plan_names.get(payment.get("plan_id"))
+            results[index].status = "created"
+            results[index].payment = PaymentResponse(**payment)
+            created.append(payment)
+        
+        invoices_queued = 0
+        if data.generate_invoices:
+            completed = [p for p in created if p["status"] == "completed"]
+            if completed:
+                background_tasks.add_task(_generate_bulk_invoices, supabase, completed)
+                invoices_queued = len(completed)
+        
+        logger.info(f"Bulk payments: {len(created)} created, {failed} invalid")
+        return PaymentBulkResult(created=len(created), failed=failed, invoices_queued=invoices_queued, results=results)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk create payments error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _generate_bulk_invoices(supabase, payments: List[Dict[str, Any]]):
+    """Insert a paid invoice for each payment of a bulk batch (runs after the response is sent)"""
+    try:
+        supabase.table("invoices").insert([
+            invoice_service.payment_invoice_data(payment, payment.get("plan_name"))
+            for payment in payments
+        ]).execute()
+        response_cache.invalidate("invoices")
+        logger.info(f"Generated {len(payments)} invoices for bulk payments")
+    except Exception as e:
+        logger.error(f"Bulk invoice generation error: {str(e)}")
+
+
 @router.get("", response_model=List[PaymentResponse])
 async def get_payments(member_id: Optional[str] = None, status: Optional[str] = None):
     """Get all payments"""
@@ -319,6 +444,7 @@ async def get_payment(payment_id: str):
 
 
 @router.put("/{payment_id}", response_model=PaymentResponse)
+@invalidates("payments", "members")
 async def update_payment(payment_id: str, payment_update: PaymentUpdate):
     """Update payment"""
     supabase = get_supabase()
@@ -360,6 +486,7 @@ async def update_payment(payment_id: str, payment_update: PaymentUpdate):
 
 
 @router.delete("/{payment_id}")
+@invalidates("payments", "members")
 async def delete_payment(payment_id: str):
     """Delete payment"""
     supabase = get_supabase()
@@ -5,14 +5,16 @@ from fastapi import APIRouter, HTTPException
 from typing import List
 import logging
 from models import PlanCreate, PlanUpdate, PlanResponse
-from supabase_client import get_supabase, get_supabase_service
+from supabase_client import get_supabase, get_supabase_service, count_rows
 from datetime import datetime
+from services.response_cache import cached, invalidates
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/plans", tags=["Plans"])
 
 
 @router.post("", response_model=PlanResponse)
+@invalidates("plans")
 async def create_plan(plan: PlanCreate):
     """Create a new plan"""
     supabase = get_supabase_service()
@@ -31,6 +33,7 @@ async def create_plan(plan: PlanCreate):
 
 
 @router.get("", response_model=List[PlanResponse])
+@cached(ttl=300, tags=["plans"])
 async def get_plans(is_active: bool = None):
     """Get all plans"""
     supabase = get_supabase_service()
@@ -51,6 +54,7 @@ async def get_plans(is_active: bool = None):
 
 
 @router.get("/{plan_id}", response_model=PlanResponse)
+@cached(ttl=300, tags=["plans"])
 async def get_plan(plan_id: str):
     """Get plan by ID"""
     supabase = get_supabase_service()
@@ -71,6 +75,7 @@ async def get_plan(plan_id: str):
 
 
 @router.put("/{plan_id}", response_model=PlanResponse)
+@invalidates("plans")
 async def update_plan(plan_id: str, plan_update: PlanUpdate):
     """Update plan"""
     supabase = get_supabase_service()
@@ -95,6 +100,7 @@ async def update_plan(plan_id: str, plan_update: PlanUpdate):
 
 
 @router.delete("/{plan_id}")
+@invalidates("plans")
 async def delete_plan(plan_id: str):
     """Delete plan"""
     supabase = get_supabase_service()
@@ -106,8 +112,8 @@ async def delete_plan(plan_id: str):
             raise HTTPException(status_code=404, detail="Plan not found")
         
         # Check if plan is being used by any member
-        members = supabase.table("members").select("id").eq("plan_id", plan_id).execute()
-        if members.data:
+        members = count_rows(supabase, "members").eq("plan_id", plan_id).execute()
+        if members.count:
             raise HTTPException(status_code=400, detail="Cannot delete plan that is assigned to members")
         
         # Delete plan
@@ -0,0 +1,43 @@
+"""
+Request profile routes (listing and viewing captured flamegraphs)
+"""
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import FileResponse
+from typing import Optional, List, Dict, Any
+from services.profiler import request_profiler
+
+router = APIRouter(prefix="/profiles", tags=["Profiler"])
+
+
+def _verify_profiler_token(token: Optional[str]):
+    if not request_profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is disabled. Set PROFILER_TOKEN to enable it.")
+    if not request_profiler.check_token(token):
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+
+
+@router.get("")
+async def list_profiles(x_profile: Optional[str] = Header(None)) -> List[Dict[str, Any]]:
+    """List captured request profiles, newest first"""
+    _verify_profiler_token(x_profile)
+    return request_profiler.list_profiles()
+
+
+@router.get("/{profile_id}")
+async def get_profile_html(profile_id: str, x_profile: Optional[str] = Header(None)):
+    """Interactive HTML flamegraph for a profile"""
+    _verify_profiler_token(x_profile)
+    path = request_profiler.profile_path(profile_id, ".html")
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html")
+
+
+@router.get("/{profile_id}/speedscope")
+async def get_profile_speedscope(profile_id: str, x_profile: Optional[str] = Header(None)):
+    """Profile in speedscope format (open at https://www.speedscope.app)"""
+    _verify_profiler_token(x_profile)
+    path = request_profiler.profile_path(profile_id, ".speedscope.json")
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
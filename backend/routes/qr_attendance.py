@@ -2,16 +2,29 @@
 QR Code based attendance tracking routes
 """
 from fastapi import APIRouter, HTTPException
-from typing import Optional
+from typing import Optional, List, Dict, Any
+import bisect
+import time
 import logging
-from models import QRScanRequest, QRScanResponse
-from supabase_client import get_supabase, get_supabase_service
-from datetime import datetime, date
-from qr_service import generate_qr_code, generate_qr_image
+from collections import defaultdict
+from models import (
+    QRScanRequest, QRScanResponse, QRBatchScanItem, QRBatchScanRequest,
+    QRBatchScanResult, QRBatchScanResponse
+)
+from supabase_client import get_supabase, get_supabase_service, run_queries
+from datetime import datetime, date, timezone
+from qr_service import generate_qr_code, generate_qr_image, verify_signed_qr_code, SIGNED_PREFIX
+from services.occupancy import occupancy_tracker
+from services.attendance_sweeper import attendance_sweeper
+from services.qr_revocations import qr_revocation_list
+from services.response_cache import invalidates
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/qr-attendance", tags=["QR Attendance"])
 
+# Upper bound on scans accepted in one kiosk batch
+MAX_BATCH_SCANS = 500
+
 
 @router.post("/generate/{member_id}")
 async def generate_member_qr(member_id: str):
@@ -53,6 +66,7 @@ async def generate_member_qr(member_id: str):
 
 
 @router.post("/scan", response_model=QRScanResponse)
+@invalidates("attendance")
 async def scan_qr_code(scan_request: QRScanRequest):
     """
     Scan QR code for attendance
@@ -65,17 +79,13 @@ async def scan_qr_code(scan_request: QRScanRequest):
         logger.info(f"Scanning QR code: {scan_request.qr_code}")
         
         # Find member by QR code
-        member_response = supabase.table("members").select("id, full_name, status").eq("qr_code", scan_request.qr_code).execute()
-        
-        logger.info(f"Member search result: {member_response.data}")
+        members, errors = _resolve_qr_codes(supabase, [scan_request.qr_code])
         
-        if not member_response.data:
-            # Log all members with QR codes for debugging
-            all_members = supabase.table("members").select("id, full_name, qr_code").limit(5).execute()
-            logger.info(f"Sample members with QR codes: {all_members.data}")
-            raise HTTPException(status_code=404, detail=f"Invalid QR code or member not found. Scanned: {scan_request.qr_code}")
+        if scan_request.qr_code not in members:
+            message = errors.get(scan_request.qr_code, "Invalid QR code or member not found")
+            raise HTTPException(status_code=404, detail=f"{message}. Scanned: {scan_request.qr_code}")
         
-        member = member_response.data[0]
+        member = members[scan_request.qr_code]
         member_id = member["id"]
         member_name = member["full_name"]
         
@@ -109,6 +119,7 @@ async def scan_qr_code(scan_request: QRScanRequest):
                 update_data["notes"] = scan_request.notes
             
             supabase.table("attendance").update(update_data).eq("id", attendance_id).execute()
+            occupancy_tracker.check_out(member_id, attendance_id)
             
             return QRScanResponse(
                 success=True,
@@ -131,6 +142,7 @@ async def scan_qr_code(scan_request: QRScanRequest):
             
             response = supabase.table("attendance").insert(attendance_data).execute()
             attendance_id = response.data[0]["id"]
+            occupancy_tracker.check_in(member_id, member_name, attendance_id, attendance_data["check_in_time"])
             
             return QRScanResponse(
                 success=True,
@@ -149,30 +161,347 @@ async def scan_qr_code(scan_request: QRScanRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/scan/batch", response_model=QRBatchScanResponse)
+@invalidates("attendance")
+async def scan_qr_code_batch(batch: QRBatchScanRequest):
+    """
+    Apply QR scans buffered by a kiosk while it was offline
+    - Scans are paired into check-ins/check-outs in scan order per member
+    - Scans whose idempotency key was already processed are reported as duplicates
+    """
+    supabase = get_supabase_service()
+    
+    if len(batch.scans) > MAX_BATCH_SCANS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {MAX_BATCH_SCANS} scans")
+    
+    try:
+        results: Dict[str, QRBatchScanResult] = {}
+        
+        # Keep the first occurrence of each idempotency key
+        scans = []
+        seen = set()
+        for scan in batch.scans:
+            if scan.idempotency_key not in seen:
+                seen.add(scan.idempotency_key)
+                scans.append(scan)
+        keys = [scan.idempotency_key for scan in scans]
+        
+        # Keys already processed by an earlier (replayed) batch
+        if keys:
+            existing = supabase.table("attendance_scan_keys")\
+                .select("*")\
+                .in_("idempotency_key", keys)\
+                .execute()
+            for row in existing.data:
+                results[row["idempotency_key"]] = QRBatchScanResult(
+                    idempotency_key=row["idempotency_key"],
+                    success=True,
+                    action="duplicate",
+                    member_id=row.get("member_id"),
+                    attendance_id=row.get("attendance_id"),
+                    timestamp=row.get("scanned_at") or "",
+                    message=f"Already processed ({row.get('action') or 'pending'})"
+                )
+        
+        # Claim the remaining keys; a concurrent replay only gets the keys it inserted
+        pending = [scan for scan in scans if scan.idempotency_key not in results]
+        claimed = set()
+        if pending:
+            claim_response = supabase.table("attendance_scan_keys").upsert(
+                [
+                    {
+                        "idempotency_key": scan.idempotency_key,
+                        "device_id": batch.device_id,
+                        "scanned_at": _to_utc_naive(scan.scanned_at).isoformat()
+                    }
+                    for scan in pending
+                ],
+                on_conflict="idempotency_key",
+                ignore_duplicates=True
+            ).execute()
+            claimed = {row["idempotency_key"] for row in claim_response.data}
+        
+        for scan in pending:
+            if scan.idempotency_key not in claimed:
+                results[scan.idempotency_key] = QRBatchScanResult(
+                    idempotency_key=scan.idempotency_key,
+                    success=True,
+                    action="duplicate",
+                    timestamp=_to_utc_naive(scan.scanned_at).isoformat(),
+                    message="Already being processed by another request"
+                )
+        
+        claimed_scans = [scan for scan in pending if scan.idempotency_key in claimed]
+        if claimed_scans:
+            written: List[str] = []
+            try:
+                results.update(_apply_batch_scans(supabase, claimed_scans, batch.device_id, written))
+            except Exception:
+                if not written:
+                    # Nothing was written: release the claims so the kiosk can retry the batch
+                    supabase.table("attendance_scan_keys").delete().in_("idempotency_key", list(claimed)).execute()
+                else:
+                    # Attendance rows are committed; keeping the claims makes a retry report
+                    # duplicates instead of creating the sessions a second time
+                    logger.error(f"QR batch scan failed after writing {', '.join(written)}; keeping {len(claimed)} scan keys")
+                raise
+            
+            # Rejected scans do not keep their key, so a corrected retry is not treated as a duplicate
+            rejected = [key for key in claimed if not results[key].success]
+            if rejected:
+                supabase.table("attendance_scan_keys").delete().in_("idempotency_key", rejected).execute()
+        
+        ordered = [results[key] for key in keys]
+        return QRBatchScanResponse(
+            processed=len(ordered),
+            check_ins=sum(1 for r in ordered if r.action == "check_in"),
+            check_outs=sum(1 for r in ordered if r.action == "check_out"),
+            duplicates=sum(1 for r in ordered if r.action == "duplicate"),
+            failed=sum(1 for r in ordered if not r.success),
+            results=ordered
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"QR batch scan error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _resolve_qr_codes(supabase, codes: List[str]):
+    """
+    Map scanned QR codes to members
+    - Signed (GYM2) codes are verified locally and looked up by member id
+    - Legacy GYM- codes are looked up by the stored qr_code column
+    Returns (members by code, error message by code)
+    """
+    members_by_code: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    signed: Dict[str, str] = {}
+    legacy: List[str] = []
+    
+    for code in codes:
+        if not code.startswith(SIGNED_PREFIX):
+            legacy.append(code)
+            continue
+        payload = verify_signed_qr_code(code)
+        if payload is None:
+            errors[code] = "Invalid QR code signature"
+        elif qr_revocation_list.is_revoked(supabase, payload.member_id, payload.issued_at):
+            errors[code] = "QR code has been replaced by a newer one"
+        else:
+            signed[code] = payload.member_id
+    
+    if signed:
+        response = supabase.table("members")\
+            .select("id, full_name, status")\
+            .in_("id", list(set(signed.values())))\
+            .execute()
+        by_id = {member["id"]: member for member in response.data}
+        for code, member_id in signed.items():
+            if member_id in by_id:
+                members_by_code[code] = by_id[member_id]
+    
+    if legacy:
+        response = supabase.table("members")\
+            .select("id, full_name, status, qr_code")\
+            .in_("qr_code", legacy)\
+            .execute()
+        for member in response.data:
+            members_by_code[member["qr_code"]] = member
+    
+    return members_by_code, errors
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    """Normalise kiosk timestamps to naive UTC like the rest of the attendance data"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a Postgres timestamp into a naive UTC datetime"""
+    return _to_utc_naive(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def _apply_batch_scans(supabase, scans: List[QRBatchScanItem], device_id: Optional[str],
+                       written: List[str]) -> Dict[str, QRBatchScanResult]:
+    """
+    Resolve, pair and write a list of claimed scans with bulk queries
+    Each table written is appended to written, so a caller handling a failure
+    knows whether attendance rows were already committed.
+    """
+    results: Dict[str, QRBatchScanResult] = {}
+    
+    # Resolve every QR code in at most two queries
+    members_by_code, errors = _resolve_qr_codes(supabase, list({scan.qr_code for scan in scans}))
+    
+    valid = []
+    for scan in scans:
+        timestamp = _to_utc_naive(scan.scanned_at)
+        member = members_by_code.get(scan.qr_code)
+        if not member:
+            message = errors.get(scan.qr_code, "Invalid QR code or member not found")
+        elif member["status"] != "active":
+            message = f"Member status is {member['status']}. Only active members can check in."
+        else:
+            valid.append((timestamp, scan, member))
+            continue
+        results[scan.idempotency_key] = QRBatchScanResult(
+            idempotency_key=scan.idempotency_key,
+            success=False,
+            member_id=member["id"] if member else None,
+            member_name=member["full_name"] if member else None,
+            timestamp=timestamp.isoformat(),
+            message=message
+        )
+    
+    if not valid:
+        return results
+    
+    # Open sessions of every scanned member on every scanned day, in one query
+    member_ids = list({member["id"] for _, _, member in valid})
+    days = list({timestamp.date().isoformat() for timestamp, _, _ in valid})
+    open_response = supabase.table("attendance")\
+        .select("*")\
+        .in_("member_id", member_ids)\
+        .in_("date", days)\
+        .is_("check_out_time", "null")\
+        .order("check_in_time")\
+        .execute()
+    # Open sessions per member and day, in check-in order
+    open_sessions: Dict[tuple, List[tuple]] = defaultdict(list)
+    for record in open_response.data:
+        open_sessions[(record["member_id"], record["date"])].append((_parse_timestamp(record["check_in_time"]), record))
+    
+    # Pair scans in time order: a scan closes the latest session opened at or
+    # before it, otherwise it opens a new one (an offline scan replayed after
+    # a later online check-in must not become that session's check-out)
+    new_sessions: List[Dict[str, Any]] = []
+    closed_sessions: Dict[str, Dict[str, Any]] = {}
+    outcomes = []
+    now = datetime.utcnow().isoformat()
+    for timestamp, scan, member in sorted(valid, key=lambda v: v[0]):
+        slot = (member["id"], timestamp.date().isoformat())
+        sessions = open_sessions[slot]
+        earlier = [i for i, (check_in, _) in enumerate(sessions) if check_in <= timestamp]
+        session = sessions.pop(earlier[-1])[1] if earlier else None
+        if session is not None:
+            session["check_out_time"] = timestamp.isoformat()
+            if scan.notes:
+                session["notes"] = scan.notes
+            if session.get("id"):
+                closed_sessions[session["id"]] = session
+            outcomes.append((timestamp, scan, member, "check_out", session))
+        else:
+            session = {
+                "member_id": member["id"],
+                "check_in_time": timestamp.isoformat(),
+                "check_out_time": None,
+                "date": slot[1],
+                "notes": scan.notes,
+                "created_at": now
+            }
+            new_sessions.append(session)
+            bisect.insort(sessions, (timestamp, session), key=lambda item: item[0])
+            outcomes.append((timestamp, scan, member, "check_in", session))
+    
+    # Bulk writes: one insert for new sessions, one guarded close for existing ones
+    if new_sessions:
+        inserted = supabase.table("attendance").insert(new_sessions).execute()
+        written.append("attendance")
+        for session, row in zip(new_sessions, inserted.data):
+            session["id"] = row["id"]
+    if closed_sessions:
+        # Only sessions still open are closed: a live /scan check-out or the sweeper
+        # may have closed one (or it was deleted) since it was read above
+        closed_rows = attendance_sweeper.close_sessions(supabase, [
+            {
+                "id": session["id"],
+                "date": session["date"],
+                "check_out_time": session["check_out_time"],
+                "notes": session.get("notes")
+            }
+            for session in closed_sessions.values()
+        ])
+        written.append("attendance")
+        closed_ids = {row["id"] for row in closed_rows}
+        unpaired = [o for o in outcomes if o[3] == "check_out" and o[4]["id"] in closed_sessions and o[4]["id"] not in closed_ids]
+        for timestamp, scan, member, action, session in unpaired:
+            # Rejected, so its key is released and a retry of the scan is applied afresh
+            results[scan.idempotency_key] = QRBatchScanResult(
+                idempotency_key=scan.idempotency_key,
+                success=False,
+                member_id=member["id"],
+                member_name=member["full_name"],
+                attendance_id=session["id"],
+                timestamp=timestamp.isoformat(),
+                message="Session was already closed or removed by another check-out"
+            )
+        unpaired_keys = {scan.idempotency_key for _, scan, _, _, _ in unpaired}
+        outcomes = [o for o in outcomes if o[1].idempotency_key not in unpaired_keys]
+    
+    if not outcomes:
+        return results
+    
+    supabase.table("attendance_scan_keys").upsert([
+        {
+            "idempotency_key": scan.idempotency_key,
+            "device_id": device_id,
+            "member_id": member["id"],
+            "attendance_id": session["id"],
+            "action": action,
+            "scanned_at": timestamp.isoformat()
+        }
+        for timestamp, scan, member, action, session in outcomes
+    ]).execute()
+    
+    today = date.today().isoformat()
+    for timestamp, scan, member, action, session in outcomes:
+        if action == "check_out":
+            occupancy_tracker.check_out(member["id"], session["id"])
+        elif session["date"] == today:
+            occupancy_tracker.check_in(member["id"], member["full_name"], session["id"], session["check_in_time"])
+        
+        verb = "checked in" if action == "check_in" else "checked out"
+        results[scan.idempotency_key] = QRBatchScanResult(
+            idempotency_key=scan.idempotency_key,
+            success=True,
+            action=action,
+            member_id=member["id"],
+            member_name=member["full_name"],
+            attendance_id=session["id"],
+            timestamp=timestamp.isoformat(),
+            message=f"{member['full_name']} {verb} successfully"
+        )
+    
+    return results
+
+
 @router.get("/status/{member_id}")
 async def get_member_attendance_status(member_id: str):
     """Get current attendance status for a member"""
     supabase = get_supabase_service()
     
     try:
-        # Get member info
-        member_response = supabase.table("members").select("id, full_name, status").eq("id", member_id).execute()
+        # Get member info and check for active check-in today
+        today = date.today().isoformat()
+        member_response, attendance_response = await run_queries(
+            supabase.table("members").select("id, full_name, status").eq("id", member_id),
+            supabase.table("attendance")
+                .select("*")
+                .eq("member_id", member_id)
+                .eq("date", today)
+                .is_("check_out_time", "null")
+                .order("check_in_time", desc=True)
+                .limit(1)
+        )
         if not member_response.data:
             raise HTTPException(status_code=404, detail="Member not found")
         
         member = member_response.data[0]
         
-        # Check for active check-in today
-        today = date.today().isoformat()
-        attendance_response = supabase.table("attendance")\
-            .select("*")\
-            .eq("member_id", member_id)\
-            .eq("date", today)\
-            .is_("check_out_time", "null")\
-            .order("check_in_time", desc=True)\
-            .limit(1)\
-            .execute()
-        
         if attendance_response.data:
             attendance = attendance_response.data[0]
             return {
@@ -205,18 +534,34 @@ async def regenerate_member_qr(member_id: str):
     
     try:
         # Check if member exists
-        member_response = supabase.table("members").select("id, full_name").eq("id", member_id).execute()
+        member_response = supabase.table("members").select("id, full_name, qr_code").eq("id", member_id).execute()
         if not member_response.data:
             raise HTTPException(status_code=404, detail="Member not found")
         
         member = member_response.data[0]
         
+        # issued_at has whole-second resolution: issue the new code strictly after
+        # the current one and the existing cut-off, so a code replaced within the
+        # same second still falls before the new cut-off
+        issued_at = int(time.time())
+        previous = verify_signed_qr_code(member["qr_code"]) if member.get("qr_code") else None
+        if previous:
+            issued_at = max(issued_at, previous.issued_at + 1)
+        cutoff = qr_revocation_list.revoked_before(supabase, member_id)
+        if cutoff is not None:
+            issued_at = max(issued_at, cutoff + 1)
+        
         # Generate new QR code
-        qr_code_data = generate_qr_code(member_id)
+        qr_code_data = generate_qr_code(member_id, issued_at)
         
         # Update member with new QR code
         supabase.table("members").update({"qr_code": qr_code_data}).eq("id", member_id).execute()
         
+        # Signed codes verify without the qr_code column, so revoke the older ones explicitly
+        payload = verify_signed_qr_code(qr_code_data)
+        if payload:
+            qr_revocation_list.revoke(supabase, member_id, payload.issued_at)
+        
         # Generate QR image
         qr_image = generate_qr_image(qr_code_data)
         
@@ -233,3 +578,19 @@ async def regenerate_member_qr(member_id: str):
     except Exception as e:
         logger.error(f"Regenerate QR error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/revocations")
+async def get_qr_revocations():
+    """
+    Revocation list for kiosks that validate signed QR codes offline
+    Codes for a listed member issued before the given epoch must be rejected
+    """
+    supabase = get_supabase_service()
+    
+    try:
+        return qr_revocation_list.snapshot(supabase)
+        
+    except Exception as e:
+        logger.error(f"Get QR revocations error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
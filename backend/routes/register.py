@@ -0,0 +1,197 @@
+"""
+Cash register routes: live day totals and Z-report closes
+Totals are maintained per day, payment method and staff member by a trigger on
+payments (cash_register.sql), so reading or closing a day never re-scans its
+payments.
+"""
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional, Dict, Any
+import os
+import logging
+from collections import defaultdict
+from models import RegisterTotal, ZReport, RegisterDay, RegisterCloseRequest
+from supabase_client import get_supabase_service, run_queries, RPC_NOT_FOUND_CODE
+from routes.auth import get_current_user
+from datetime import date
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/register", tags=["Cash Register"])
+
+# Payments without recorded_by are totalled under this staff id
+UNATTRIBUTED_STAFF_ID = "00000000-0000-0000-0000-000000000000"
+UNIQUE_VIOLATION_CODE = "23505"
+CLOSES_MAX_LIMIT = 366
+
+# A declared cash count within this amount of the expected cash counts as balanced
+CASH_TOLERANCE = float(os.environ.get('REGISTER_CASH_TOLERANCE', '0'))
+
+
+def _require_admin(current_user: dict):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can use the cash register")
+
+
+def _group(rows: List[Dict[str, Any]], key: str) -> List[Dict[str, Any]]:
+    """Sum payment_count / total_amount of register_totals rows by one column"""
+    grouped = defaultdict(lambda: {"payment_count": 0, "total_amount": 0.0})
+    for row in rows:
+        total = grouped[row[key]]
+        total["payment_count"] += row["payment_count"]
+        total["total_amount"] = round(total["total_amount"] + float(row["total_amount"]), 2)
+    return [{key: value, **total} for value, total in sorted(grouped.items(), key=lambda item: -item[1]["total_amount"])]
+
+
+def _staff_id(value: Optional[str]) -> Optional[str]:
+    return None if value in (None, UNATTRIBUTED_STAFF_ID) else value
+
+
+@router.get("/closes", response_model=List[ZReport])
+async def get_register_closes(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    status: Optional[str] = None,
+    limit: int = 31,
+    current_user: dict = Depends(get_current_user)
+):
+    """List Z-reports, newest first (status=short / over for discrepancies)"""
+    _require_admin(current_user)
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        query = supabase.table("register_closes").select("*")
+        
+        if from_date:
+            query = query.gte("business_date", from_date.isoformat())
+        
+        if to_date:
+            query = query.lte("business_date", to_date.isoformat())
+        
+        if status:
+            query = query.eq("status", status)
+        
+        response = query.order("business_date", desc=True).limit(min(max(limit, 1), CLOSES_MAX_LIMIT)).execute()
+        
+        return [ZReport(**close) for close in response.data]
+    
+    except Exception as e:
+        logger.error(f"Get register closes error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{business_date}", response_model=RegisterDay)
+async def get_register_day(business_date: date, current_user: dict = Depends(get_current_user)):
+    """Running totals for a business day by payment method and staff member, with its Z-report once closed"""
+    _require_admin(current_user)
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        totals_response, close_response = await run_queries(
+            supabase.table("register_totals")
+                .select("payment_method, staff_id, payment_count, total_amount")
+                .eq("business_date", business_date.isoformat())
+                .neq("payment_count", 0),
+            supabase.table("register_closes").select("*").eq("business_date", business_date.isoformat())
+        )
+        rows = totals_response.data
+        
+        by_staff = _group(rows, "staff_id")
+        staff_ids = [t["staff_id"] for t in by_staff if _staff_id(t["staff_id"])]
+        names = {}
+        if staff_ids:
+            users_response = supabase.table("users").select("id, full_name").in_("id", staff_ids).execute()
+            names = {u["id"]: u["full_name"] for u in users_response.data}
+        for total in by_staff:
+            total["staff_id"] = _staff_id(total["staff_id"])
+            total["staff_name"] = names.get(total["staff_id"]) if total["staff_id"] else "Unattributed"
+        
+        payment_count = sum(row["payment_count"] for row in rows)
+        total_amount = round(sum(float(row["total_amount"]) for row in rows), 2)
+        day = RegisterDay(
+            business_date=business_date.isoformat(),
+            payment_count=payment_count,
+            total_amount=total_amount,
+            cash_total=round(sum(float(row["total_amount"]) for row in rows if row["payment_method"] == "cash"), 2),
+            by_method=[RegisterTotal(**total) for total in _group(rows, "payment_method")],
+            by_staff=[RegisterTotal(**total) for total in by_staff]
+        )
+        
+        if close_response.data:
+            z_report = ZReport(**close_response.data[0])
+            day.closed = True
+            day.z_report = z_report
+            day.post_close_count = payment_count - z_report.payment_count
+            day.post_close_amount = round(total_amount - z_report.total_amount, 2)
+        
+        return day
+    
+    except Exception as e:
+        logger.error(f"Get register day error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/close", response_model=ZReport)
+async def close_register(request: RegisterCloseRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Close a business day: lock its totals into a Z-report and compare the
+    declared cash count with the opening float plus cash payments
+    """
+    _require_admin(current_user)
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    business_date = request.business_date or date.today()
+    
+    try:
+        response = supabase.rpc("close_register", {
+            "p_business_date": business_date.isoformat(),
+            "p_declared_cash": request.declared_cash,
+            "p_opening_float": request.opening_float,
+            "p_closed_by": current_user["id"],
+            "p_notes": request.notes,
+            "p_tolerance": CASH_TOLERANCE
+        }).execute()
+        
+        z_report = ZReport(**response.data)
+        if z_report.status != "balanced":
+            logger.warning(
+                f"Register for {z_report.business_date} closed {z_report.status}: "
+                f"declared {z_report.declared_cash:.2f}, expected {z_report.expected_cash:.2f}"
+            )
+        return z_report
+    
+    except Exception as e:
+        code = getattr(e, "code", None)
+        if code == UNIQUE_VIOLATION_CODE:
+            raise HTTPException(status_code=409, detail=f"Register for {business_date.isoformat()} is already closed")
+        if code == RPC_NOT_FOUND_CODE:
+            raise HTTPException(status_code=503, detail="Cash register is not set up (run cash_register.sql)")
+        logger.error(f"Close register error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/{business_date}/rebuild")
+async def rebuild_register_day(business_date: date, current_user: dict = Depends(get_current_user)):
+    """Recompute a day's running totals from its payments (repair; the Z-report is not changed)"""
+    _require_admin(current_user)
+    supabase = get_supabase_service()
+    
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase service not configured")
+    
+    try:
+        response = supabase.rpc("rebuild_register_totals", {"p_business_date": business_date.isoformat()}).execute()
+        return {"business_date": business_date.isoformat(), "rows": response.data}
+    
+    except Exception as e:
+        if getattr(e, "code", None) == RPC_NOT_FOUND_CODE:
+            raise HTTPException(status_code=503, detail="Cash register is not set up (run cash_register.sql)")
+        logger.error(f"Rebuild register totals error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
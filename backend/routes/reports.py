@@ -2,39 +2,47 @@
 Reports and analytics routes
 """
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import time
+import asyncio
 import logging
-from supabase_client import get_supabase, get_supabase_service
+from supabase_client import get_supabase, get_supabase_service, run_queries, count_rows, aggregate_rows
 from datetime import datetime, timedelta, date
+from services.response_cache import cached
+from routes.balance import get_balance_summary
+from routes.invoices import get_invoice_analytics
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
 
 @router.get("/dashboard")
+@cached(ttl=60, tags=["members", "attendance", "payments", "plans"])
 async def get_dashboard_stats() -> Dict[str, Any]:
     """Get dashboard statistics"""
     supabase = get_supabase_service()
     
     try:
-        # Total members
-        members_response = supabase.table("members").select("id, status").execute()
-        total_members = len(members_response.data)
-        active_members = len([m for m in members_response.data if m.get("status") == "active"])
-        
-        # Today's attendance
         today = date.today().isoformat()
-        attendance_response = supabase.table("attendance").select("id").eq("date", today).execute()
-        today_attendance = len(attendance_response.data)
-        
-        # This month's revenue
         first_day = date.today().replace(day=1).isoformat()
-        payments_response = supabase.table("payments").select("amount").gte("payment_date", first_day).eq("status", "completed").execute()
-        monthly_revenue = sum(p.get("amount", 0) for p in payments_response.data)
         
-        # Total plans
-        plans_response = supabase.table("plans").select("id").eq("is_active", True).execute()
-        total_plans = len(plans_response.data)
+        members_by_status, attendance_response, revenue, plans_response = await run_queries(
+            # Total and active members
+            aggregate_rows(supabase, "members", group_by=["status"]),
+            # Today's attendance
+            count_rows(supabase, "attendance").eq("date", today),
+            # This month's revenue
+            aggregate_rows(supabase, "payments", sums=["amount"],
+                           filters=[("payment_date", "gte", first_day), ("status", "eq", "completed")]),
+            # Total plans
+            count_rows(supabase, "plans").eq("is_active", True)
+        )
+        
+        total_members = sum(g["count"] for g in members_by_status)
+        active_members = sum(g["count"] for g in members_by_status if g.get("status") == "active")
+        today_attendance = attendance_response.count or 0
+        monthly_revenue = revenue[0]["sum_amount"]
+        total_plans = plans_response.count or 0
         
         return {
             "total_members": total_members,
@@ -50,6 +58,7 @@ async def get_dashboard_stats() -> Dict[str, Any]:
 
 
 @router.get("/revenue")
+@cached(ttl=60, tags=["payments"])
 async def get_revenue_report(days: int = 30) -> Dict[str, Any]:
     """Get revenue report for specified days"""
     supabase = get_supabase_service()
@@ -84,6 +93,7 @@ async def get_revenue_report(days: int = 30) -> Dict[str, Any]:
 
 
 @router.get("/attendance")
+@cached(ttl=60, tags=["attendance"])
 async def get_attendance_report(days: int = 30) -> Dict[str, Any]:
     """Get attendance report for specified days"""
     supabase = get_supabase_service()
@@ -91,15 +101,11 @@ async def get_attendance_report(days: int = 30) -> Dict[str, Any]:
     try:
         start_date = (date.today() - timedelta(days=days)).isoformat()
         
-        attendance_response = supabase.table("attendance").select("date, member_id").gte("date", start_date).execute()
+        # Visits per date
+        by_date = aggregate_rows(supabase, "attendance", group_by=["date"], filters=[("date", "gte", start_date)]).execute()
+        attendance_by_date = {g["date"]: g["count"] for g in sorted(by_date, key=lambda g: g["date"])}
         
-        # Group by date
-        attendance_by_date = {}
-        for record in attendance_response.data:
-            record_date = record.get("date")
-            attendance_by_date[record_date] = attendance_by_date.get(record_date, 0) + 1
-        
-        total_visits = len(attendance_response.data)
+        total_visits = sum(attendance_by_date.values())
         avg_daily = total_visits / days if days > 0 else 0
         
         return {
@@ -117,31 +123,36 @@ async def get_attendance_report(days: int = 30) -> Dict[str, Any]:
 
 
 @router.get("/members")
+@cached(ttl=60, tags=["members"])
 async def get_members_report() -> Dict[str, Any]:
     """Get members statistics report"""
     supabase = get_supabase_service()
     
     try:
-        members_response = supabase.table("members").select("status, gender, end_date").execute()
+        expiring_soon_date = (date.today() + timedelta(days=30)).isoformat()
+        by_status, by_gender, expiring_response = await run_queries(
+            aggregate_rows(supabase, "members", group_by=["status"]),
+            aggregate_rows(supabase, "members", group_by=["gender"]),
+            # Expiring soon (within 30 days)
+            count_rows(supabase, "members").gte("end_date", date.today().isoformat()).lte("end_date", expiring_soon_date)
+        )
         
         # Count by status
         status_counts = {}
-        for member in members_response.data:
-            status = member.get("status", "unknown")
-            status_counts[status] = status_counts.get(status, 0) + 1
+        for group in by_status:
+            status = group.get("status", "unknown")
+            status_counts[status] = status_counts.get(status, 0) + group["count"]
         
         # Count by gender
         gender_counts = {}
-        for member in members_response.data:
-            gender = member.get("gender") or "not_specified"
-            gender_counts[gender] = gender_counts.get(gender, 0) + 1
+        for group in by_gender:
+            gender = group.get("gender") or "not_specified"
+            gender_counts[gender] = gender_counts.get(gender, 0) + group["count"]
         
-        # Expiring soon (within 30 days)
-        expiring_soon_date = (date.today() + timedelta(days=30)).isoformat()
-        expiring_soon = len([m for m in members_response.data if m.get("end_date") and m.get("end_date") <= expiring_soon_date and m.get("end_date") >= date.today().isoformat()])
+        expiring_soon = expiring_response.count or 0
         
         return {
-            "total_members": len(members_response.data),
+            "total_members": sum(status_counts.values()),
             "by_status": status_counts,
             "by_gender": gender_counts,
             "expiring_soon": expiring_soon
@@ -154,6 +165,7 @@ async def get_members_report() -> Dict[str, Any]:
 
 
 @router.get("/charts/revenue-trend")
+@cached(ttl=60, tags=["payments"])
 async def get_revenue_trend(days: int = 30) -> Dict[str, Any]:
     """Get revenue trend data for charts (day-by-day)"""
     supabase = get_supabase_service()
@@ -161,11 +173,12 @@ async def get_revenue_trend(days: int = 30) -> Dict[str, Any]:
     try:
         start_date = (date.today() - timedelta(days=days))
         
-        payments_response = supabase.table("payments")\
-            .select("amount, payment_date")\
-            .gte("payment_date", start_date.isoformat())\
-            .eq("status", "completed")\
-            .execute()
+        daily_revenue, = await run_queries(
+            aggregate_rows(
+                supabase, "payments", group_by=["payment_date:day"], sums=["amount"],
+                filters=[("payment_date", "gte", start_date.isoformat()), ("status", "eq", "completed")]
+            )
+        )
         
         # Group by date
         revenue_by_date = {}
@@ -173,10 +186,10 @@ async def get_revenue_trend(days: int = 30) -> Dict[str, Any]:
             current_date = (start_date + timedelta(days=i)).isoformat()
             revenue_by_date[current_date] = 0
         
-        for payment in payments_response.data:
-            payment_date = payment.get("payment_date")
+        for group in daily_revenue:
+            payment_date = group.get("payment_date")
             if payment_date in revenue_by_date:
-                revenue_by_date[payment_date] += payment.get("amount", 0)
+                revenue_by_date[payment_date] += group["sum_amount"]
         
         # Format for charts
         chart_data = [
@@ -196,6 +209,7 @@ async def get_revenue_trend(days: int = 30) -> Dict[str, Any]:
 
 
 @router.get("/charts/attendance-trend")
+@cached(ttl=60, tags=["attendance"])
 async def get_attendance_trend(days: int = 30) -> Dict[str, Any]:
     """Get attendance trend data for charts"""
     supabase = get_supabase_service()
@@ -203,10 +217,11 @@ async def get_attendance_trend(days: int = 30) -> Dict[str, Any]:
     try:
         start_date = (date.today() - timedelta(days=days))
         
-        attendance_response = supabase.table("attendance")\
-            .select("date")\
-            .gte("date", start_date.isoformat())\
-            .execute()
+        daily_attendance, = await run_queries(
+            aggregate_rows(
+                supabase, "attendance", group_by=["date:day"], filters=[("date", "gte", start_date.isoformat())]
+            )
+        )
         
         # Group by date
         attendance_by_date = {}
@@ -214,10 +229,10 @@ async def get_attendance_trend(days: int = 30) -> Dict[str, Any]:
             current_date = (start_date + timedelta(days=i)).isoformat()
             attendance_by_date[current_date] = 0
         
-        for record in attendance_response.data:
-            record_date = record.get("date")
+        for group in daily_attendance:
+            record_date = group.get("date")
             if record_date in attendance_by_date:
-                attendance_by_date[record_date] += 1
+                attendance_by_date[record_date] += group["count"]
         
         # Format for charts
         chart_data = [
@@ -238,15 +253,12 @@ async def get_attendance_trend(days: int = 30) -> Dict[str, Any]:
 
 
 @router.get("/charts/member-growth")
+@cached(ttl=60, tags=["members"])
 async def get_member_growth(months: int = 12) -> Dict[str, Any]:
     """Get member growth over time"""
     supabase = get_supabase_service()
     
     try:
-        members_response = supabase.table("members")\
-            .select("created_at, status")\
-            .execute()
-        
         # Group by month
         member_growth = {}
         
@@ -255,18 +267,17 @@ async def get_member_growth(months: int = 12) -> Dict[str, Any]:
             month_key = month_date.strftime("%Y-%m")
             member_growth[month_key] = {"new": 0, "total": 0, "active": 0}
         
-        for member in members_response.data:
-            created_at = member.get("created_at")
-            if created_at:
-                # Parse date (handle both formats)
-                if "T" in created_at:
-                    member_date = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                else:
-                    member_date = datetime.fromisoformat(created_at)
-                month_key = member_date.strftime("%Y-%m")
-                
-                if month_key in member_growth:
-                    member_growth[month_key]["new"] += 1
+        first_month = min(member_growth) if member_growth else date.today().strftime("%Y-%m")
+        new_by_month, = await run_queries(
+            aggregate_rows(
+                supabase, "members", group_by=["created_at:month"], filters=[("created_at", "gte", f"{first_month}-01")]
+            )
+        )
+        
+        for group in new_by_month:
+            month_key = group.get("created_at")
+            if month_key in member_growth:
+                member_growth[month_key]["new"] += group["count"]
         
         # Calculate cumulative total
         sorted_months = sorted(member_growth.keys())
@@ -292,23 +303,20 @@ async def get_member_growth(months: int = 12) -> Dict[str, Any]:
 
 
 @router.get("/charts/class-popularity")
+@cached(ttl=60, tags=["classes", "class_bookings"])
 async def get_class_popularity() -> Dict[str, Any]:
     """Get class booking statistics"""
     supabase = get_supabase_service()
     
     try:
         # Get all classes with booking counts
-        classes_response = supabase.table("classes").select("id, name, category").execute()
-        bookings_response = supabase.table("class_bookings")\
-            .select("class_id")\
-            .eq("status", "confirmed")\
-            .execute()
+        classes_response, bookings_by_class = await run_queries(
+            supabase.table("classes").select("id, name, category"),
+            aggregate_rows(supabase, "class_bookings", group_by=["class_id"], filters=[("status", "eq", "confirmed")])
+        )
         
         # Count bookings per class
-        booking_counts = {}
-        for booking in bookings_response.data:
-            class_id = booking.get("class_id")
-            booking_counts[class_id] = booking_counts.get(class_id, 0) + 1
+        booking_counts = {g.get("class_id"): g["count"] for g in bookings_by_class}
         
         # Format for charts
         chart_data = []
@@ -334,24 +342,26 @@ async def get_class_popularity() -> Dict[str, Any]:
 
 
 @router.get("/charts/payment-methods")
+@cached(ttl=60, tags=["payments"])
 async def get_payment_methods_distribution() -> Dict[str, Any]:
     """Get payment methods distribution"""
     supabase = get_supabase_service()
     
     try:
-        payments_response = supabase.table("payments")\
-            .select("payment_method, amount")\
-            .eq("status", "completed")\
-            .execute()
+        by_method, = await run_queries(
+            aggregate_rows(
+                supabase, "payments", group_by=["payment_method"], sums=["amount"], filters=[("status", "eq", "completed")]
+            )
+        )
         
         # Group by payment method
         method_stats = {}
-        for payment in payments_response.data:
-            method = payment.get("payment_method", "unknown")
+        for group in by_method:
+            method = group.get("payment_method", "unknown")
             if method not in method_stats:
                 method_stats[method] = {"count": 0, "total": 0}
-            method_stats[method]["count"] += 1
-            method_stats[method]["total"] += payment.get("amount", 0)
+            method_stats[method]["count"] += group["count"]
+            method_stats[method]["total"] += group["sum_amount"]
         
         # Format for charts
         chart_data = [
@@ -371,3 +381,84 @@ async def get_payment_methods_distribution() -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"Payment methods error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+
+
+# Sections of GET /reports/overview (same payloads as the individual dashboard endpoints)
+OVERVIEW_SECTIONS = (
+    "dashboard", "revenue_trend", "attendance_trend", "member_growth",
+    "class_popularity", "payment_methods", "balance_summary", "invoice_analytics"
+)
+
+
+# Upper bound for the overview's per-section timeout (seconds)
+OVERVIEW_MAX_TIMEOUT = 30.0
+
+
+async def _run_overview_section(name: str, make_coroutine, timeout: float) -> Dict[str, Any]:
+    """
+    Run one section on the running loop (its Supabase calls go to worker
+    threads through run_queries); a section that times out is cancelled
+    """
+    started = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(make_coroutine(), timeout)
+        result = {"status": "ok", "data": data}
+    except asyncio.TimeoutError:
+        result = {"status": "error", "error": f"Timed out after {timeout:g}s"}
+    except HTTPException as e:
+        result = {"status": "error", "error": e.detail}
+    except Exception as e:
+        result = {"status": "error", "error": str(e)}
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if result["status"] == "error":
+        logger.warning(f"Overview section {name} failed: {result['error']}")
+    return result
+
+
+@router.get("/overview")
+async def get_overview(
+    days: int = 30,
+    months: int = 12,
+    sections: Optional[str] = None,
+    timeout: float = 20.0
+) -> Dict[str, Any]:
+    """
+    Everything the admin dashboard shows, in one request
+    - Sections run concurrently; each reports its own status and duration
+    - A failing section is returned as an error without failing the others
+    - sections: optional comma-separated subset of the section names
+    - timeout: seconds per section, at most OVERVIEW_MAX_TIMEOUT
+    """
+    timeout = min(max(timeout, 0.1), OVERVIEW_MAX_TIMEOUT)
+    section_factories = {
+        "dashboard": lambda: get_dashboard_stats(),
+        "revenue_trend": lambda: get_revenue_trend(days=days),
+        "attendance_trend": lambda: get_attendance_trend(days=days),
+        "member_growth": lambda: get_member_growth(months=months),
+        "class_popularity": lambda: get_class_popularity(),
+        "payment_methods": lambda: get_payment_methods_distribution(),
+        "balance_summary": lambda: get_balance_summary(),
+        "invoice_analytics": lambda: get_invoice_analytics(),
+    }
+    
+    requested = OVERVIEW_SECTIONS
+    if sections:
+        requested = tuple(s.strip() for s in sections.split(",") if s.strip())
+        unknown = [s for s in requested if s not in section_factories]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown sections: {', '.join(unknown)}. Available: {', '.join(OVERVIEW_SECTIONS)}"
+            )
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        _run_overview_section(name, section_factories[name], timeout) for name in requested
+    ))
+    
+    return {
+        "sections": dict(zip(requested, results)),
+        "failed_sections": [name for name, result in zip(requested, results) if result["status"] == "error"],
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "generated_at": datetime.utcnow().isoformat()
+    }
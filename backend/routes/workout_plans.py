@@ -9,6 +9,7 @@ from datetime import datetime
 import os
 from supabase_client import get_supabase
 from routes.auth import get_current_user
+from services.audit_service import audit_service
 
 router = APIRouter(prefix="/api/workout-plans", tags=["workout_plans"])
 
@@ -134,12 +135,12 @@ async def create_workout_plan(
         response = supabase.table("workout_plans").insert(plan_data).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="CREATE",
             entity_type="workout_plan",
             entity_id=response.data[0]["id"],
+            after=response.data[0],
             request=request
         )
         
@@ -191,13 +192,13 @@ async def update_workout_plan(
         response = supabase.table("workout_plans").update(update_data).eq("id", plan_id).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="UPDATE",
             entity_type="workout_plan",
             entity_id=plan_id,
-            changes={"before": existing.data[0], "after": response.data[0]},
+            before=existing.data[0],
+            after=response.data[0],
             request=request
         )
         
@@ -229,13 +230,12 @@ async def delete_workout_plan(
         supabase.table("workout_plans").delete().eq("id", plan_id).execute()
         
         # Log audit
-        await log_audit(
-            user_id=current_user["id"],
-            user_email=current_user["email"],
+        await audit_service.log(
+            current_user=current_user,
             action="DELETE",
             entity_type="workout_plan",
             entity_id=plan_id,
-            changes={"deleted": existing.data[0]},
+            before=existing.data[0],
             request=request
         )
         
@@ -270,24 +270,3 @@ async def get_member_active_plans(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-async def log_audit(user_id: str, user_email: str, action: str, entity_type: str, 
-                    entity_id: str, request: Request, changes: dict = None):
-    """Log audit entry"""
-    try:
-        supabase = get_supabase()
-        audit_data = {
-            "user_id": user_id,
-            "user_email": user_email,
-            "action": action,
-            "entity_type": entity_type,
-            "entity_id": entity_id,
-            "changes": changes,
-            "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent")
-        }
-        supabase.table("audit_logs").insert(audit_data).execute()
-    except Exception as e:
-        # Don't fail the main operation if audit logging fails
-        print(f"Audit log error: {e}")
@@ -1,24 +1,49 @@
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import JSONResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
 from pathlib import Path
-from supabase_client import init_supabase
+from supabase_client import init_supabase, get_supabase_service
+from services.occupancy import occupancy_tracker
+from services.attendance_sweeper import attendance_sweeper
+from services.partition_manager import partition_manager
+from services.ledger_reconciler import ledger_reconciler
+from services.metrics import MetricsMiddleware
+from services.profiler import ProfilerMiddleware
+from services.compression import CompressionMiddleware
+from services.idempotency import IdempotencyMiddleware
 
 # Import route modules
 from routes import (
     auth, members, plans, attendance, payments, settings, reports, trainers, 
     qr_attendance, balance, invoices, installments, workout_plans, diet_plans,
-    equipment, classes, class_bookings, audit_logs, export, two_factor
+    equipment, classes, class_bookings, audit_logs, export, two_factor, occupancy, metrics,
+    profiles, register
 )
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+try:
+    import orjson  # noqa: F401
+    default_response_class = ORJSONResponse
+except ImportError:
+    default_response_class = JSONResponse
+
 # Create the main app without a prefix
-app = FastAPI(title="Gym Management System API", version="1.0.0")
+app = FastAPI(
+    title="Gym Management System API",
+    version="1.0.0",
+    default_response_class=default_response_class
+)
+
+# Idempotency-Key replay for retried payment / member creation writes. Registered
+# before CORS because the last middleware added is the outermost: this keeps it
+# inside CORS, so replays and key-conflict responses get CORS headers too.
+app.add_middleware(IdempotencyMiddleware)
 
 # Add CORS middleware FIRST (before routes)
 app.add_middleware(
@@ -35,6 +60,15 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# gzip/brotli for large responses (inside the metrics middleware so it records bytes on the wire)
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency, response size and database round-trip metrics (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in flamegraph capture for single requests (X-Profile header, see GET /api/profiles)
+app.add_middleware(ProfilerMiddleware)
+
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -58,8 +92,11 @@ api_router.include_router(reports.router)
 api_router.include_router(trainers.router)
 api_router.include_router(qr_attendance.router)
 api_router.include_router(balance.router)
+api_router.include_router(register.router)
 api_router.include_router(invoices.router)
 api_router.include_router(installments.router)
+api_router.include_router(occupancy.router)
+api_router.include_router(profiles.router)
 # Advanced features
 api_router.include_router(workout_plans.router)
 api_router.include_router(diet_plans.router)
@@ -72,6 +109,7 @@ api_router.include_router(two_factor.router)
 
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(metrics.router)
 
 # Configure logging
 logging.basicConfig(
@@ -89,8 +127,27 @@ async def startup_event():
         logger.info("Supabase initialized successfully")
     else:
         logger.warning("Supabase not initialized - credentials may not be configured")
+        return
+    
+    # Load members currently checked in so the live occupancy count is correct
+    try:
+        occupancy_tracker.rebuild(get_supabase_service())
+    except Exception as e:
+        logger.warning(f"Failed to rebuild occupancy state: {str(e)}")
+    
+    # Periodically close sessions members forgot to scan out of
+    attendance_sweeper.start()
+    
+    # Keep monthly attendance / audit log partitions created ahead of time
+    partition_manager.start()
+    
+    # Check member balances against the ledger they are maintained from
+    ledger_reconciler.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    await attendance_sweeper.stop()
+    await partition_manager.stop()
+    await ledger_reconciler.stop()
     logger.info("Application shutting down")
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Attendance Auto-Checkout Service
+Closes attendance sessions that were never scanned out, either because they
+exceeded the maximum session length or because their day has ended.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, Dict, Any, List
+
+from supabase_client import get_supabase_service, RPC_NOT_FOUND_CODE
+from services.occupancy import occupancy_tracker
+from services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a Postgres timestamp into a naive UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class AttendanceSweeper:
+    """Background job that auto-closes stale open attendance sessions"""
+
+    def __init__(self):
+        self.max_session_hours = float(os.environ.get('ATTENDANCE_MAX_SESSION_HOURS', '4'))
+        self.interval_seconds = int(os.environ.get('ATTENDANCE_SWEEP_INTERVAL_SECONDS', '900'))
+        self.batch_size = int(os.environ.get('ATTENDANCE_SWEEP_BATCH_SIZE', '500'))
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.rpc_available = True
+
+    def closing_time(self, record: Dict[str, Any], now: datetime) -> datetime:
+        """Check-out time for a stale session: max duration, capped at the end of its day"""
+        check_in = _parse_timestamp(record["check_in_time"])
+        end_of_day = datetime.combine(date.fromisoformat(record["date"]), time(23, 59, 59))
+        return min(check_in + timedelta(hours=self.max_session_hours), end_of_day, now)
+
+    def close_sessions(self, supabase, closings: List[Dict[str, Any]], auto_closed: bool = False) -> List[Dict[str, Any]]:
+        """
+        Close open sessions; closings are {"id", "date", "check_out_time"[, "notes"]}
+        Only rows that are still open are written, and only the closing columns,
+        so a check-out recorded meanwhile is kept and a deleted or archived
+        session is not re-created. Returns the closed rows (id, member_id).
+        """
+        if not closings:
+            return []
+        if self.rpc_available:
+            try:
+                response = supabase.rpc("close_attendance_sessions", {
+                    "p_sessions": closings,
+                    "p_auto_closed": auto_closed
+                }).execute()
+                return response.data or []
+            except Exception as e:
+                if getattr(e, "code", None) != RPC_NOT_FOUND_CODE:
+                    raise
+                logger.warning("close_attendance_sessions() not found (attendance_auto_checkout.sql not applied) - closing sessions with grouped updates")
+                self.rpc_available = False
+
+        # Fallback: one guarded update per distinct closing time / note
+        groups: Dict[tuple, List[str]] = {}
+        for closing in closings:
+            groups.setdefault((closing["check_out_time"], closing.get("notes")), []).append(closing["id"])
+        closed = []
+        for (check_out_time, notes), ids in groups.items():
+            update = {"check_out_time": check_out_time}
+            if auto_closed:
+                update["auto_closed"] = True
+            if notes:
+                update["notes"] = notes
+            response = supabase.table("attendance")\
+                .update(update)\
+                .in_("id", ids)\
+                .is_("check_out_time", "null")\
+                .execute()
+            closed.extend({"id": row["id"], "member_id": row["member_id"]} for row in response.data)
+        return closed
+
+    def sweep(self, supabase, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Close every stale open session in batches
+        
+        A session is stale when it started more than max_session_hours ago
+        or belongs to a previous day. Each batch is closed with one guarded
+        update (close_sessions), so sessions scanned out meanwhile are left alone.
+        """
+        now = now or datetime.utcnow()
+        cutoff = (now - timedelta(hours=self.max_session_hours)).isoformat()
+        today = date.today().isoformat()
+        closed = 0
+        batches = 0
+
+        while True:
+            response = supabase.table("attendance")\
+                .select("id, member_id, check_in_time, date")\
+                .is_("check_out_time", "null")\
+                .or_(f"check_in_time.lt.{cutoff},date.lt.{today}")\
+                .order("check_in_time")\
+                .limit(self.batch_size)\
+                .execute()
+
+            records = response.data
+            if not records:
+                break
+
+            closed_rows = self.close_sessions(supabase, [
+                {
+                    "id": record["id"],
+                    "date": record["date"],
+                    "check_out_time": self.closing_time(record, now).isoformat()
+                }
+                for record in records
+            ], auto_closed=True)
+
+            for row in closed_rows:
+                occupancy_tracker.check_out(row["member_id"], row["id"])
+
+            closed += len(closed_rows)
+            batches += 1
+            if len(records) < self.batch_size:
+                break
+
+        self.last_run = {
+            "ran_at": now.isoformat(),
+            "closed_sessions": closed,
+            "batches": batches,
+            "max_session_hours": self.max_session_hours
+        }
+        if closed:
+            response_cache.invalidate("attendance")
+            logger.info(f"Auto-checkout closed {closed} stale attendance sessions")
+        return self.last_run
+
+    async def run_forever(self):
+        while True:
+            try:
+                supabase = get_supabase_service()
+                if supabase:
+                    await asyncio.to_thread(self.sweep, supabase)
+            except Exception as e:
+                logger.error(f"Attendance sweep error: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start the periodic sweep on the running event loop (interval <= 0 disables it)"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self.run_forever())
+        logger.info(f"Attendance auto-checkout running every {self.interval_seconds}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+attendance_sweeper = AttendanceSweeper()
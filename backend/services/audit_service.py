@@ -0,0 +1,259 @@
+"""
+Audit Log Service
+Records changes to entities as JSON Patch (RFC 6902) diffs instead of full
+before/after copies. Every entity's entries are numbered; the first entry and
+every AUDIT_SNAPSHOT_INTERVAL-th entry store the full state, so the state at
+any point in the history is rebuilt from the nearest snapshot plus the diffs
+after it.
+
+changes column format:
+- snapshot entries (is_snapshot = true): {"snapshot": <state, null after a delete>}
+- diff entries: {"patch": [<JSON Patch operations>]}
+Entries written before this format ({"before", "after"} / {"deleted"}) are
+still understood when rebuilding.
+"""
+import os
+import copy
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from supabase_client import get_supabase, RPC_NOT_FOUND_CODE
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(key: str) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def json_diff(before: Any, after: Any, path: str = "") -> List[Dict[str, Any]]:
+    """JSON Patch operations turning before into after"""
+    if isinstance(before, dict) and isinstance(after, dict):
+        ops = []
+        for key in before:
+            if key not in after:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in after.items():
+            if key not in before:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+            else:
+                ops.extend(json_diff(before[key], value, f"{path}/{_escape(key)}"))
+        return ops
+    if isinstance(before, list) and isinstance(after, list):
+        ops = []
+        common = min(len(before), len(after))
+        for i in range(common):
+            ops.extend(json_diff(before[i], after[i], f"{path}/{i}"))
+        for i in range(common, len(after)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": after[i]})
+        # Remove from the end so earlier indexes stay valid
+        for i in range(len(before) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return ops
+    if before == after and type(before) is type(after):
+        return []
+    return [{"op": "replace", "path": path, "value": after}]
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]]) -> Any:
+    """
+    Apply JSON Patch add/remove/replace operations to a copy of document
+    Lenient on purpose: a replace of a missing member adds it and a remove of a
+    missing member is ignored, so a row changed outside the audited routes
+    does not break reconstruction (the next snapshot corrects any drift).
+    """
+    document = copy.deepcopy(document)
+    for operation in patch:
+        tokens = [_unescape(t) for t in operation["path"].split("/")[1:]]
+        if not tokens:
+            document = copy.deepcopy(operation.get("value"))
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent.setdefault(token, {})
+        last = tokens[-1]
+        op = operation["op"]
+        if isinstance(parent, list):
+            index = int(last)
+            if op == "add":
+                parent.insert(index, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                if index < len(parent):
+                    parent.pop(index)
+            elif index < len(parent):
+                parent[index] = copy.deepcopy(operation["value"])
+            else:
+                parent.append(copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            parent.pop(last, None)
+        else:
+            parent[last] = copy.deepcopy(operation["value"])
+    return document
+
+
+def _apply_entry(state: Any, changes: Optional[Dict[str, Any]]) -> Any:
+    """State after an audit entry, given the state before it"""
+    if not changes:
+        return state
+    if "snapshot" in changes:
+        return copy.deepcopy(changes["snapshot"])
+    if "patch" in changes:
+        return apply_patch(state, changes["patch"])
+    # Entries written before diffs were introduced
+    if "after" in changes:
+        return copy.deepcopy(changes["after"])
+    if "deleted" in changes:
+        return None
+    return state
+
+
+class AuditHistoryUnavailable(Exception):
+    """The entries an entity's state would be rebuilt from start with a diff (their snapshot was archived)"""
+
+    def __init__(self, entity_type: str, entity_id: str, earliest: Optional[str]):
+        self.earliest = earliest
+        super().__init__(
+            f"Audit history of {entity_type} {entity_id} before {(earliest or 'the earliest entry')[:10]} "
+            f"has been archived; its state can no longer be rebuilt"
+        )
+
+
+class AuditService:
+    """Writes compact audit entries and rebuilds entity state from them"""
+
+    def __init__(self):
+        self.snapshot_interval = max(1, int(os.environ.get('AUDIT_SNAPSHOT_INTERVAL', '10')))
+        self.rpc_available = True
+
+    def _next_version(self, supabase, entity_type: str, entity_id: str) -> int:
+        """Version for a new entry, assigned atomically by next_audit_version() (audit_diffs.sql)"""
+        if self.rpc_available:
+            try:
+                response = supabase.rpc("next_audit_version", {
+                    "p_entity_type": entity_type,
+                    "p_entity_id": entity_id
+                }).execute()
+                return response.data
+            except Exception as e:
+                if getattr(e, "code", None) != RPC_NOT_FOUND_CODE:
+                    raise
+                logger.warning("next_audit_version() not found (audit_diffs.sql not applied) - "
+                               "numbering from the latest entry, which concurrent writes can duplicate")
+                self.rpc_available = False
+        return self._latest_version(supabase, entity_type, entity_id) + 1
+
+    def _latest_version(self, supabase, entity_type: str, entity_id: str) -> int:
+        response = supabase.table("audit_logs")\
+            .select("version")\
+            .eq("entity_type", entity_type)\
+            .eq("entity_id", entity_id)\
+            .order("version", desc=True, nullsfirst=False)\
+            .limit(1)\
+            .execute()
+        if not response.data:
+            return 0
+        return response.data[0].get("version") or 0
+
+    def build_entry(self, version: int, action: str, before: Optional[Dict[str, Any]],
+                    after: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """changes / is_snapshot for the version-th entry of an entity"""
+        snapshot = version == 1 or (version - 1) % self.snapshot_interval == 0 \
+            or action in ("CREATE", "DELETE") or before is None
+        if snapshot:
+            return {"changes": {"snapshot": after}, "is_snapshot": True}
+        return {"changes": {"patch": json_diff(before, after)}, "is_snapshot": False}
+
+    def record(self, supabase, current_user: Dict[str, Any], action: str, entity_type: str, entity_id: str,
+               ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+               before: Optional[Dict[str, Any]] = None, after: Optional[Dict[str, Any]] = None):
+        version = self._next_version(supabase, entity_type, entity_id)
+        entry = self.build_entry(version, action, before, after)
+        supabase.table("audit_logs").insert({
+            "user_id": current_user.get("id"),
+            "user_email": current_user.get("email"),
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "version": version,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            **entry
+        }).execute()
+
+    async def log(self, current_user: Dict[str, Any], action: str, entity_type: str, entity_id: str,
+                  request=None, before: Optional[Dict[str, Any]] = None, after: Optional[Dict[str, Any]] = None):
+        """
+        Record a change to an entity (never fails the calling operation)
+        before / after: the row before and after the change (before=None for
+        creates, after=None for deletes)
+        """
+        try:
+            supabase = get_supabase()
+            await asyncio.to_thread(
+                self.record, supabase, current_user, action, entity_type, entity_id,
+                request.client.host if request is not None and request.client else None,
+                request.headers.get("user-agent") if request is not None else None,
+                before, after
+            )
+        except Exception as e:
+            # Don't fail the main operation if audit logging fails
+            logger.error(f"Audit log error: {str(e)}")
+
+    def rebuild(self, supabase, entity_type: str, entity_id: str, at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        State of an entity as of `at` (default: now), from the nearest snapshot and later diffs
+        Entries are applied in version order; timestamp is only the `at` cut-off,
+        since an entry's version is assigned before its row is written. Raises
+        AuditHistoryUnavailable when the base snapshot was archived.
+        """
+        at_iso = (at or datetime.utcnow()).isoformat()
+
+        snapshot = supabase.table("audit_logs")\
+            .select("*")\
+            .eq("entity_type", entity_type)\
+            .eq("entity_id", entity_id)\
+            .eq("is_snapshot", True)\
+            .lte("timestamp", at_iso)\
+            .order("version", desc=True, nullsfirst=False)\
+            .limit(1)\
+            .execute()
+
+        query = supabase.table("audit_logs")\
+            .select("*")\
+            .eq("entity_type", entity_type)\
+            .eq("entity_id", entity_id)\
+            .lte("timestamp", at_iso)
+        if snapshot.data:
+            query = query.gt("version", snapshot.data[0]["version"])
+        # Entries written before versioning (version NULL) come first
+        entries = snapshot.data + query.order("version", nullsfirst=True).order("timestamp").execute().data
+
+        if entries and "patch" in (entries[0].get("changes") or {}):
+            raise AuditHistoryUnavailable(entity_type, entity_id, entries[0].get("timestamp"))
+
+        state = None
+        for entry in entries:
+            state = _apply_entry(state, entry.get("changes"))
+
+        last = entries[-1] if entries else None
+        return {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "at": at_iso,
+            "exists": state is not None,
+            "state": state,
+            "version": last.get("version") if last else None,
+            "last_action": last.get("action") if last else None,
+            "last_changed_at": last.get("timestamp") if last else None,
+            "entries_applied": len(entries)
+        }
+
+
+# Singleton instance
+audit_service = AuditService()
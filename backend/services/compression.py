@@ -0,0 +1,143 @@
+"""
+Response Compression Service
+Compresses response bodies above a size threshold with brotli (when the
+brotli package is installed and the client accepts it) or gzip.
+"""
+import os
+import zlib
+import logging
+from typing import Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def _accepted_encodings(headers: List[Tuple[bytes, bytes]]) -> List[str]:
+    for name, value in headers:
+        if name == b"accept-encoding":
+            encodings = []
+            for part in value.decode("latin-1").split(","):
+                encoding, _, params = part.strip().partition(";")
+                if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+                    continue
+                encodings.append(encoding.strip().lower())
+            return encodings
+    return []
+
+
+class _Compressor:
+    """Streaming gzip or brotli compressor"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compresses HTTP responses at least COMPRESSION_MIN_SIZE bytes long"""
+
+    def __init__(self, app):
+        self.app = app
+        self.minimum_size = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+        self.gzip_level = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+        self.brotli_quality = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+    def _choose_encoding(self, scope) -> Optional[str]:
+        accepted = _accepted_encodings(scope.get("headers", []))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether compression pays off
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = list(start_message.get("headers", []))
+                header_names = {name.lower() for name, _ in headers}
+                content_type = next((v.decode("latin-1") for n, v in headers if n.lower() == b"content-type"), "")
+                compressible = (
+                    b"content-encoding" not in header_names
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and not content_type.startswith("text/event-stream")
+                    # Small complete bodies are cheaper to send as they are
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if not compressible:
+                    passthrough = True
+                    await send(start_message)
+                else:
+                    level = self.brotli_quality if encoding == "br" else self.gzip_level
+                    compressor = _Compressor(encoding, level)
+                    headers = [(n, v) for n, v in headers if n.lower() != b"content-length"]
+                    headers.append((b"content-encoding", encoding.encode()))
+                    headers.append((b"vary", b"Accept-Encoding"))
+                    if not more_body:
+                        compressed = compressor.compress(body) + compressor.flush()
+                        headers.append((b"content-length", str(len(compressed)).encode()))
+                        await send({**start_message, "headers": headers})
+                        await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                        start_message = None
+                        return
+                    await send({**start_message, "headers": headers})
+                start_message = None
+
+            if passthrough:
+                await send(message)
+                return
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.flush()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,206 @@
+"""
+GST Return Service
+Aggregates issued invoices for a period into the figures GSTR-1 asks for:
+taxable value and IGST / CGST / SGST by section (B2B, B2CL, B2CS), place of
+supply and tax rate, and writes them as a summary, a GSTR-1 style JSON
+(b2cs section) or the B2CS CSV of the GST offline tool.
+
+Invoices are read in keyset pages of GST_EXPORT_PAGE_SIZE ordered by
+(invoice_date, id), and each page is folded into the running totals with a
+vectorized pandas groupby before the next one is fetched. Memory is bounded by
+one page plus one row per (section, state, rate) group, however many
+invoices the period has. Amounts are summed in paise (int64) so totals over
+lakhs of invoices do not drift.
+"""
+import os
+import io
+import csv
+import logging
+from datetime import date
+from typing import Dict, Any, List, Iterator
+
+from services.invoice_service import invoice_service
+
+logger = logging.getLogger(__name__)
+
+# Invoices that count as issued (drafts and cancelled invoices are not reported)
+REPORTED_STATUSES = ["sent", "paid"]
+INVOICE_COLUMNS = [
+    "id", "invoice_date", "subtotal", "discount_amount", "tax_rate", "cgst", "sgst", "igst",
+    "total_amount", "place_of_supply", "customer_gstin"
+]
+MONEY_COLUMNS = ["subtotal", "discount_amount", "cgst", "sgst", "igst", "total_amount"]
+GROUP_COLUMNS = ["section", "place_of_supply", "supply_type", "tax_rate"]
+SUM_COLUMNS = ["invoice_count", "taxable_value", "igst", "cgst", "sgst", "invoice_value"]
+
+# GST state codes, used for the "Place Of Supply" column of the offline tool CSV
+STATE_CODES = {
+    "01": "Jammu and Kashmir", "02": "Himachal Pradesh", "03": "Punjab", "04": "Chandigarh",
+    "05": "Uttarakhand", "06": "Haryana", "07": "Delhi", "08": "Rajasthan", "09": "Uttar Pradesh",
+    "10": "Bihar", "11": "Sikkim", "12": "Arunachal Pradesh", "13": "Nagaland", "14": "Manipur",
+    "15": "Mizoram", "16": "Tripura", "17": "Meghalaya", "18": "Assam", "19": "West Bengal",
+    "20": "Jharkhand", "21": "Odisha", "22": "Chhattisgarh", "23": "Madhya Pradesh", "24": "Gujarat",
+    "26": "Dadra and Nagar Haveli and Daman and Diu", "27": "Maharashtra", "29": "Karnataka", "30": "Goa",
+    "31": "Lakshadweep", "32": "Kerala", "33": "Tamil Nadu", "34": "Puducherry",
+    "35": "Andaman and Nicobar Islands", "36": "Telangana", "37": "Andhra Pradesh", "38": "Ladakh",
+    "97": "Other Territory",
+}
+
+
+class GstReturnService:
+    """Period GST summaries in bounded memory"""
+
+    def __init__(self):
+        self.page_size = int(os.environ.get('GST_EXPORT_PAGE_SIZE', '5000'))
+        # Inter-state B2C invoices above this value are reported invoice-wise (B2CL)
+        self.b2cl_threshold = float(os.environ.get('GST_B2CL_THRESHOLD', '100000'))
+
+    def iter_invoice_pages(self, supabase, from_date: date, to_date: date) -> Iterator[List[Dict[str, Any]]]:
+        """Issued invoices of the period, one keyset page at a time"""
+        after = None
+        while True:
+            query = supabase.table("invoices")\
+                .select(", ".join(INVOICE_COLUMNS))\
+                .gte("invoice_date", from_date.isoformat())\
+                .lte("invoice_date", to_date.isoformat())\
+                .in_("status", REPORTED_STATUSES)
+            if after:
+                query = query.or_(f"invoice_date.gt.{after[0]},and(invoice_date.eq.{after[0]},id.gt.{after[1]})")
+            page = query.order("invoice_date").order("id").limit(self.page_size).execute().data
+            if page:
+                yield page
+            if len(page) < self.page_size:
+                return
+            after = (page[-1]["invoice_date"], page[-1]["id"])
+
+    def _aggregate_page(self, page: List[Dict[str, Any]], home_state: str):
+        """Group one page of invoices (vectorized); money columns in paise"""
+        # pandas is heavy to import, so it is loaded on first use rather than at startup
+        import numpy as np
+        import pandas as pd
+
+        df = pd.DataFrame.from_records(page, columns=INVOICE_COLUMNS)
+        paise = {
+            column: (pd.to_numeric(df[column], errors="coerce").fillna(0) * 100).round().astype("int64")
+            for column in MONEY_COLUMNS
+        }
+        place_of_supply = df["place_of_supply"].fillna("").astype(str).str.strip().replace("", home_state)
+        inter_state = (paise["igst"] > 0) | (place_of_supply != home_state)
+        registered = df["customer_gstin"].fillna("").astype(str).str.strip() != ""
+
+        grouped = pd.DataFrame({
+            "section": np.select(
+                [registered, inter_state & (paise["total_amount"] > round(self.b2cl_threshold * 100))],
+                ["b2b", "b2cl"],
+                default="b2cs"
+            ),
+            "place_of_supply": place_of_supply,
+            "supply_type": np.where(inter_state, "INTER", "INTRA"),
+            "tax_rate": pd.to_numeric(df["tax_rate"], errors="coerce").fillna(0).round(2),
+            "invoice_count": 1,
+            "taxable_value": paise["subtotal"] - paise["discount_amount"],
+            "igst": paise["igst"],
+            "cgst": paise["cgst"],
+            "sgst": paise["sgst"],
+            "invoice_value": paise["total_amount"],
+        }).groupby(GROUP_COLUMNS).sum()
+        return grouped
+
+    def summarize(self, supabase, from_date: date, to_date: date) -> Dict[str, Any]:
+        """Aggregate the period's issued invoices (blocking: run it off the event loop)"""
+        home_state = invoice_service.gym_state_code
+        totals = None
+        invoice_count = 0
+        pages = 0
+
+        for page in self.iter_invoice_pages(supabase, from_date, to_date):
+            grouped = self._aggregate_page(page, home_state)
+            totals = grouped if totals is None else totals.add(grouped, fill_value=0)
+            invoice_count += len(page)
+            pages += 1
+
+        rows = []
+        if totals is not None:
+            for (section, place_of_supply, supply_type, tax_rate), sums in totals.sort_index().iterrows():
+                rows.append({
+                    "section": section,
+                    "place_of_supply": place_of_supply,
+                    "supply_type": supply_type,
+                    "tax_rate": float(tax_rate),
+                    "invoice_count": int(sums["invoice_count"]),
+                    **{column: int(sums[column]) / 100 for column in SUM_COLUMNS if column != "invoice_count"},
+                    "cess": 0.0
+                })
+
+        logger.info(f"GST summary {from_date} to {to_date}: {invoice_count} invoices in {pages} pages, {len(rows)} groups")
+        return {
+            "gstin": invoice_service.gym_gstin,
+            "home_state": home_state,
+            "from_date": from_date.isoformat(),
+            "to_date": to_date.isoformat(),
+            "invoice_count": invoice_count,
+            "taxable_value": round(sum(r["taxable_value"] for r in rows), 2),
+            "igst": round(sum(r["igst"] for r in rows), 2),
+            "cgst": round(sum(r["cgst"] for r in rows), 2),
+            "sgst": round(sum(r["sgst"] for r in rows), 2),
+            "invoice_value": round(sum(r["invoice_value"] for r in rows), 2),
+            "rows": rows
+        }
+
+    def to_gstr1(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        GSTR-1 style JSON with the b2cs section
+        B2B and B2CL invoices are reported invoice-wise, so they are only
+        counted here (invoice_level_required) and must be added separately.
+        """
+        b2cs = [
+            {
+                "sply_ty": row["supply_type"],
+                "pos": row["place_of_supply"],
+                "typ": "OE",
+                "rt": row["tax_rate"],
+                "txval": row["taxable_value"],
+                "iamt": row["igst"],
+                "camt": row["cgst"],
+                "samt": row["sgst"],
+                "csamt": row["cess"]
+            }
+            for row in summary["rows"] if row["section"] == "b2cs"
+        ]
+        return {
+            "gstin": summary["gstin"],
+            "fp": date.fromisoformat(summary["to_date"]).strftime("%m%Y"),
+            "b2cs": b2cs,
+            "invoice_level_required": {
+                section: sum(r["invoice_count"] for r in summary["rows"] if r["section"] == section)
+                for section in ("b2b", "b2cl")
+            }
+        }
+
+    def iter_b2cs_csv(self, summary: Dict[str, Any]) -> Iterator[str]:
+        """B2CS rows in the GST offline tool's CSV layout"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Type", "Place Of Supply", "Rate", "Applicable % of Tax Rate", "Taxable Value",
+                         "Cess Amount", "E-Commerce GSTIN"])
+        for row in summary["rows"]:
+            if row["section"] != "b2cs":
+                continue
+            state = STATE_CODES.get(row["place_of_supply"])
+            writer.writerow([
+                "OE",
+                f"{row['place_of_supply']}-{state}" if state else row["place_of_supply"],
+                f"{row['tax_rate']:g}",
+                "",
+                f"{row['taxable_value']:.2f}",
+                f"{row['cess']:.2f}",
+                ""
+            ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+
+# Singleton instance
+gst_return_service = GstReturnService()
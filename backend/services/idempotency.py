@@ -0,0 +1,285 @@
+"""
+Idempotency Key Service
+Makes retried write requests safe. A POST to one of IDEMPOTENT_ROUTES sent
+with an Idempotency-Key header first claims the key in the idempotency_keys
+table (idempotency_keys.sql); the claim is a single INSERT ... ON CONFLICT DO
+NOTHING, so of several concurrent duplicates exactly one runs. Once it
+finishes, its response is stored and every retry with the same key gets that
+response back without the route running again:
+- same key, same body, first request finished: stored response replayed
+  (Idempotent-Replayed: true)
+- same key, same body, first request still running: 409, retry later
+- same key, different body: 422
+Server errors and exceptions release the key so the request can be retried.
+Requests without the header are not affected.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, Tuple
+
+from supabase_client import get_supabase_service
+
+logger = logging.getLogger(__name__)
+
+TABLE = "idempotency_keys"
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# PostgREST / Postgres errors meaning idempotency_keys.sql was not applied
+TABLE_MISSING_CODES = ("PGRST205", "42P01")
+
+# Writes that clients retry on timeouts (method, path)
+IDEMPOTENT_ROUTES = {
+    ("POST", "/api/payments"),
+    ("POST", "/api/payments/with-member"),
+    ("POST", "/api/payments/bulk"),
+    ("POST", "/api/balance/record-partial-payment"),
+    ("POST", "/api/members"),
+}
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a Postgres timestamp into a naive UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class IdempotencyStore:
+    """Claims, completes and releases idempotency keys"""
+
+    def __init__(self):
+        self.ttl_seconds = int(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', '86400'))
+        # A key still in progress after this long belongs to a request that died; it may be taken over
+        self.lock_timeout_seconds = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT_SECONDS', '60'))
+        self.purge_interval_seconds = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL_SECONDS', '3600'))
+        self.available = True
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def claim(self, supabase, scope: str, key: str, request_hash: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Try to claim a key for a request
+        Returns (outcome, row): outcome is "claimed", "replay" (row holds the
+        stored response), "in_progress" or "mismatch".
+        """
+        self._maybe_purge(supabase)
+        now = datetime.utcnow()
+        record = {
+            "scope": scope,
+            "key": key,
+            "request_hash": request_hash,
+            "status": "in_progress",
+            "locked_at": now.isoformat(),
+            "expires_at": (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+        }
+
+        # Two attempts: the second one runs after an expired key was removed
+        for _ in range(2):
+            claimed = supabase.table(TABLE).upsert(record, on_conflict="scope,key", ignore_duplicates=True).execute()
+            if claimed.data:
+                return "claimed", None
+
+            existing = supabase.table(TABLE).select("*").eq("scope", scope).eq("key", key).execute()
+            if not existing.data:
+                continue
+            row = existing.data[0]
+
+            if _parse_timestamp(row["expires_at"]) <= now:
+                supabase.table(TABLE).delete()\
+                    .eq("scope", scope)\
+                    .eq("key", key)\
+                    .lte("expires_at", now.isoformat())\
+                    .execute()
+                continue
+
+            if row["request_hash"] != request_hash:
+                return "mismatch", row
+            if row["status"] == "completed":
+                return "replay", row
+
+            # Take over a key whose request died without completing or releasing it
+            if _parse_timestamp(row["locked_at"]) < now - timedelta(seconds=self.lock_timeout_seconds):
+                taken = supabase.table(TABLE).update({"locked_at": now.isoformat()})\
+                    .eq("scope", scope)\
+                    .eq("key", key)\
+                    .eq("status", "in_progress")\
+                    .eq("locked_at", row["locked_at"])\
+                    .execute()
+                if taken.data:
+                    logger.warning(f"Took over stale idempotency key {key} for {scope.split('|')[0]}")
+                    return "claimed", None
+            return "in_progress", row
+
+        return "in_progress", None
+
+    def complete(self, supabase, scope: str, key: str, status: int, content_type: Optional[str], body: str):
+        supabase.table(TABLE).update({
+            "status": "completed",
+            "response_status": status,
+            "response_content_type": content_type,
+            "response_body": body
+        }).eq("scope", scope).eq("key", key).execute()
+
+    def release(self, supabase, scope: str, key: str):
+        supabase.table(TABLE).delete().eq("scope", scope).eq("key", key).eq("status", "in_progress").execute()
+
+    def _maybe_purge(self, supabase):
+        """Delete expired keys at most once per purge interval"""
+        with self._lock:
+            if time.monotonic() - self._purged_at < self.purge_interval_seconds:
+                return
+            self._purged_at = time.monotonic()
+        try:
+            supabase.table(TABLE).delete().lt("expires_at", datetime.utcnow().isoformat()).execute()
+        except Exception as e:
+            logger.warning(f"Failed to purge expired idempotency keys: {str(e)}")
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _request_scope(scope) -> str:
+    """Route plus caller identity, so keys from different callers never collide"""
+    authorization = next((v for n, v in scope.get("headers", []) if n == b"authorization"), b"")
+    caller = hashlib.sha256(authorization).hexdigest()[:16]
+    return f"{scope['method']} {scope['path'].rstrip('/')}|{caller}"
+
+
+async def _send_json(send, status: int, content: Dict[str, Any], extra_headers=()):
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *extra_headers
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Applies Idempotency-Key handling to IDEMPOTENT_ROUTES"""
+
+    def __init__(self, app, routes=IDEMPOTENT_ROUTES, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.routes = routes
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"].rstrip("/")) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        key = next((v.decode("latin-1") for n, v in scope.get("headers", []) if n == HEADER), None)
+        supabase = get_supabase_service() if key is not None and self.store.available else None
+        if supabase is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+            return
+
+        # Buffer the body to fingerprint it, then hand it to the route unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        request_scope = _request_scope(scope)
+        try:
+            outcome, row = await asyncio.to_thread(
+                self.store.claim, supabase, request_scope, key, hashlib.sha256(body).hexdigest()
+            )
+        except Exception as e:
+            if getattr(e, "code", None) in TABLE_MISSING_CODES:
+                logger.warning("idempotency_keys table not found (idempotency_keys.sql not applied) - Idempotency-Key ignored")
+                self.store.available = False
+            else:
+                logger.error(f"Idempotency key claim error: {str(e)}")
+            await self.app(scope, replay_receive, send)
+            return
+
+        if outcome == "replay":
+            stored = (row.get("response_body") or "").encode()
+            await send({
+                "type": "http.response.start",
+                "status": row["response_status"],
+                "headers": [
+                    (b"content-type", (row.get("response_content_type") or "application/json").encode("latin-1")),
+                    (b"content-length", str(len(stored)).encode()),
+                    (b"idempotent-replayed", b"true")
+                ]
+            })
+            await send({"type": "http.response.body", "body": stored})
+            return
+        if outcome == "mismatch":
+            await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request body"})
+            return
+        if outcome == "in_progress":
+            await _send_json(
+                send, 409, {"detail": "A request with this Idempotency-Key is still being processed"},
+                [(b"retry-after", b"1")]
+            )
+            return
+
+        status = 500
+        content_type = None
+        response_chunks = []
+
+        async def send_wrapper(message):
+            nonlocal status, content_type
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = next(
+                    (v.decode("latin-1") for n, v in message.get("headers", []) if n.lower() == b"content-type"), None
+                )
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except BaseException:
+            await asyncio.to_thread(self._release, supabase, request_scope, key)
+            raise
+
+        try:
+            response_body = b"".join(response_chunks).decode("utf-8")
+        except UnicodeDecodeError:
+            response_body = None
+        if status >= 500 or response_body is None:
+            await asyncio.to_thread(self._release, supabase, request_scope, key)
+            return
+        try:
+            await asyncio.to_thread(self.store.complete, supabase, request_scope, key, status, content_type, response_body)
+        except Exception as e:
+            # The write went through, so keep the key claimed: releasing it would let a retry repeat the write
+            logger.error(f"Idempotency key completion error: {str(e)}")
+
+    def _release(self, supabase, request_scope: str, key: str):
+        try:
+            self.store.release(supabase, request_scope, key)
+        except Exception as e:
+            logger.error(f"Idempotency key release error: {str(e)}")
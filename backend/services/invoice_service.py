@@ -7,12 +7,6 @@ import io
 import logging
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +25,12 @@ class InvoiceService:
         self.gym_gstin = os.environ.get('GYM_GSTIN', '')
         self.gym_pan = os.environ.get('GYM_PAN', '')
         self.gym_logo = os.environ.get('GYM_LOGO_PATH', '')
+        # Two-digit GST state code; a GSTIN starts with it
+        self.gym_state_code = os.environ.get('GYM_STATE_CODE', '') or self.gym_gstin[:2]
+    
+    def is_intra_state(self, place_of_supply: Optional[str]) -> bool:
+        """Whether a supply to this state code is charged CGST + SGST (no code: the gym's own state)"""
+        return not place_of_supply or not self.gym_state_code or place_of_supply == self.gym_state_code
     
     def calculate_gst(
         self,
@@ -72,6 +72,53 @@ class InvoiceService:
             'total': round(total, 2)
         }
     
+    def payment_invoice_data(
+        self,
+        payment: Dict[str, Any],
+        plan_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build a paid invoice row for a payment (invoice_number is assigned by the database)
+        
+        Args:
+            payment: Payment row (member_id, id, amount, payment_method)
+            plan_name: Name of the plan the payment is for, if any
+        
+        Returns:
+            Dict ready to insert into invoices
+        """
+        items = [{
+            "name": plan_name or "Membership Payment",
+            "description": f"Payment for {plan_name}" if plan_name else "Gym membership payment",
+            "quantity": 1,
+            "rate": payment["amount"],
+            "amount": payment["amount"]
+        }]
+        
+        invoice_data = {
+            "member_id": payment["member_id"],
+            "payment_id": payment["id"],
+            "invoice_date": date.today().isoformat(),
+            "due_date": date.today().isoformat(),
+            "subtotal": payment["amount"],
+            "discount_amount": 0,
+            "tax_rate": 18.0,
+            "items": items,
+            "notes": f"Payment received via {payment['payment_method'].upper()}",
+            "status": "paid"
+        }
+        
+        tax_calc = self.calculate_gst(payment["amount"], 18.0, same_state=True)
+        invoice_data.update({
+            "tax_amount": tax_calc["tax_amount"],
+            "cgst": tax_calc["cgst"],
+            "sgst": tax_calc["sgst"],
+            "igst": tax_calc["igst"],
+            "total_amount": tax_calc["total"]
+        })
+        
+        return invoice_data
+    
     def generate_invoice_pdf(
         self,
         invoice_data: Dict[str, Any],
@@ -87,6 +134,14 @@ class InvoiceService:
         Returns:
             PDF file as bytes
         """
+        # reportlab is loaded on first use to keep it out of server startup
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.enums import TA_CENTER
+        
         buffer = io.BytesIO()
         
         # Create PDF document
@@ -276,6 +331,12 @@ class InvoiceService:
         member_data: Dict[str, Any]
     ) -> bytes:
         """Generate simple payment receipt"""
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.enums import TA_CENTER
         
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4)
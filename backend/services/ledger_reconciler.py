@@ -0,0 +1,105 @@
+"""
+Ledger Reconciliation Service
+Checks the running balances in member_balances against the member_ledger
+entries they are maintained from (member_ledger.sql), a batch of members at a
+time, and rewrites any balance that drifted from its ledger.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from supabase_client import get_supabase_service, RPC_NOT_FOUND_CODE
+
+logger = logging.getLogger(__name__)
+
+# Mismatches kept in last_run (all of them are counted and logged)
+MAX_REPORTED_MISMATCHES = 100
+
+
+class LedgerReconciler:
+    """Batched verify / rebuild of member balances"""
+
+    def __init__(self):
+        self.batch_size = int(os.environ.get('LEDGER_RECONCILE_BATCH_SIZE', '500'))
+        self.interval_seconds = int(os.environ.get('LEDGER_RECONCILE_INTERVAL_SECONDS', '86400'))
+        self.repair = os.environ.get('LEDGER_RECONCILE_REPAIR', 'true').lower() == 'true'
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run(self, supabase, repair: Optional[bool] = None) -> Dict[str, Any]:
+        """Check every member's balance; with repair, rewrite the ones that drifted"""
+        repair = self.repair if repair is None else repair
+        started = datetime.utcnow()
+        checked = 0
+        repaired = 0
+        batches = 0
+        mismatches = []
+        after = None
+
+        while True:
+            result = supabase.rpc("reconcile_member_balances", {
+                "p_after": after,
+                "p_limit": self.batch_size,
+                "p_repair": repair
+            }).execute().data
+            batches += 1
+            checked += result["checked"]
+            repaired += result["repaired"]
+            mismatches.extend(result["mismatches"])
+            after = result.get("last_member_id")
+            if not after:
+                break
+
+        for mismatch in mismatches:
+            logger.warning(
+                f"Balance of member {mismatch['member_id']} drifted from its ledger: "
+                f"snapshot {mismatch['snapshot']}, ledger {mismatch['ledger']}"
+            )
+
+        self.last_run = {
+            "ran_at": started.isoformat(),
+            "duration_ms": round((datetime.utcnow() - started).total_seconds() * 1000, 1),
+            "repair": repair,
+            "batches": batches,
+            "members_checked": checked,
+            "mismatch_count": len(mismatches),
+            "repaired": repaired,
+            "mismatches": mismatches[:MAX_REPORTED_MISMATCHES],
+        }
+        logger.info(f"Balance reconciliation: {checked} members checked, {len(mismatches)} mismatches, {repaired} repaired")
+        return self.last_run
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                supabase = get_supabase_service()
+                if supabase:
+                    await asyncio.to_thread(self.run, supabase)
+            except Exception as e:
+                if getattr(e, "code", None) == RPC_NOT_FOUND_CODE:
+                    logger.info("reconcile_member_balances() not found (member_ledger.sql not applied) - balance reconciliation disabled")
+                    return
+                logger.error(f"Balance reconciliation error: {str(e)}")
+
+    def start(self):
+        """Start periodic reconciliation on the running event loop (interval <= 0 disables it)"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self.run_forever())
+        logger.info(f"Balance reconciliation running every {self.interval_seconds}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+ledger_reconciler = LedgerReconciler()
@@ -0,0 +1,120 @@
+"""
+Member Lifecycle Service
+Removes and archives members through the member_archive.sql functions, so a
+deletion or an archive run is a single transaction, and evicts the affected
+members from the in-process caches (search index, live occupancy).
+"""
+import logging
+from typing import Optional, Dict, Any, List
+
+from supabase_client import run_queries, RPC_NOT_FOUND_CODE
+from services.member_search import member_search_service
+from services.occupancy import occupancy_tracker
+
+logger = logging.getLogger(__name__)
+
+# Tables deleted before the member row when member_archive.sql is not applied
+MEMBER_DEPENDENT_TABLES = ("member_passwords", "payments", "attendance")
+
+
+class MemberLifecycleService:
+    """Transactional member deletion and bulk archiving"""
+
+    def __init__(self):
+        self.rpc_available = True
+
+    def evict(self, member_ids: List[str]):
+        """Drop removed or archived members from the in-process caches"""
+        if not member_ids:
+            return
+        member_search_service.invalidate()
+        for member_id in member_ids:
+            occupancy_tracker.check_out(member_id=member_id)
+
+    async def delete_member(self, supabase, member_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Delete a member with their history and login
+        Returns None when the member does not exist, otherwise the deleted row
+        counts per table.
+        """
+        result = None
+        if self.rpc_available:
+            try:
+                response = supabase.rpc("delete_member_cascade", {"p_member_id": member_id}).execute()
+                result = response.data
+            except Exception as e:
+                if getattr(e, "code", None) != RPC_NOT_FOUND_CODE:
+                    raise
+                logger.warning("delete_member_cascade() not found (member_archive.sql not applied) - deleting member step by step")
+                self.rpc_available = False
+
+        if not self.rpc_available:
+            result = await self._delete_member_step_by_step(supabase, member_id)
+
+        if result:
+            self.evict([member_id])
+        return result
+
+    async def _delete_member_step_by_step(self, supabase, member_id: str) -> Optional[Dict[str, Any]]:
+        """Fallback: separate deletes, which can leave partial state if one fails"""
+        existing = supabase.table("members").select("id, user_id").eq("id", member_id).execute()
+        if not existing.data:
+            return None
+        user_id = existing.data[0].get("user_id")
+
+        deleted = {}
+        # Stored password, payments and attendance do not depend on each other
+        results = await run_queries(
+            *(supabase.table(table).delete().eq("member_id", member_id) for table in MEMBER_DEPENDENT_TABLES),
+            return_exceptions=True
+        )
+        for table, result in zip(MEMBER_DEPENDENT_TABLES, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Error deleting {table}: {str(result)}")
+            else:
+                deleted[table] = len(result.data or [])
+
+        supabase.table("members").delete().eq("id", member_id).execute()
+
+        if user_id:
+            auth_result, user_result = await run_queries(
+                lambda: supabase.auth.admin.delete_user(user_id),
+                supabase.table("users").delete().eq("id", user_id),
+                return_exceptions=True
+            )
+            if isinstance(auth_result, Exception):
+                logger.warning(f"Error deleting auth user: {str(auth_result)}")
+            if isinstance(user_result, Exception):
+                logger.warning(f"Error deleting user record: {str(user_result)}")
+
+        return {"member_id": member_id, "user_id": user_id, "deleted": deleted}
+
+    def archive_lapsed(self, supabase, lapsed_days: int = 180, limit: int = 1000,
+                       member_ids: Optional[List[str]] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Soft-delete members whose membership ended more than lapsed_days ago
+        (or the given member_ids) and move their attendance and class bookings
+        to the archive tables, in one statement
+        Raises the PostgREST error (code RPC_NOT_FOUND_CODE) when
+        member_archive.sql is not applied; there is no step-by-step fallback.
+        """
+        response = supabase.rpc("archive_lapsed_members", {
+            "p_lapsed_days": lapsed_days,
+            "p_limit": limit,
+            "p_member_ids": member_ids,
+            "p_dry_run": dry_run
+        }).execute()
+
+        result = response.data
+        if not dry_run:
+            self.evict(result.get("member_ids") or [])
+            logger.info(
+                f"Archived {result.get('archived', 0)} members "
+                f"({result.get('attendance_rows', 0)} attendance rows, "
+                f"{result.get('class_booking_rows', 0)} class bookings)"
+            )
+        return result
+
+
+# Singleton instance
+member_lifecycle = MemberLifecycleService()
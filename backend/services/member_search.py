@@ -0,0 +1,167 @@
+"""
+Member Search Service
+Ranked member lookup by name, email or phone.
+Uses the search_members Postgres function (member_search.sql) and falls back
+to an in-process prefix trie when the function is not available, e.g. on a
+database where the migration has not been applied or on a local stand-in.
+"""
+import re
+import time
+import logging
+import threading
+from typing import Optional, List, Dict, Any, Set
+
+from supabase_client import RPC_NOT_FOUND_CODE
+
+logger = logging.getLogger(__name__)
+
+# Member columns kept in the fallback index
+SEARCH_COLUMNS = "id, full_name, email, phone, status, plan_id"
+
+
+class _TrieNode:
+    __slots__ = ("children", "member_ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.member_ids: Set[str] = set()
+
+
+class PrefixTrie:
+    """Prefix trie mapping token prefixes to member ids"""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, token: str, member_id: str):
+        node = self.root
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+            node.member_ids.add(member_id)
+
+    def lookup(self, prefix: str) -> Set[str]:
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.member_ids
+
+
+def _tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase alphanumeric words"""
+    if not text:
+        return []
+    return [t for t in re.split(r"[^0-9a-z]+", text.lower()) if t]
+
+
+def _digits(text: Optional[str]) -> str:
+    return re.sub(r"[^0-9]", "", text or "")
+
+
+class MemberSearchIndex:
+    """In-process member search index used when Postgres search is unavailable"""
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._trie: Optional[PrefixTrie] = None
+        self._members: Dict[str, Dict[str, Any]] = {}
+        self._built_at = 0.0
+
+    def invalidate(self):
+        """Drop the index so the next search rebuilds it (call after member writes)"""
+        with self._lock:
+            self._trie = None
+
+    def build(self, members: List[Dict[str, Any]]):
+        trie = PrefixTrie()
+        by_id = {}
+        for member in members:
+            member_id = member["id"]
+            by_id[member_id] = member
+            for token in _tokenize(member.get("full_name")):
+                trie.insert(token, member_id)
+            email = (member.get("email") or "").lower()
+            if email:
+                trie.insert(email, member_id)
+                for token in _tokenize(email.split("@")[0]):
+                    trie.insert(token, member_id)
+            # Index every suffix of the phone number so "last 4 digits" lookups work
+            phone = _digits(member.get("phone"))
+            for i in range(len(phone)):
+                trie.insert(phone[i:], member_id)
+        with self._lock:
+            self._trie = trie
+            self._members = by_id
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self, supabase):
+        with self._lock:
+            fresh = self._trie is not None and time.monotonic() - self._built_at < self.ttl_seconds
+        if not fresh:
+            response = supabase.table("members").select(SEARCH_COLUMNS).execute()
+            self.build(response.data)
+
+    def search(self, supabase, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        self._ensure_built(supabase)
+        with self._lock:
+            trie, members = self._trie, self._members
+
+        # Email lookups match the address as a whole, everything else by word
+        terms = [query.strip().lower()] if "@" in query else _tokenize(query)
+        if not terms:
+            return []
+
+        candidates: Optional[Set[str]] = None
+        for term in terms:
+            matches = trie.lookup(term)
+            candidates = set(matches) if candidates is None else candidates & matches
+            if not candidates:
+                return []
+
+        query_lower = query.strip().lower()
+        name_terms = set(_tokenize(query))
+        results = []
+        for member_id in candidates:
+            member = members[member_id]
+            full_name = (member.get("full_name") or "").lower()
+            words = set(_tokenize(full_name))
+            rank = 0.0
+            if full_name.startswith(query_lower):
+                rank += 1.0
+            if (member.get("email") or "").lower().startswith(query_lower):
+                rank += 0.5
+            # Whole-word matches rank above partial prefixes
+            rank += 0.5 * len(name_terms & words) / max(len(name_terms), 1)
+            results.append({**member, "rank": round(rank, 4)})
+
+        results.sort(key=lambda m: (-m["rank"], m.get("full_name") or ""))
+        return results[:limit]
+
+
+class MemberSearchService:
+    """Routes member searches to Postgres or the in-process fallback"""
+
+    def __init__(self):
+        self.index = MemberSearchIndex()
+        self.rpc_available = True
+
+    def invalidate(self):
+        self.index.invalidate()
+
+    def search(self, supabase, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        if self.rpc_available:
+            try:
+                response = supabase.rpc("search_members", {"p_query": query, "p_limit": limit}).execute()
+                return response.data or []
+            except Exception as e:
+                if getattr(e, "code", None) != RPC_NOT_FOUND_CODE:
+                    raise
+                logger.warning("search_members function not found - using in-process member search")
+                self.rpc_available = False
+        return self.index.search(supabase, query, limit)
+
+
+# Singleton instance
+member_search_service = MemberSearchService()
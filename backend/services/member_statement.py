@@ -0,0 +1,263 @@
+"""
+Member Statement Service
+Builds a member's financial statement: ledger entries (charges, payments,
+adjustments, refunds), invoices, installment dues and payments that have not
+completed, in date order with a running balance, and renders it as CSV or PDF.
+
+The sources are fetched concurrently, each already sorted by the database,
+and combined with a k-way merge (heapq.merge) so the statement is built in a
+single pass. Only ledger entries move the balance (member_ledger.sql); the
+other lines are shown for reference. Closing balance therefore matches
+GET /api/balance/member/{id}.
+"""
+import io
+import csv
+import heapq
+import logging
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List, Iterator
+
+from supabase_client import run_queries
+from services.invoice_service import invoice_service
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_COLUMNS = ["date", "type", "reference", "description", "debit", "credit", "balance"]
+
+
+def _sort_key(line: Dict[str, Any]) -> str:
+    return line["timestamp"]
+
+
+class MemberStatementService:
+    """Merged, running-balance member statements"""
+
+    async def build(self, supabase, member_id: str, from_date: Optional[date] = None,
+                    to_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """Build the statement for a member; None when the member does not exist"""
+        # Ledger entries before from_date are needed for the opening balance
+        ledger_query = supabase.table("member_ledger")\
+            .select("id, entry_type, amount, payment_id, description, created_at")\
+            .eq("member_id", member_id)
+        payments_query = supabase.table("payments")\
+            .select("id, amount, payment_method, payment_date, status, description, created_at")\
+            .eq("member_id", member_id)
+        invoices_query = supabase.table("invoices")\
+            .select("id, invoice_number, invoice_date, total_amount, status")\
+            .eq("member_id", member_id)
+        installments_query = supabase.table("installment_plans")\
+            .select("id, installment_count, installment_payments(id, installment_number, amount, due_date, paid_date, status)")\
+            .eq("member_id", member_id)
+
+        if from_date:
+            invoices_query = invoices_query.gte("invoice_date", from_date.isoformat())
+        if to_date:
+            end = (to_date + timedelta(days=1)).isoformat()
+            ledger_query = ledger_query.lt("created_at", end)
+            payments_query = payments_query.lt("created_at", end)
+            invoices_query = invoices_query.lte("invoice_date", to_date.isoformat())
+
+        member_response, ledger_response, payments_response, invoices_response, installments_response = await run_queries(
+            supabase.table("members").select("id, full_name, email, phone, status, plans(name)").eq("id", member_id),
+            ledger_query.order("created_at").order("id"),
+            payments_query.order("created_at").order("id"),
+            invoices_query.order("invoice_date").order("invoice_number"),
+            installments_query
+        )
+
+        if not member_response.data:
+            return None
+        member = member_response.data[0]
+        plan = member.pop("plans", None)
+        member["plan_name"] = plan.get("name") if plan else None
+
+        start = from_date.isoformat() if from_date else ""
+        payments = {p["id"]: p for p in payments_response.data}
+
+        opening_balance = 0.0
+        ledger = []
+        for entry in ledger_response.data:
+            if entry["created_at"][:10] < start:
+                opening_balance += float(entry["amount"])
+            else:
+                ledger.append(entry)
+
+        installments = sorted(
+            (
+                {**due, "installment_count": plan_row["installment_count"]}
+                for plan_row in installments_response.data
+                for due in plan_row.get("installment_payments") or []
+                if start <= due["due_date"] and (not to_date or due["due_date"] <= to_date.isoformat())
+            ),
+            key=lambda due: (due["due_date"], due["installment_number"])
+        )
+
+        balance = opening_balance
+        lines = []
+        for line in heapq.merge(
+            self._ledger_lines(ledger, payments),
+            self._pending_payment_lines(payments_response.data, start),
+            self._invoice_lines(invoices_response.data),
+            self._installment_lines(installments),
+            key=_sort_key
+        ):
+            balance += line.pop("amount")
+            line["balance"] = round(balance, 2)
+            del line["timestamp"]
+            lines.append(line)
+
+        return {
+            "member": member,
+            "from_date": from_date.isoformat() if from_date else None,
+            "to_date": to_date.isoformat() if to_date else None,
+            "opening_balance": round(opening_balance, 2),
+            "closing_balance": round(balance, 2),
+            "total_debits": round(sum(line["debit"] or 0 for line in lines), 2),
+            "total_credits": round(sum(line["credit"] or 0 for line in lines), 2),
+            "lines": lines
+        }
+
+    # Sources (each yields lines in date order) ------------------------
+
+    def _ledger_lines(self, entries: List[Dict[str, Any]], payments: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for entry in entries:
+            amount = float(entry["amount"])
+            payment = payments.get(entry.get("payment_id")) or {}
+            yield {
+                "timestamp": entry["created_at"][:19],
+                "date": entry["created_at"][:10],
+                "type": entry["entry_type"],
+                "reference": (payment.get("payment_method") or "").upper() or None,
+                "description": entry.get("description") or entry["entry_type"].capitalize(),
+                "debit": round(amount, 2) if amount > 0 else None,
+                "credit": round(-amount, 2) if amount < 0 else None,
+                "amount": amount
+            }
+
+    def _pending_payment_lines(self, payments: List[Dict[str, Any]], start: str) -> Iterator[Dict[str, Any]]:
+        """Payments that have not completed (completed ones are ledger entries)"""
+        for payment in payments:
+            if payment["status"] == "completed" or payment["created_at"][:10] < start:
+                continue
+            yield {
+                "timestamp": payment["created_at"][:19],
+                "date": payment["payment_date"],
+                "type": f"payment_{payment['status']}",
+                "reference": (payment.get("payment_method") or "").upper() or None,
+                "description": f"{payment.get('description') or 'Payment'} - {float(payment['amount']):.2f} {payment['status']}",
+                "debit": None,
+                "credit": None,
+                "amount": 0.0
+            }
+
+    def _invoice_lines(self, invoices: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for invoice in invoices:
+            yield {
+                "timestamp": invoice["invoice_date"],
+                "date": invoice["invoice_date"],
+                "type": "invoice",
+                "reference": invoice["invoice_number"],
+                "description": f"Invoice {invoice['invoice_number']} - {float(invoice['total_amount']):.2f} ({invoice.get('status') or 'draft'})",
+                "debit": None,
+                "credit": None,
+                "amount": 0.0
+            }
+
+    def _installment_lines(self, installments: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for due in installments:
+            yield {
+                "timestamp": due["due_date"],
+                "date": due["due_date"],
+                "type": "installment",
+                "reference": f"{due['installment_number']}/{due['installment_count']}",
+                "description": f"Installment {due['installment_number']} of {due['installment_count']} due - {float(due['amount']):.2f} ({due.get('status') or 'pending'})",
+                "debit": None,
+                "credit": None,
+                "amount": 0.0
+            }
+
+    # Rendering --------------------------------------------------------
+
+    def iter_csv(self, statement: Dict[str, Any]) -> Iterator[str]:
+        """CSV rows one at a time, for a StreamingResponse"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush() -> str:
+            row = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return row
+
+        writer.writerow(STATEMENT_COLUMNS)
+        writer.writerow([statement["from_date"] or "", "opening_balance", "", "Opening balance", "", "", statement["opening_balance"]])
+        yield flush()
+        for line in statement["lines"]:
+            writer.writerow(["" if line[column] is None else line[column] for column in STATEMENT_COLUMNS])
+            yield flush()
+        writer.writerow([statement["to_date"] or "", "closing_balance", "", "Closing balance",
+                         statement["total_debits"], statement["total_credits"], statement["closing_balance"]])
+        yield flush()
+
+    def generate_pdf(self, statement: Dict[str, Any]) -> bytes:
+        """Render the statement as a PDF (CPU bound: call it off the event loop)"""
+        # reportlab is loaded on first use to keep it out of server startup
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+        def money(value: Optional[float]) -> str:
+            return "" if value is None else f"₹{value:,.2f}"
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+        styles = getSampleStyleSheet()
+        small = styles["BodyText"].clone("StatementCell", fontSize=8, leading=10)
+        member = statement["member"]
+        period = f"{statement['from_date'] or 'start'} to {statement['to_date'] or date.today().isoformat()}"
+
+        elements = [
+            Paragraph(f"<b>{invoice_service.gym_name}</b> - Member Statement", styles["Heading1"]),
+            Paragraph(
+                f"<b>{member['full_name']}</b><br/>{member.get('email') or ''} | {member.get('phone') or ''}"
+                f"<br/>Plan: {member.get('plan_name') or 'N/A'}<br/>Period: {period}",
+                styles["Normal"]
+            ),
+            Spacer(1, 16)
+        ]
+
+        rows = [["Date", "Type", "Reference", "Description", "Debit", "Credit", "Balance"],
+                ["", "", "", "Opening balance", "", "", money(statement["opening_balance"])]]
+        for line in statement["lines"]:
+            rows.append([
+                line["date"], line["type"].replace("_", " ").capitalize(), line["reference"] or "",
+                Paragraph(line["description"], small), money(line["debit"]), money(line["credit"]), money(line["balance"])
+            ])
+        rows.append(["", "", "", "Closing balance", money(statement["total_debits"]),
+                     money(statement["total_credits"]), money(statement["closing_balance"])])
+
+        table = Table(rows, colWidths=[0.8*inch, 0.8*inch, 0.8*inch, 2.3*inch, 0.8*inch, 0.8*inch, 0.9*inch], repeatRows=1)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('LINEABOVE', (0, -1), (-1, -1), 1.5, colors.HexColor('#2563eb')),
+        ]))
+        elements.append(table)
+
+        doc.build(elements)
+        pdf_bytes = buffer.getvalue()
+        buffer.close()
+        return pdf_bytes
+
+
+# Singleton instance
+member_statement_service = MemberStatementService()
@@ -0,0 +1,311 @@
+"""
+Metrics Service
+Per-route request latency, response size and in-flight counts, plus the
+number and duration of Supabase round-trips made while serving each request.
+Rendered in the Prometheus text format on GET /metrics.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Route label for requests that did not match any route (keeps label cardinality bounded)
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        # Layout: one count per bucket, then +Inf count, then sum
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = _format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_with_le(base, _format_number(bound))} {_format_number(count)}")
+            lines.append(f"{self.name}_bucket{_with_le(base, '+Inf')} {_format_number(series[-2])}")
+            lines.append(f"{self.name}_count{{{base}}} {_format_number(series[-2])}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+
+
+def _with_le(base: str, bound: str) -> str:
+    return "{" + (f'{base},le="{bound}"' if base else f'le="{bound}"') + "}"
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class RequestStats:
+    """Round-trips made while serving one request (shared with worker threads via a contextvar)"""
+
+    __slots__ = ("db_calls", "db_seconds", "_lock")
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "metrics_current_request", default=None
+)
+
+
+class MetricsRegistry:
+    """Process-wide metric store"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests_total: Dict[Tuple[str, str, str], int] = {}
+        self.db_calls_total: Dict[Tuple[str, str], int] = {}
+        self.db_errors_total: Dict[Tuple[str, str], int] = {}
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "Request latency by route", ("method", "route"), LATENCY_BUCKETS
+        )
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Response body size by route", ("method", "route"), SIZE_BUCKETS
+        )
+        self.request_round_trips = Histogram(
+            "http_request_db_round_trips", "Supabase round-trips per request by route", ("method", "route"),
+            ROUND_TRIP_BUCKETS
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_seconds", "Time spent waiting on Supabase per request by route", ("method", "route"),
+            LATENCY_BUCKETS
+        )
+        self.db_duration = Histogram(
+            "db_round_trip_duration_seconds", "Supabase round-trip latency by table/function and operation",
+            ("target", "operation"), LATENCY_BUCKETS
+        )
+        # Log requests that make more round-trips than this (0 disables); surfaces N+1 query patterns
+        self.round_trip_log_threshold = int(os.environ.get('METRICS_DB_ROUND_TRIP_LOG_THRESHOLD', '25'))
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float, size: int,
+                         stats: RequestStats):
+        labels = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            key = (method, route, str(status))
+            self.requests_total[key] = self.requests_total.get(key, 0) + 1
+            self.request_duration.observe(labels, seconds)
+            self.response_size.observe(labels, size)
+            self.request_round_trips.observe(labels, stats.db_calls)
+            self.request_db_time.observe(labels, stats.db_seconds)
+
+        if self.round_trip_log_threshold and stats.db_calls > self.round_trip_log_threshold:
+            logger.warning(
+                f"{method} {route} made {stats.db_calls} database round-trips "
+                f"({stats.db_seconds * 1000:.1f} ms) - possible N+1 query pattern"
+            )
+
+    def db_call_finished(self, target: str, operation: str, seconds: float, failed: bool):
+        labels = (target, operation)
+        with self._lock:
+            self.db_calls_total[labels] = self.db_calls_total.get(labels, 0) + 1
+            if failed:
+                self.db_errors_total[labels] = self.db_errors_total.get(labels, 0) + 1
+            self.db_duration.observe(labels, seconds)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.record(seconds)
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP http_requests_in_flight Requests currently being served",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_requests_total Requests served by route and status",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests_total.items()):
+                labels = _format_labels(("method", "route", "status"), (method, route, status))
+                lines.append(f"http_requests_total{{{labels}}} {count}")
+            for name, help_text, series in (
+                ("db_round_trips_total", "Supabase round-trips by table/function and operation", self.db_calls_total),
+                ("db_round_trip_errors_total", "Failed Supabase round-trips", self.db_errors_total),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for labels, count in sorted(series.items()):
+                    lines.append(f"{name}{{{_format_labels(('target', 'operation'), labels)}}} {count}")
+            for histogram in (self.request_duration, self.response_size, self.request_round_trips,
+                              self.request_db_time, self.db_duration):
+                lines += histogram.render()
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics_registry = MetricsRegistry()
+
+
+# ----------------------------------------------------------------------
+# Supabase client instrumentation
+# ----------------------------------------------------------------------
+
+class _InstrumentedBuilder:
+    """Proxies a query builder and times its execute() call"""
+
+    __slots__ = ("_builder", "_target", "_operation")
+
+    def __init__(self, builder, target: str, operation: str):
+        self._builder = builder
+        self._target = target
+        self._operation = operation
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, "execute"):
+                operation = name if name in ("select", "insert", "update", "upsert", "delete") else self._operation
+                return _InstrumentedBuilder(result, self._target, operation)
+            return result
+        return call
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return self._builder.execute(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            metrics_registry.db_call_finished(self._target, self._operation, time.perf_counter() - started, failed)
+
+
+class InstrumentedClient:
+    """Wraps a Supabase client so every table()/rpc() round-trip is counted"""
+
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def table(self, name: str):
+        return _InstrumentedBuilder(self._client.table(name), name, "select")
+
+    from_ = table
+
+    def rpc(self, name: str, *args, **kwargs):
+        return _InstrumentedBuilder(self._client.rpc(name, *args, **kwargs), f"rpc:{name}", "rpc")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def instrument_client(client):
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client)
+
+
+# ----------------------------------------------------------------------
+# ASGI middleware
+# ----------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """Records latency, status, response size and DB round-trips for every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[Any, str] = {}
+
+    def _route_template(self, scope) -> str:
+        # The router stores the matched endpoint in the scope; map it back to its path template
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if endpoint not in self._route_paths:
+            app = scope.get("app")
+            for route in getattr(app, "routes", []):
+                if getattr(route, "endpoint", None) is not None:
+                    self._route_paths.setdefault(route.endpoint, route.path)
+        return self._route_paths.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = 500
+        size = 0
+        started = time.perf_counter()
+        metrics_registry.request_started()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            metrics_registry.request_finished(
+                scope["method"], self._route_template(scope), status,
+                time.perf_counter() - started, size, stats
+            )
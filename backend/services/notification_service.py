@@ -10,7 +10,6 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 from typing import Optional, Dict, Any, List
 from datetime import datetime, date
-from jinja2 import Template
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +35,8 @@ class NotificationService:
     
     def render_template(self, template: str, variables: Dict[str, Any]) -> str:
         """Render template with variables"""
+        from jinja2 import Template
+        
         try:
             jinja_template = Template(template)
             return jinja_template.render(**variables)
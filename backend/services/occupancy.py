@@ -0,0 +1,149 @@
+"""
+Occupancy Tracking Service
+Keeps a live in-memory view of who is currently checked in and pushes
+changes to WebSocket subscribers (dashboards, reception screens).
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, date
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Queued messages per subscriber before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class OccupancyTracker:
+    """In-memory set of checked-in members, rebuilt from the attendance table on startup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_in: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Set[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]] = set()
+        self.rebuilt_at: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def rebuild(self, supabase) -> int:
+        """Reload open sessions for today from the database"""
+        today = date.today().isoformat()
+        response = supabase.table("attendance")\
+            .select("id, member_id, check_in_time, members(full_name)")\
+            .eq("date", today)\
+            .is_("check_out_time", "null")\
+            .execute()
+
+        checked_in = {}
+        for record in response.data:
+            member = record.get("members") or {}
+            checked_in[record["member_id"]] = {
+                "member_id": record["member_id"],
+                "member_name": member.get("full_name", ""),
+                "attendance_id": record["id"],
+                "check_in_time": record["check_in_time"]
+            }
+
+        with self._lock:
+            self._checked_in = checked_in
+            self.rebuilt_at = datetime.utcnow().isoformat()
+
+        logger.info(f"Occupancy rebuilt: {len(checked_in)} members checked in")
+        self._publish({"type": "snapshot", **self.snapshot()})
+        return len(checked_in)
+
+    def check_in(self, member_id: str, member_name: str, attendance_id: str, check_in_time: str):
+        entry = {
+            "member_id": member_id,
+            "member_name": member_name,
+            "attendance_id": attendance_id,
+            "check_in_time": check_in_time
+        }
+        with self._lock:
+            self._checked_in[member_id] = entry
+            count = len(self._checked_in)
+        self._publish({"type": "check_in", "count": count, "member": entry})
+
+    def check_out(self, member_id: Optional[str] = None, attendance_id: Optional[str] = None):
+        """Remove a member by member id or by the attendance record of their session"""
+        with self._lock:
+            if member_id is None and attendance_id is not None:
+                member_id = next(
+                    (m for m, e in self._checked_in.items() if e["attendance_id"] == attendance_id),
+                    None
+                )
+            entry = self._checked_in.get(member_id) if member_id else None
+            if entry is None or (attendance_id and entry["attendance_id"] != attendance_id):
+                return
+            del self._checked_in[member_id]
+            count = len(self._checked_in)
+        self._publish({"type": "check_out", "count": count, "member": entry})
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return len(self._checked_in)
+
+    def is_checked_in(self, member_id: str) -> bool:
+        with self._lock:
+            return member_id in self._checked_in
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            members: List[Dict[str, Any]] = sorted(
+                self._checked_in.values(), key=lambda e: e["check_in_time"]
+            )
+            return {
+                "count": len(members),
+                "members": members,
+                "rebuilt_at": self.rebuilt_at,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+    # ------------------------------------------------------------------
+    # Subscribers
+    # ------------------------------------------------------------------
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber queue on the running event loop"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((queue, asyncio.get_running_loop()))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {s for s in self._subscribers if s[0] is not queue}
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, message: Dict[str, Any]):
+        # May be called from worker threads, so hand off to each subscriber's loop
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:
+                # Loop already closed - the subscriber is gone
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: Dict[str, Any]):
+        if queue.full():
+            # Slow consumer: drop the oldest message rather than block writers
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(message)
+
+
+# Singleton instance
+occupancy_tracker = OccupancyTracker()
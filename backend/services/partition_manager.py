@@ -0,0 +1,162 @@
+"""
+Partition Manager Service
+Keeps the monthly partitions of attendance and audit_logs (time_partitioning.sql)
+created ahead of time, and archives partitions older than the retention window:
+their rows are written to a gzip-compressed JSON lines file, then the partition
+is detached and dropped.
+"""
+import os
+import gzip
+import json
+import asyncio
+import logging
+from pathlib import Path
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List
+
+from supabase_client import get_supabase_service, RPC_NOT_FOUND_CODE
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables and the column they are partitioned on
+PARTITIONED_TABLES = {
+    "attendance": "date",
+    "audit_logs": "timestamp",
+}
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+class PartitionManager:
+    """Pre-creates upcoming partitions and archives expired ones"""
+
+    def __init__(self):
+        self.months_ahead = int(os.environ.get('PARTITION_MONTHS_AHEAD', '3'))
+        self.interval_seconds = int(os.environ.get('PARTITION_MAINTENANCE_INTERVAL_SECONDS', '86400'))
+        self.archive_enabled = os.environ.get('PARTITION_ARCHIVE_ENABLED', 'false').lower() == 'true'
+        self.archive_dir = Path(os.environ.get('PARTITION_ARCHIVE_DIR', str(Path(__file__).parent.parent / 'archive')))
+        self.retention_months = {
+            "attendance": int(os.environ.get('ATTENDANCE_RETENTION_MONTHS', '24')),
+            "audit_logs": int(os.environ.get('AUDIT_LOG_RETENTION_MONTHS', '12')),
+        }
+        self.page_size = int(os.environ.get('PARTITION_ARCHIVE_PAGE_SIZE', '1000'))
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_partitions(self, supabase) -> List[str]:
+        """Create any missing partitions from this month to months_ahead months ahead"""
+        response = supabase.rpc("ensure_time_partitions", {"p_months_ahead": self.months_ahead}).execute()
+        return response.data or []
+
+    def expired_partitions(self, supabase, table: str, today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Partitions whose whole month is older than the table's retention window"""
+        retention = self.retention_months[table]
+        if retention <= 0:
+            return []
+        cutoff = _add_months((today or date.today()).replace(day=1), -retention).isoformat()
+        response = supabase.rpc("list_time_partitions", {"p_table": table}).execute()
+        return [p for p in response.data or [] if p["range_end"] <= cutoff]
+
+    def archive_partition(self, supabase, table: str, partition: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Dump one partition to <archive_dir>/<partition>.jsonl.gz, then detach and drop it
+
+        Rows are read through the parent table (partition pruning limits the
+        scan to this partition) in id order. The database refuses the drop if
+        the partition no longer holds exactly the archived rows, in which case
+        the partition stays attached and no archive file is kept.
+        """
+        column = PARTITIONED_TABLES[table]
+        name = partition["partition_name"]
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        target = self.archive_dir / f"{name}.jsonl.gz"
+        partial = target.with_suffix(".partial")
+
+        rows = 0
+        last_id = None
+        try:
+            with gzip.open(partial, "wt", encoding="utf-8") as archive:
+                while True:
+                    query = supabase.table(table)\
+                        .select("*")\
+                        .gte(column, partition["range_start"])\
+                        .lt(column, partition["range_end"])
+                    if last_id is not None:
+                        query = query.gt("id", last_id)
+                    page = query.order("id").limit(self.page_size).execute().data
+                    for row in page:
+                        archive.write(json.dumps(row, default=str) + "\n")
+                    rows += len(page)
+                    if len(page) < self.page_size:
+                        break
+                    last_id = page[-1]["id"]
+
+            supabase.rpc("archive_time_partition", {
+                "p_table": table,
+                "p_partition": name,
+                "p_expected_rows": rows
+            }).execute()
+        except Exception:
+            partial.unlink(missing_ok=True)
+            raise
+
+        partial.replace(target)
+        logger.info(f"Archived {rows} rows of {name} to {target}")
+        return {"partition": name, "rows": rows, "file": str(target)}
+
+    def run(self, supabase, archive: Optional[bool] = None) -> Dict[str, Any]:
+        """Pre-create partitions and, when enabled, archive expired ones"""
+        archive = self.archive_enabled if archive is None else archive
+        created = self.ensure_partitions(supabase)
+        archived = []
+        expired = []
+        for table in PARTITIONED_TABLES:
+            for partition in self.expired_partitions(supabase, table):
+                if archive:
+                    archived.append(self.archive_partition(supabase, table, partition))
+                else:
+                    expired.append(partition["partition_name"])
+
+        self.last_run = {
+            "ran_at": datetime.utcnow().isoformat(),
+            "partitions_ensured": len(created),
+            "archived": archived,
+            "expired_not_archived": expired,
+        }
+        return self.last_run
+
+    async def run_forever(self):
+        while True:
+            try:
+                supabase = get_supabase_service()
+                if supabase:
+                    await asyncio.to_thread(self.run, supabase)
+            except Exception as e:
+                if getattr(e, "code", None) == RPC_NOT_FOUND_CODE:
+                    logger.info("Partition functions not found (time_partitioning.sql not applied) - partition maintenance disabled")
+                    return
+                logger.error(f"Partition maintenance error: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start periodic maintenance on the running event loop (interval <= 0 disables it)"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self.run_forever())
+        logger.info(f"Partition maintenance running every {self.interval_seconds}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+partition_manager = PartitionManager()
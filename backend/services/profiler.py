@@ -0,0 +1,228 @@
+"""
+Request Profiler Service
+Opt-in sampling profiler for single requests. A request carrying the
+profiler token (X-Profile header or ?profile= query parameter) is run under
+pyinstrument and its flamegraph is stored as HTML and speedscope JSON in a
+bounded local directory. pyinstrument is optional; without it requests are
+served unprofiled.
+"""
+import os
+import json
+import time
+import asyncio
+import uuid
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import parse_qs
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+# The profile viewer routes share the token and are never profiled themselves
+PROFILES_PATH = "/api/profiles"
+
+
+class RequestProfiler:
+    """Decides which requests to profile and manages the stored profiles"""
+
+    def __init__(self):
+        self.directory = Path(os.environ.get('PROFILER_DIR', str(Path(__file__).parent.parent / 'profiles')))
+        self.max_profiles = int(os.environ.get('PROFILER_MAX_PROFILES', '50'))
+        self.min_interval_seconds = float(os.environ.get('PROFILER_MIN_INTERVAL_SECONDS', '10'))
+        self.sample_interval = float(os.environ.get('PROFILER_SAMPLE_INTERVAL', '0.001'))
+        self._lock = threading.Lock()
+        self._active = False
+        self._last_started = 0.0
+        self._pyinstrument = None
+
+    @property
+    def token(self) -> str:
+        # Read on use so a token from .env (loaded after imports) is picked up
+        return os.environ.get('PROFILER_TOKEN', '')
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def _load_pyinstrument(self):
+        if self._pyinstrument is None:
+            try:
+                import pyinstrument
+                self._pyinstrument = pyinstrument
+            except ImportError:
+                logger.warning("Profiling requested but pyinstrument is not installed (pip install pyinstrument)")
+                self._pyinstrument = False
+        return self._pyinstrument or None
+
+    def is_requested(self, scope) -> bool:
+        """True when the request carries the profiler token"""
+        if not self.enabled or scope.get("path", "").startswith(PROFILES_PATH):
+            return False
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1") == self.token
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return query.get(PROFILE_QUERY_PARAM, [None])[0] == self.token
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return self.enabled and token == self.token
+
+    def acquire(self) -> Optional[str]:
+        """Reserve the profiler for one request; returns why it was refused, or None"""
+        if not self._load_pyinstrument():
+            return "unavailable"
+        with self._lock:
+            now = time.monotonic()
+            if self._active:
+                return "busy"
+            if now - self._last_started < self.min_interval_seconds:
+                return "rate-limited"
+            self._active = True
+            self._last_started = now
+        return None
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+    def start(self):
+        profiler = self._pyinstrument.Profiler(interval=self.sample_interval, async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    @staticmethod
+    def new_id() -> str:
+        # Sortable by creation time
+        return f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def active_seconds(profiler) -> float:
+        """
+        Sampled time the request's own task was running: the profile total minus
+        [await] / [out-of-context] time. Unlike process or thread CPU time, this
+        is not inflated by other requests served concurrently.
+        """
+        from pyinstrument.frame import AWAIT_FRAME_IDENTIFIER, OUT_OF_CONTEXT_FRAME_IDENTIFIER
+
+        session = profiler.last_session
+        root = session.root_frame() if session else None
+        if root is None:
+            return 0.0
+        waiting = 0.0
+        stack = [root]
+        while stack:
+            frame = stack.pop()
+            if frame.identifier in (AWAIT_FRAME_IDENTIFIER, OUT_OF_CONTEXT_FRAME_IDENTIFIER):
+                waiting += frame.time
+            else:
+                stack.extend(frame.children)
+        return max(root.time - waiting, 0.0)
+
+    def save(self, profiler, profile_id: str, method: str, path: str, status: int, wall_seconds: float):
+        """Write HTML, speedscope and metadata files for a finished profile (blocking: run it off the event loop)"""
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile_id}.html").write_text(profiler.output_html(), encoding="utf-8")
+        (self.directory / f"{profile_id}.speedscope.json").write_text(
+            profiler.output(renderer=SpeedscopeRenderer()), encoding="utf-8"
+        )
+        metadata = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "wall_ms": round(wall_seconds * 1000, 2),
+            "cpu_ms": round(self.active_seconds(profiler) * 1000, 2),
+            "created_at": datetime.utcnow().isoformat()
+        }
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(metadata), encoding="utf-8")
+        self._prune()
+        logger.info(f"Profiled {method} {path}: {metadata['wall_ms']} ms wall, {metadata['cpu_ms']} ms CPU (sampled, {profile_id})")
+
+    def _prune(self):
+        # Keep only the newest profiles so the directory stays bounded
+        metadata_files = sorted(self.directory.glob("*.json"), key=lambda p: p.name)
+        metadata_files = [p for p in metadata_files if not p.name.endswith(".speedscope.json")]
+        for stale in metadata_files[:-self.max_profiles] if self.max_profiles > 0 else []:
+            profile_id = stale.name[:-len(".json")]
+            for suffix in (".json", ".html", ".speedscope.json"):
+                (self.directory / f"{profile_id}{suffix}").unlink(missing_ok=True)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in self.directory.glob("*.json"):
+            if path.name.endswith(".speedscope.json"):
+                continue
+            try:
+                profiles.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda p: p["id"], reverse=True)
+
+    def profile_path(self, profile_id: str, suffix: str) -> Optional[Path]:
+        # Ids are generated here, so anything else (e.g. path traversal) is rejected
+        if not all(c.isalnum() or c == "-" for c in profile_id):
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.exists() else None
+
+
+# Singleton instance
+request_profiler = RequestProfiler()
+
+
+class ProfilerMiddleware:
+    """Profiles requests that carry the profiler token, at most one at a time and rate-limited"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not request_profiler.is_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        refused = request_profiler.acquire()
+        if refused:
+            async def send_refused(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-skipped", refused.encode())]
+                await send(message)
+            await self.app(scope, receive, send_refused)
+            return
+
+        status = 500
+        profile_id = request_profiler.new_id()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            profiler = request_profiler.start()
+            wall_started = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.stop()
+                wall = time.perf_counter() - wall_started
+                try:
+                    # Rendering and writing the files would otherwise block the event loop
+                    await asyncio.to_thread(
+                        request_profiler.save, profiler, profile_id, scope["method"], scope["path"], status, wall
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to save profile {profile_id}: {str(e)}")
+        finally:
+            request_profiler.release()
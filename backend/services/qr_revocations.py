@@ -0,0 +1,71 @@
+"""
+QR Revocation Service
+In-memory copy of the qr_revocations table. Signed QR codes are only
+rejected when their member regenerated a code after the one being scanned,
+so the list stays small and is checked without a query per scan.
+"""
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class QRRevocationList:
+    """Member id -> epoch before which signed codes are no longer valid"""
+
+    def __init__(self, ttl_seconds: int = 60):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._revoked_before: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+
+    def load(self, supabase):
+        response = supabase.table("qr_revocations").select("member_id, revoked_before").execute()
+        revoked = {row["member_id"]: int(row["revoked_before"]) for row in response.data}
+        with self._lock:
+            self._revoked_before = revoked
+            self._loaded_at = time.monotonic()
+        logger.info(f"QR revocation list loaded: {len(revoked)} members")
+
+    def _ensure_loaded(self, supabase):
+        # Refresh periodically so revocations made by other workers are picked up
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+        if not fresh:
+            self.load(supabase)
+
+    def revoked_before(self, supabase, member_id: str) -> Optional[int]:
+        self._ensure_loaded(supabase)
+        with self._lock:
+            return self._revoked_before.get(member_id)
+
+    def is_revoked(self, supabase, member_id: str, issued_at: int) -> bool:
+        cutoff = self.revoked_before(supabase, member_id)
+        return cutoff is not None and issued_at < cutoff
+
+    def revoke(self, supabase, member_id: str, revoked_before: int):
+        """Reject every signed code for the member issued before the given epoch"""
+        supabase.table("qr_revocations").upsert({
+            "member_id": member_id,
+            "revoked_before": revoked_before,
+            "updated_at": datetime.utcnow().isoformat()
+        }).execute()
+        with self._lock:
+            self._revoked_before[member_id] = revoked_before
+
+    def snapshot(self, supabase) -> Dict[str, Any]:
+        """Full list for kiosks that validate codes offline"""
+        self._ensure_loaded(supabase)
+        with self._lock:
+            return {
+                "revocations": dict(self._revoked_before),
+                "count": len(self._revoked_before),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+
+# Singleton instance
+qr_revocation_list = QRRevocationList()
@@ -0,0 +1,203 @@
+"""
+Response Cache Service
+In-process cache for read-heavy routes. Routes opt in with @cached(ttl, tags);
+write routes declare what they change with @invalidates(*tags). Concurrent
+misses for the same key share a single computation (single-flight).
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import functools
+import concurrent.futures
+from typing import Dict, Any, Iterable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Route parameters that identify the caller rather than the response
+CALLER_PARAMS = ("current_user", "request", "user")
+
+
+class ResponseCache:
+    """TTL cache with tag-based invalidation and single-flight misses"""
+
+    def __init__(self):
+        self.enabled = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() != 'false'
+        self.max_entries = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Any, Tuple[str, ...]]] = {}
+        self._tag_keys: Dict[str, Set[str]] = {}
+        self._tag_generations: Dict[str, int] = {}
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return False, None
+            self.hits += 1
+            return True, value
+
+    def _generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._tag_generations.get(tag, 0) for tag in tags)
+
+    def set(self, key: str, value: Any, ttl: float, tags: Tuple[str, ...], generations: Tuple[int, ...]):
+        with self._lock:
+            # A write invalidated one of the tags while this value was computed - it may be stale
+            if self._generations(tags) != generations:
+                return
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for tag in entry[2]:
+                keys = self._tag_keys.get(tag)
+                if keys:
+                    keys.discard(key)
+
+    def _evict(self):
+        # Expired entries first, then whatever expires soonest
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _, _) in self._entries.items() if expires_at < now]
+        for key in expired or [min(self._entries, key=lambda k: self._entries[k][0])]:
+            self._drop(key)
+
+    def invalidate(self, *tags: str):
+        """Drop every cached response carrying any of the tags"""
+        with self._lock:
+            for tag in tags:
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+                for key in list(self._tag_keys.pop(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
+
+    # ------------------------------------------------------------------
+    # Single-flight
+    # ------------------------------------------------------------------
+
+    async def get_or_compute(self, key: str, compute, ttl: float, tags: Tuple[str, ...]):
+        found, value = self.get(key)
+        if found:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                # concurrent.futures so waiters on other event loops (worker threads) can share it
+                future = self._inflight[key] = concurrent.futures.Future()
+                self.misses += 1
+                generations = self._generations(tags)
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                # Shielded: a waiter being cancelled must not cancel the shared computation
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    # The leader was cancelled (e.g. a timed-out overview section), not this waiter
+                    return await self.get_or_compute(key, compute, ttl, tags)
+                raise
+
+        try:
+            value = await compute()
+            self.set(key, value, ttl, tags, generations)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; retrieve it so the future does not log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+# Singleton instance
+response_cache = ResponseCache()
+
+
+def _cache_key(func, kwargs: Dict[str, Any]) -> str:
+    parts = [f"{func.__module__}.{func.__qualname__}"]
+    for name in sorted(kwargs):
+        value = kwargs[name]
+        if name in CALLER_PARAMS:
+            # Responses can differ by role (e.g. members only see their own rows), never by session
+            role = value.get("role") if isinstance(value, dict) else getattr(value, "role", None)
+            if role is not None:
+                parts.append(f"role={role}")
+            if role == "member":
+                member_id = value.get("id") if isinstance(value, dict) else getattr(value, "id", None)
+                parts.append(f"user={member_id}")
+            continue
+        parts.append(f"{name}={value!r}")
+    return "|".join(parts)
+
+
+def cached(ttl: float, tags: Iterable[str]):
+    """
+    Cache an async route's return value for ttl seconds
+    The key is the route plus its path/query parameters and the caller's role
+    """
+    tags = tuple(tags)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not response_cache.enabled or args:
+                return await func(*args, **kwargs)
+            key = _cache_key(func, kwargs)
+            return await response_cache.get_or_compute(key, lambda: func(**kwargs), ttl, tags)
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags: str):
+    """Invalidate the tags once the wrapped write route finishes (failed writes may be partial)"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                response_cache.invalidate(*tags)
+        return wrapper
+    return decorator
@@ -2,12 +2,28 @@
 Supabase client configuration and helper functions
 """
 import os
+import asyncio
 from supabase import create_client, Client
-from typing import Optional
+from typing import Optional, List, Any, Dict, Iterable, Tuple
+from collections import defaultdict
+from datetime import date, datetime
 import logging
+from services.metrics import instrument_client
 
 logger = logging.getLogger(__name__)
 
+# PostgREST error code for "function not found in the schema cache"
+RPC_NOT_FOUND_CODE = "PGRST202"
+
+# PostgREST error code for "column not found in the schema cache"
+COLUMN_NOT_FOUND_CODE = "PGRST204"
+
+# (table, column) pairs found missing by insert_rows (their migration is not applied)
+_missing_columns = set()
+
+# Filter operators accepted by aggregate_rows (also the postgrest builder method names)
+AGGREGATE_FILTER_OPS = ("eq", "neq", "gt", "gte", "lt", "lte", "in")
+
 # Supabase client instance
 supabase_client: Optional[Client] = None
 supabase_service_client: Optional[Client] = None
@@ -29,7 +45,7 @@ def init_supabase() -> Client:
         return None
     
     try:
-        supabase_client = create_client(supabase_url, supabase_key)
+        supabase_client = instrument_client(create_client(supabase_url, supabase_key))
         logger.info("Supabase client initialized successfully")
         return supabase_client
     except Exception as e:
@@ -58,7 +74,7 @@ def get_supabase_service() -> Optional[Client]:
             return None
         
         try:
-            supabase_service_client = create_client(supabase_url, supabase_service_key)
+            supabase_service_client = instrument_client(create_client(supabase_url, supabase_service_key))
             logger.info("Supabase service client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Supabase service client: {str(e)}")
@@ -67,6 +83,16 @@ def get_supabase_service() -> Optional[Client]:
     return supabase_service_client
 
 
+def install_clients(client, service_client=None):
+    """
+    Use pre-built clients instead of creating them from the environment
+    (the load-test harness installs its in-memory stand-in this way)
+    """
+    global supabase_client, supabase_service_client
+    supabase_client = instrument_client(client)
+    supabase_service_client = instrument_client(service_client) if service_client is not None else supabase_client
+
+
 def check_supabase_configured() -> bool:
     """Check if Supabase is properly configured"""
     supabase_url = os.environ.get('SUPABASE_URL')
@@ -79,3 +105,162 @@ def check_supabase_configured() -> bool:
         return False
     
     return True
+
+
+def get_query_parallelism() -> int:
+    """Maximum queries one request runs at the same time (SUPABASE_QUERY_PARALLELISM)"""
+    return max(1, int(os.environ.get('SUPABASE_QUERY_PARALLELISM', '4')))
+
+
+async def run_queries(*queries, return_exceptions: bool = False) -> List[Any]:
+    """
+    Execute independent queries concurrently and return their results in order
+    
+    Each query is either a query builder (anything with .execute()) or a
+    zero-argument callable. The client is synchronous, so queries run on worker
+    threads, at most get_query_parallelism() at a time for this call. With
+    return_exceptions=True a failed query yields its exception instead of
+    raising, so callers can tolerate partial failures.
+    """
+    semaphore = asyncio.Semaphore(get_query_parallelism())
+    
+    async def run(query):
+        call = query.execute if hasattr(query, "execute") else query
+        async with semaphore:
+            return await asyncio.to_thread(call)
+    
+    return await asyncio.gather(*(run(q) for q in queries), return_exceptions=return_exceptions)
+
+
+def insert_rows(client: Client, table: str, rows: Any, optional_columns: Iterable[str] = ()):
+    """
+    Insert one row (dict) or several (list) and return the response
+    optional_columns come from migrations that may not be applied yet: when
+    PostgREST reports one of them missing, it is dropped from this and later
+    inserts into the table and the insert is retried.
+    """
+    optional_columns = tuple(optional_columns)
+    
+    def strip(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in row.items() if (table, k) not in _missing_columns}
+    
+    payload = [strip(row) for row in rows] if isinstance(rows, list) else strip(rows)
+    try:
+        return client.table(table).insert(payload).execute()
+    except Exception as e:
+        if getattr(e, "code", None) != COLUMN_NOT_FOUND_CODE:
+            raise
+        message = getattr(e, "message", None) or str(e)
+        missing = [c for c in optional_columns if f"'{c}'" in message and (table, c) not in _missing_columns]
+        if not missing:
+            raise
+        logger.warning(f"{table}.{', '.join(missing)} not found (migration not applied) - inserting without it")
+        _missing_columns.update((table, c) for c in missing)
+        return insert_rows(client, table, rows, optional_columns)
+
+
+def count_rows(client: Client, table: str):
+    """
+    Exact row count without transferring rows
+    Returns a head-only count query: chain filters, execute (or pass to
+    run_queries) and read .count from the response.
+    """
+    return client.table(table).select("*", count="exact", head=True)
+
+
+def _bucket(value: Any, bucket: str) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00")) if "T" in value else date.fromisoformat(value[:10])
+    return value.strftime("%Y-%m" if bucket == "month" else "%Y-%m-%d")
+
+
+def aggregate_in_python(rows: Iterable[Dict[str, Any]], group_by: Iterable[str] = (),
+                        sums: Iterable[str] = (), averages: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """Same result as the aggregate_rows SQL function, computed from fetched rows"""
+    group_by, sums, averages = tuple(group_by), tuple(sums), tuple(averages)
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    values: Dict[Tuple, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    
+    for row in rows:
+        key_values = {}
+        for item in group_by:
+            column, _, bucket = item.partition(":")
+            key_values[column] = _bucket(row.get(column), bucket) if bucket else row.get(column)
+        key = tuple(key_values.values())
+        group = groups.setdefault(key, {**key_values, "count": 0})
+        group["count"] += 1
+        for column in set(sums) | set(averages):
+            if row.get(column) is not None:
+                values[key][column].append(float(row[column]))
+    
+    # Like SQL, an ungrouped aggregate over no rows still yields one row
+    if not group_by and not groups:
+        groups[()] = {"count": 0}
+    
+    for key, group in groups.items():
+        for column in sums:
+            group[f"sum_{column}"] = sum(values[key][column])
+        for column in averages:
+            column_values = values[key][column]
+            group[f"avg_{column}"] = sum(column_values) / len(column_values) if column_values else None
+    return list(groups.values())
+
+
+class AggregateQuery:
+    """
+    Server-side count/sum/avg over a table, optionally grouped (see aggregate_rows)
+    execute() returns the list of groups. Uses the aggregate_rows Postgres
+    function (aggregate_rows.sql) and, where the function is not installed,
+    falls back to fetching only the needed columns and aggregating here.
+    """
+    
+    def __init__(self, client: Client, table: str, group_by: Iterable[str], sums: Iterable[str],
+                 averages: Iterable[str], filters: Iterable[Tuple[str, str, Any]]):
+        self.client = client
+        self.table = table
+        self.group_by = list(group_by)
+        self.sums = list(sums)
+        self.averages = list(averages)
+        self.filters = list(filters)
+        for column, op, _ in self.filters:
+            if op not in AGGREGATE_FILTER_OPS:
+                raise ValueError(f"Unsupported aggregate filter operator: {op}")
+    
+    # Cleared on the first "function not found" so later calls go straight to the fallback
+    rpc_available = True
+    
+    def execute(self) -> List[Dict[str, Any]]:
+        if AggregateQuery.rpc_available:
+            try:
+                return self.client.rpc("aggregate_rows", {
+                    "p_table": self.table,
+                    "p_group_by": self.group_by,
+                    "p_sum": self.sums,
+                    "p_avg": self.averages,
+                    "p_filters": [{"column": c, "op": op, "value": v} for c, op, v in self.filters]
+                }).execute().data or []
+            except Exception as e:
+                if getattr(e, "code", None) != RPC_NOT_FOUND_CODE:
+                    raise
+                logger.warning("aggregate_rows function not found - aggregating in Python (run aggregate_rows.sql)")
+                AggregateQuery.rpc_available = False
+        
+        columns = {item.partition(":")[0] for item in self.group_by} | set(self.sums) | set(self.averages)
+        query = self.client.table(self.table).select(", ".join(sorted(columns)) or "id")
+        for column, op, value in self.filters:
+            query = getattr(query, "in_" if op == "in" else op)(column, value)
+        return aggregate_in_python(query.execute().data, self.group_by, self.sums, self.averages)
+
+
+def aggregate_rows(client: Client, table: str, group_by: Iterable[str] = (), sums: Iterable[str] = (),
+                   averages: Iterable[str] = (), filters: Iterable[Tuple[str, str, Any]] = ()) -> AggregateQuery:
+    """
+    Aggregate a table in the database instead of fetching its rows
+    - group_by: columns; "<column>:day" / "<column>:month" bucket dates as 'YYYY-MM-DD' / 'YYYY-MM'
+    - sums / averages: numeric columns, returned as sum_<column> / avg_<column>
+    - filters: (column, op, value) with op in AGGREGATE_FILTER_OPS
+    Every group also carries "count". Execute the returned query directly or via run_queries.
+    """
+    return AggregateQuery(client, table, group_by, sums, averages, filters)
@@ -0,0 +1,101 @@
+"""
+Test audit JSON Patch diffs and entity state rebuilding
+Runs against the load-test stand-in (no server or database needed):
+    python test_audit_rebuild.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+from loadtest.run import build_app
+from loadtest.stand_in import StandInClient
+from services.audit_service import audit_service, json_diff, apply_patch, AuditHistoryUnavailable
+
+ADMIN = {"id": "00000000-0000-0000-0000-00000000000a", "email": "admin@example.com", "role": "admin"}
+
+
+def _states():
+    return [
+        {"name": "Asha", "phone": "98450", "tags": ["yoga", "am"], "plan": {"id": "p1", "months": 3}},
+        {"name": "Asha R", "phone": "98450", "tags": ["yoga"], "plan": {"id": "p1", "months": 6}, "trainer": "t1"},
+        {"name": "Asha R", "tags": ["yoga", "pm", "hiit"], "plan": {"id": "p2", "months": 6}, "trainer": None},
+        {"name": "a/b~c", "tags": [], "plan": None, "trainer": None},
+    ]
+
+
+def test_json_diff_round_trip():
+    states = _states()
+    for before in states:
+        for after in states:
+            patch = json_diff(before, after)
+            assert apply_patch(before, patch) == after, (before, after, patch)
+            assert (patch == []) == (before == after)
+
+
+def test_rebuild_applies_entries_in_version_order():
+    client = StandInClient()
+    states = _states()
+    interval = audit_service.snapshot_interval
+    audit_service.snapshot_interval = 2  # versions 1 and 3 are snapshots, 2 and 4 diffs
+    try:
+        for before, after in zip([None] + states, states):
+            audit_service.record(client, ADMIN, "CREATE" if before is None else "UPDATE", "member", "m1",
+                                 before=before, after=after)
+    finally:
+        audit_service.snapshot_interval = interval
+
+    # Version 2 lands after the version 3 snapshot: it must not be applied on top of it
+    rows = client.table("audit_logs").select("*").eq("entity_id", "m1").order("version").execute().data
+    base = datetime(2026, 1, 1)
+    for row, offset in zip(rows, [0, 2, 1, 3]):
+        client.table("audit_logs").update({"timestamp": (base + timedelta(minutes=offset)).isoformat()})\
+            .eq("id", row["id"]).execute()
+
+    rebuilt = audit_service.rebuild(client, "member", "m1", base + timedelta(hours=1))
+    assert rebuilt["state"] == states[-1]
+    assert rebuilt["version"] == len(states)
+
+
+def test_rebuild_without_snapshot_reports_archived_history():
+    client = StandInClient()
+    states = _states()
+    for before, after in zip([None] + states, states):
+        audit_service.record(client, ADMIN, "CREATE" if before is None else "UPDATE", "member", "m2",
+                             before=before, after=after)
+    # The partition holding the snapshot was archived
+    client.table("audit_logs").delete().eq("entity_id", "m2").eq("is_snapshot", True).execute()
+
+    try:
+        audit_service.rebuild(client, "member", "m2")
+    except AuditHistoryUnavailable as e:
+        assert "archived" in str(e)
+    else:
+        raise AssertionError("rebuild without a snapshot should raise AuditHistoryUnavailable")
+
+
+async def _rebuild_route_status():
+    app, client, fixtures = build_app(members=5, seed=1)
+    states = _states()
+    for before, after in zip([None] + states, states):
+        audit_service.record(client, ADMIN, "CREATE" if before is None else "UPDATE", "member", "m3",
+                             before=before, after=after)
+    client.table("audit_logs").delete().eq("entity_id", "m3").eq("is_snapshot", True).execute()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        response = await http.get("/api/api/audit-logs/entity/member/m3/state")
+    return response
+
+
+def test_rebuild_route_returns_410_without_snapshot():
+    response = asyncio.run(_rebuild_route_status())
+    assert response.status_code == 410, response.text
+
+
+if __name__ == "__main__":
+    test_json_diff_round_trip()
+    test_rebuild_applies_entries_in_version_order()
+    test_rebuild_without_snapshot_reports_archived_history()
+    test_rebuild_route_returns_410_without_snapshot()
+    print("✓ Audit diffs round-trip and rebuilds use version order")
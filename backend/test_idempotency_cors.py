@@ -0,0 +1,53 @@
+"""
+Test Idempotency-Key replays keep their CORS headers
+Runs the app in-process against the load-test stand-in (no server or
+database needed):
+    python test_idempotency_cors.py
+"""
+import asyncio
+from datetime import date
+
+import httpx
+
+from loadtest.run import build_app
+
+ORIGIN = "http://localhost:3000"
+
+
+async def _replay_and_conflict():
+    app, client, fixtures = build_app(members=20, seed=1)
+    member = fixtures["members"][0]
+    body = {
+        "member_id": member["id"],
+        "amount": 500,
+        "payment_method": "cash",
+        "payment_date": date.today().isoformat(),
+        "status": "completed",
+        "description": "Idempotency CORS test"
+    }
+    headers = {"Origin": ORIGIN, "Idempotency-Key": "cors-replay-test"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        first = await http.post("/api/payments", json=body, headers=headers)
+        replay = await http.post("/api/payments", json=body, headers=headers)
+        mismatch = await http.post("/api/payments", json={**body, "amount": 600}, headers=headers)
+    return first, replay, mismatch
+
+
+def test_idempotency_replay_has_cors_headers():
+    first, replay, mismatch = asyncio.run(_replay_and_conflict())
+
+    assert first.status_code == 200, first.text
+    assert replay.status_code == 200, replay.text
+    assert replay.headers.get("idempotent-replayed") == "true"
+    assert replay.json() == first.json()
+    assert mismatch.status_code == 422, mismatch.text
+
+    for response in (first, replay, mismatch):
+        assert response.headers.get("access-control-allow-origin") in (ORIGIN, "*"), dict(response.headers)
+
+
+if __name__ == "__main__":
+    test_idempotency_replay_has_cors_headers()
+    print("✓ Idempotency replays and key conflicts carry CORS headers")
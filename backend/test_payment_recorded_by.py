@@ -0,0 +1,67 @@
+"""
+Test payment inserts still work before cash_register.sql adds payments.recorded_by
+Runs against the load-test stand-in (no server or database needed):
+    python test_payment_recorded_by.py
+"""
+from postgrest.exceptions import APIError
+
+import supabase_client
+from loadtest.stand_in import StandInClient
+from supabase_client import insert_rows
+
+
+class WithoutRecordedBy(StandInClient):
+    """Stand-in whose payments table has no recorded_by column, like PostgREST before the migration"""
+
+    def table(self, name):
+        builder = super().table(name)
+        insert = builder.insert
+
+        def checked_insert(json, *args, **kwargs):
+            rows = json if isinstance(json, list) else [json]
+            if name == "payments" and any("recorded_by" in row for row in rows):
+                raise APIError({
+                    "code": "PGRST204",
+                    "message": "Could not find the 'recorded_by' column of 'payments' in the schema cache",
+                    "details": None,
+                    "hint": None,
+                })
+            return insert(json, *args, **kwargs)
+
+        builder.insert = checked_insert
+        return builder
+
+
+def test_insert_retries_without_missing_optional_column():
+    supabase_client._missing_columns.clear()
+    client = WithoutRecordedBy()
+    try:
+        row = {"member_id": "m1", "amount": 500, "recorded_by": "u1"}
+        first = insert_rows(client, "payments", row, optional_columns=["recorded_by"])
+        assert first.data and "recorded_by" not in first.data[0]
+        assert ("payments", "recorded_by") in supabase_client._missing_columns
+
+        # Later inserts, single or bulk, skip the column without another failed round-trip
+        bulk = insert_rows(client, "payments", [dict(row), dict(row, amount=600)], optional_columns=["recorded_by"])
+        assert len(bulk.data) == 2
+        assert len(client.table("payments").select("*").execute().data) == 3
+    finally:
+        supabase_client._missing_columns.clear()
+
+
+def test_insert_raises_for_other_missing_columns():
+    supabase_client._missing_columns.clear()
+    client = WithoutRecordedBy()
+    try:
+        insert_rows(client, "payments", {"member_id": "m1", "amount": 500, "recorded_by": "u1"})
+    except APIError as e:
+        assert e.code == "PGRST204"
+    else:
+        raise AssertionError("a missing column that is not optional should still fail the insert")
+    assert not supabase_client._missing_columns
+
+
+if __name__ == "__main__":
+    test_insert_retries_without_missing_optional_column()
+    test_insert_raises_for_other_missing_columns()
+    print("✓ Payment inserts fall back when recorded_by is not migrated yet")
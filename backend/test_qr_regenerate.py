@@ -0,0 +1,56 @@
+"""
+Test regenerating a member QR code revokes the previous one, even within the same second
+Runs the app in-process against the load-test stand-in (no server or
+database needed):
+    python test_qr_regenerate.py
+"""
+import asyncio
+import os
+import time
+
+import httpx
+
+from loadtest.run import build_app
+from routes.qr_attendance import _resolve_qr_codes
+from services.qr_revocations import qr_revocation_list
+
+
+async def _regenerate_twice():
+    app, client, fixtures = build_app(members=5, seed=1)
+    member = fixtures["members"][0]
+    qr_revocation_list._loaded_at = None
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        first = await http.post(f"/api/qr-attendance/regenerate/{member['id']}")
+        second = await http.post(f"/api/qr-attendance/regenerate/{member['id']}")
+    return client, member, first, second
+
+
+def test_regenerate_in_same_second_revokes_previous_code():
+    previous_keys = os.environ.get("QR_SIGNING_KEYS")
+    os.environ["QR_SIGNING_KEYS"] = "1:test-secret"
+    real_time = time.time
+    frozen = real_time()
+    time.time = lambda: frozen  # both regenerations land in the same second
+    try:
+        client, member, first, second = asyncio.run(_regenerate_twice())
+        assert first.status_code == 200, first.text
+        assert second.status_code == 200, second.text
+
+        old_code, new_code = first.json()["qr_code"], second.json()["qr_code"]
+        members, errors = _resolve_qr_codes(client, [old_code, new_code])
+        assert errors.get(old_code) == "QR code has been replaced by a newer one", errors
+        assert members[new_code]["id"] == member["id"]
+    finally:
+        time.time = real_time
+        qr_revocation_list._loaded_at = None
+        if previous_keys is None:
+            os.environ.pop("QR_SIGNING_KEYS", None)
+        else:
+            os.environ["QR_SIGNING_KEYS"] = previous_keys
+
+
+if __name__ == "__main__":
+    test_regenerate_in_same_second_revokes_previous_code()
+    print("✓ Regenerated QR codes revoke the previous code within the same second")
@@ -0,0 +1,256 @@
+-- Monthly range partitioning for attendance and audit_logs
+-- attendance is partitioned by date, audit_logs by timestamp, one partition
+-- per calendar month (attendance_2025_01, audit_logs_2025_01, ...) plus a
+-- DEFAULT partition that catches rows outside the pre-created months.
+-- Queries filtering on date / timestamp only touch the matching partitions.
+--
+-- services/partition_manager.py keeps upcoming months pre-created and
+-- archives partitions past the retention window (partition_maintenance.py).
+-- Run this in your Supabase SQL Editor after supabase_schema.sql,
+-- advanced_features_schema.sql, attendance_auto_checkout.sql and index_pack.sql.
+-- Existing rows are copied into the partitioned tables; take a backup first.
+--
+-- Locking: archive_time_partition() runs DETACH PARTITION inside a function,
+-- where the CONCURRENTLY form is not allowed. The detach takes an ACCESS
+-- EXCLUSIVE lock on the parent table (attendance / audit_logs) until the
+-- function returns, so reads and writes of the whole table wait for the
+-- count and DROP of the old partition. That is a short pause for a monthly
+-- partition, but schedule archiving outside opening hours. To avoid the lock,
+-- run ALTER TABLE ... DETACH PARTITION ... CONCURRENTLY by hand (outside a
+-- transaction block), then DROP TABLE once the rows are archived.
+
+-- ============================================================================
+-- PARTITION MANAGEMENT FUNCTIONS (service role only)
+-- ============================================================================
+
+-- Partitioned tables and the column they are partitioned on
+CREATE OR REPLACE FUNCTION time_partition_column(p_table TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE p_table WHEN 'attendance' THEN 'date' WHEN 'audit_logs' THEN 'timestamp' END;
+$$;
+
+-- Create the partition holding p_month (any day in the month); returns its name
+CREATE OR REPLACE FUNCTION create_time_partition(p_table TEXT, p_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::DATE;
+    v_name TEXT := p_table || '_' || to_char(p_month, 'YYYY_MM');
+BEGIN
+    IF time_partition_column(p_table) IS NULL THEN
+        RAISE EXCEPTION 'create_time_partition: % is not a partitioned table', p_table;
+    END IF;
+    IF to_regclass(v_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            v_name, p_table, v_start, (v_start + INTERVAL '1 month')::DATE
+        );
+    END IF;
+    RETURN v_name;
+END;
+$$;
+
+-- Pre-create partitions from p_months_back months ago to p_months_ahead months ahead
+CREATE OR REPLACE FUNCTION ensure_time_partitions(p_months_ahead INTEGER DEFAULT 3, p_months_back INTEGER DEFAULT 0)
+RETURNS SETOF TEXT
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_table TEXT;
+    v_offset INTEGER;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['attendance', 'audit_logs'] LOOP
+        FOR v_offset IN -p_months_back .. p_months_ahead LOOP
+            RETURN NEXT create_time_partition(v_table, (date_trunc('month', CURRENT_DATE) + v_offset * INTERVAL '1 month')::DATE);
+        END LOOP;
+    END LOOP;
+END;
+$$;
+
+-- Monthly partitions of a table with their range and an estimated row count
+CREATE OR REPLACE FUNCTION list_time_partitions(p_table TEXT)
+RETURNS TABLE (partition_name TEXT, range_start DATE, range_end DATE, estimated_rows BIGINT)
+LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public AS $$
+    SELECT
+        child.relname::TEXT,
+        to_date(right(child.relname, 7), 'YYYY_MM'),
+        (to_date(right(child.relname, 7), 'YYYY_MM') + INTERVAL '1 month')::DATE,
+        GREATEST(child.reltuples, 0)::BIGINT
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = p_table
+      AND parent.relnamespace = 'public'::regnamespace
+      AND child.relname ~ ('^' || p_table || '_[0-9]{4}_[0-9]{2}$')
+    ORDER BY 2;
+$$;
+
+-- Detach and drop an archived partition
+-- p_expected_rows is the number of rows the caller archived; if the partition
+-- holds a different number (rows were written meanwhile) the function raises,
+-- which rolls back the detach as well, so the partition stays attached and
+-- nothing is dropped.
+CREATE OR REPLACE FUNCTION archive_time_partition(p_table TEXT, p_partition TEXT, p_expected_rows BIGINT)
+RETURNS BIGINT
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_start DATE;
+    v_rows BIGINT;
+BEGIN
+    SELECT range_start INTO v_start FROM list_time_partitions(p_table) WHERE partition_name = p_partition;
+    IF v_start IS NULL THEN
+        RAISE EXCEPTION 'archive_time_partition: % is not a monthly partition of %', p_partition, p_table;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_table, p_partition);
+    EXECUTE format('SELECT count(*) FROM %I', p_partition) INTO v_rows;
+
+    IF v_rows <> p_expected_rows THEN
+        RAISE EXCEPTION 'archive_time_partition: % has % rows, % were archived', p_partition, v_rows, p_expected_rows;
+    END IF;
+
+    EXECUTE format('DROP TABLE %I', p_partition);
+    RETURN v_rows;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION create_time_partition(TEXT, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION ensure_time_partitions(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION list_time_partitions(TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION archive_time_partition(TEXT, TEXT, BIGINT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_time_partition(TEXT, DATE) TO service_role;
+GRANT EXECUTE ON FUNCTION ensure_time_partitions(INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION list_time_partitions(TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION archive_time_partition(TEXT, TEXT, BIGINT) TO service_role;
+
+-- ============================================================================
+-- CONVERT ATTENDANCE (partitioned by date)
+-- ============================================================================
+
+DO $$
+DECLARE
+    v_directory TEXT;
+    v_month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'attendance'::regclass) = 'p' THEN
+        RAISE NOTICE 'attendance is already partitioned';
+        RETURN;
+    END IF;
+
+    -- member_directory reads attendance; recreate it on the new table afterwards
+    IF to_regclass('member_directory') IS NOT NULL THEN
+        v_directory := pg_get_viewdef('member_directory'::regclass);
+        DROP VIEW member_directory;
+    END IF;
+
+    ALTER TABLE attendance RENAME TO attendance_unpartitioned;
+
+    -- The partition key has to be part of the primary key
+    CREATE TABLE attendance (
+        LIKE attendance_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+        PRIMARY KEY (id, date)
+    ) PARTITION BY RANGE (date);
+    ALTER TABLE attendance ADD FOREIGN KEY (member_id) REFERENCES members(id) ON DELETE CASCADE;
+    CREATE TABLE attendance_default PARTITION OF attendance DEFAULT;
+
+    FOR v_month IN
+        SELECT month::DATE FROM generate_series(
+            (SELECT date_trunc('month', COALESCE(MIN(date), CURRENT_DATE)) FROM attendance_unpartitioned),
+            date_trunc('month', CURRENT_DATE) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        ) AS month
+    LOOP
+        PERFORM create_time_partition('attendance', v_month);
+    END LOOP;
+
+    INSERT INTO attendance SELECT * FROM attendance_unpartitioned;
+    DROP TABLE attendance_unpartitioned;
+
+    CREATE INDEX idx_attendance_member_id ON attendance(member_id);
+    CREATE INDEX idx_attendance_date ON attendance(date);
+    CREATE INDEX idx_attendance_open_sessions ON attendance(check_in_time) WHERE check_out_time IS NULL;
+    CREATE INDEX idx_attendance_member_open ON attendance(member_id, date, check_in_time DESC) WHERE check_out_time IS NULL;
+    CREATE INDEX idx_attendance_member_date ON attendance(member_id, date DESC);
+
+    ALTER TABLE attendance ENABLE ROW LEVEL SECURITY;
+
+    CREATE POLICY "Members can view own attendance" ON attendance
+        FOR SELECT USING (
+            EXISTS (
+                SELECT 1 FROM members WHERE members.id = attendance.member_id AND members.user_id = auth.uid()
+            )
+        );
+
+    CREATE POLICY "Admins and trainers can view all attendance" ON attendance
+        FOR SELECT USING (
+            EXISTS (
+                SELECT 1 FROM users WHERE id = auth.uid() AND role IN ('admin', 'trainer')
+            )
+        );
+
+    CREATE POLICY "Admins and trainers can manage attendance" ON attendance
+        FOR ALL USING (
+            EXISTS (
+                SELECT 1 FROM users WHERE id = auth.uid() AND role IN ('admin', 'trainer')
+            )
+        );
+
+    IF v_directory IS NOT NULL THEN
+        EXECUTE 'CREATE VIEW member_directory WITH (security_invoker = true) AS ' || v_directory;
+    END IF;
+END;
+$$;
+
+-- ============================================================================
+-- CONVERT AUDIT_LOGS (partitioned by timestamp)
+-- ============================================================================
+
+DO $$
+DECLARE
+    v_month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'audit_logs'::regclass) = 'p' THEN
+        RAISE NOTICE 'audit_logs is already partitioned';
+        RETURN;
+    END IF;
+
+    ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned;
+    UPDATE audit_logs_unpartitioned SET timestamp = NOW() WHERE timestamp IS NULL;
+
+    CREATE TABLE audit_logs (
+        LIKE audit_logs_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+
+    FOR v_month IN
+        SELECT month::DATE FROM generate_series(
+            (SELECT date_trunc('month', COALESCE(MIN(timestamp), NOW())) FROM audit_logs_unpartitioned),
+            date_trunc('month', NOW()) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        ) AS month
+    LOOP
+        PERFORM create_time_partition('audit_logs', v_month);
+    END LOOP;
+
+    INSERT INTO audit_logs SELECT * FROM audit_logs_unpartitioned;
+    DROP TABLE audit_logs_unpartitioned;
+
+    CREATE INDEX idx_audit_logs_user ON audit_logs(user_id);
+    CREATE INDEX idx_audit_logs_timestamp ON audit_logs(timestamp);
+    CREATE INDEX idx_audit_logs_entity_timestamp ON audit_logs(entity_type, entity_id, timestamp DESC);
+
+    ALTER TABLE audit_logs ENABLE ROW LEVEL SECURITY;
+
+    CREATE POLICY "Only admins can view audit logs"
+        ON audit_logs FOR SELECT
+        USING (auth.jwt() ->> 'role' = 'admin');
+
+    CREATE POLICY "System can insert audit logs"
+        ON audit_logs FOR INSERT
+        WITH CHECK (true);
+END;
+$$;
+
+ANALYZE attendance;
+ANALYZE audit_logs;